@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import json
+import re
+import uuid
+from CalendarAPI.client import RETRY_STATUSES, calendar_client
+from CalendarAPI.utils import EVENTS_PATH, build_event, build_event_patch
+
+logger = logging.getLogger(__name__)
+
+BATCH_PATH = '/batch/calendar/v3'
+# Google Calendar accepts at most 50 calls in one batch request.
+BATCH_LIMIT = 50
+
+_boundary_re = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_content_id_re = re.compile(r'^content-id:\s*<?(?:response-)?([^>\s]+)>?\s*$', re.IGNORECASE | re.MULTILINE)
+
+
+def _event_fields(task):
+    return (task.get('summary', ''), task.get('desc', ''), task.get('startdate'), task.get('starttime'),
+            task.get('enddate'), task.get('endtime'), task.get('daily', False))
+
+
+def operation_request(operation):
+    """Method, path and JSON body for one create/update/delete operation."""
+    kind = operation['op']
+    task = operation.get('task') or {}
+    if kind == 'create':
+        return 'POST', EVENTS_PATH, build_event(*_event_fields(task))
+    if kind == 'update':
+        return 'PATCH', f"{EVENTS_PATH}/{operation['event_id']}", build_event_patch(*_event_fields(task))
+    if kind == 'delete':
+        return 'DELETE', f"{EVENTS_PATH}/{operation['event_id']}", None
+    raise ValueError(f"Unknown calendar operation: {kind}")
+
+
+def build_batch(operations, boundary):
+    lines = []
+    for index, operation in enumerate(operations):
+        method, path, body = operation_request(operation)
+        lines += [f'--{boundary}', 'Content-Type: application/http', f'Content-ID: <item{index}>', '',
+                  f'{method} {path} HTTP/1.1']
+        if body is not None:
+            lines += ['Content-Type: application/json', '', json.dumps(body)]
+        else:
+            lines += ['']
+    lines += [f'--{boundary}--', '']
+    return '\r\n'.join(lines).encode()
+
+
+def _split_head(text):
+    text = text.replace('\r\n', '\n')
+    head, _, rest = text.partition('\n\n')
+    return head, rest
+
+
+def parse_batch_response(content_type, body):
+    """Map item index -> (status, parsed JSON body or None) from a multipart/mixed reply."""
+    match = _boundary_re.search(content_type or '')
+    if not match:
+        raise ValueError(f"Batch response without boundary: {content_type}")
+    boundary = match.group(1)
+    parts = {}
+    for raw in body.split(f'--{boundary}'):
+        raw = raw.strip()
+        if not raw or raw == '--':
+            continue
+        outer, inner = _split_head(raw)
+        content_id = _content_id_re.search(outer)
+        if not content_id:
+            continue
+        index = int(content_id.group(1).replace('item', ''))
+        inner_head, inner_body = _split_head(inner.lstrip())
+        status_line = inner_head.split('\n', 1)[0]
+        status = int(status_line.split()[1])
+        inner_body = inner_body.strip()
+        try:
+            payload = json.loads(inner_body) if inner_body else None
+        except ValueError:
+            payload = {'raw': inner_body}
+        parts[index] = (status, payload)
+    return parts
+
+
+def _result(operation, status, payload):
+    if 200 <= status < 300 or (operation['op'] == 'delete' and status in (404, 410)):
+        result = {'success': True, 'status': status}
+        if operation['op'] == 'create' and payload:
+            result['id'] = payload.get('id')
+        return result
+    message = (payload or {}).get('error', {}).get('message') if isinstance(payload, dict) else None
+    result = {'success': False, 'status': status,
+              'message': f"Failed to {operation['op']} event: {status}" + (f" ({message})" if message else '')}
+    if operation['op'] == 'create' and retryable_status(status) and status != 429:
+        # Google may have created the event before failing; sending it again
+        # could make a second one, so the caller has to decide.
+        result['uncertain'] = True
+    return result
+
+
+def retryable_status(status):
+    # 0: the batch itself failed and the part's outcome is unknown.
+    return status in RETRY_STATUSES or status == 0
+
+
+def replayable(operation, status):
+    """Whether a failed part can simply be sent again. Updates and deletes
+    are idempotent; a create is only safe after a 429, which Google returns
+    before doing anything."""
+    if not retryable_status(status):
+        return False
+    return operation['op'] != 'create' or status == 429
+
+
+async def _send_batch(access_token, operations):
+    boundary = f'batch_{uuid.uuid4().hex}'
+    response = await calendar_client.request(
+        'POST', BATCH_PATH, access_token,
+        content=build_batch(operations, boundary),
+        headers={'Content-Type': f'multipart/mixed; boundary={boundary}'},
+    )
+    if response.status_code != 200:
+        return {index: (response.status_code, None) for index in range(len(operations))}
+    return parse_batch_response(response.headers.get('Content-Type'), response.text)
+
+
+async def batch_calendar_operations(access_token, operations):
+    """Run create/update/delete operations in multipart batches.
+
+    Each operation is a dict with 'op', 'task_id', and 'event_id' (update and
+    delete) or 'task' (create and update). Returns task_id -> result dict.
+    Parts that fail with 429/5xx, or whose batch failed outright, are
+    retried in a follow-up batch, except creates that may already have been
+    applied: those come back failed with 'uncertain' set.
+    """
+    if not access_token:
+        return {op['task_id']: {'success': False, 'message': 'Failed to get access token'} for op in operations}
+
+    results = {}
+    pending = list(operations)
+    attempt = 0
+    while pending:
+        retry = []
+        for start in range(0, len(pending), BATCH_LIMIT):
+            chunk = pending[start:start + BATCH_LIMIT]
+            error = None
+            try:
+                parts = await _send_batch(access_token, chunk)
+            except Exception as e:
+                logger.warning('Error sending calendar batch: %s', e)
+                parts, error = {}, e
+            for index, operation in enumerate(chunk):
+                status, payload = parts.get(index, (0, None))
+                if replayable(operation, status):
+                    retry.append(operation)
+                results[operation['task_id']] = _result(operation, status, payload)
+                if not status:
+                    reason = f"batch request failed ({error})" if error else "missing from batch response"
+                    results[operation['task_id']]['message'] = f"Failed to {operation['op']} event: {reason}"
+        if not retry or attempt >= calendar_client.max_retries:
+            break
+        await asyncio.sleep(calendar_client.backoff(attempt))
+        pending = retry
+        attempt += 1
+    return results
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import httpx
+from dotenv import load_dotenv
+from monitoring.metrics import span
+
+load_dotenv('./config.env')
+
+CALENDAR_API_BASE = os.getenv("CALENDAR_API_BASE", "https://www.googleapis.com")
+CALENDAR_TIMEOUT = float(os.getenv("CALENDAR_TIMEOUT", "10"))
+CALENDAR_MAX_RETRIES = int(os.getenv("CALENDAR_MAX_RETRIES", "4"))
+CALENDAR_BACKOFF_BASE = float(os.getenv("CALENDAR_BACKOFF_BASE", "0.5"))
+CALENDAR_BACKOFF_MAX = float(os.getenv("CALENDAR_BACKOFF_MAX", "8"))
+CALENDAR_RETRY_AFTER_MAX = float(os.getenv("CALENDAR_RETRY_AFTER_MAX", "30"))
+CALENDAR_MAX_CONNECTIONS = int(os.getenv("CALENDAR_MAX_CONNECTIONS", "50"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class CalendarClient:
+    def __init__(self, base_url=CALENDAR_API_BASE, timeout=CALENDAR_TIMEOUT,
+                 max_retries=CALENDAR_MAX_RETRIES, transport=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.transport = transport
+        self._http = None
+
+    @property
+    def http(self):
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=CALENDAR_MAX_CONNECTIONS,
+                    max_keepalive_connections=CALENDAR_MAX_CONNECTIONS,
+                ),
+                transport=self.transport,
+            )
+        return self._http
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, CALENDAR_RETRY_AFTER_MAX)
+        # Full jitter: anywhere between zero and the exponential ceiling.
+        return random.uniform(0, min(CALENDAR_BACKOFF_MAX, CALENDAR_BACKOFF_BASE * 2 ** attempt))
+
+    async def request(self, method, path, access_token, json=None, content=None, headers=None, timeout=None, params=None):
+        request_headers = {'Authorization': f'Bearer {access_token}'}
+        request_headers.update(headers or {})
+        # A POST that may have reached Google is not replayed, since that could
+        # create the event twice; failures to connect are always safe to retry.
+        idempotent = method.upper() != "POST"
+        attempt = 0
+        while True:
+            try:
+                async with span("calendar", method=method.upper()):
+                    response = await self.http.request(
+                        method, path, json=json, content=content, headers=request_headers, params=params,
+                        timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                    )
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+            except httpx.TransportError:
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                # A 429 is refused before anything happens; a 5xx may come
+                # back after Google applied the POST.
+                if not idempotent and response.status_code != 429:
+                    return response
+                await asyncio.sleep(self.backoff(attempt, retry_after_seconds(response.headers.get('Retry-After'))))
+            attempt += 1
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+calendar_client = CalendarClient()
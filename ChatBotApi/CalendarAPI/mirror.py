@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+import pytz
+from dotenv import load_dotenv
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from CalendarAPI.client import calendar_client
+from CalendarAPI.utils import EVENTS_PATH
+from database import utils1
+from database.indexes import EMAIL, query_shape
+
+load_dotenv('./config.env')
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_MIRROR = os.getenv("CALENDAR_MIRROR", "true").lower() == "true"
+# How old a user's mirror may get before a /chat turn refreshes it in the background.
+CALENDAR_MIRROR_STALE_SECONDS = float(os.getenv("CALENDAR_MIRROR_STALE_SECONDS", "300"))
+CALENDAR_MIRROR_PAGE_SIZE = int(os.getenv("CALENDAR_MIRROR_PAGE_SIZE", "250"))
+
+india_tz = pytz.timezone('Asia/Kolkata')
+
+
+class SyncTokenExpired(Exception):
+    pass
+
+
+def _moment(value):
+    """(date, time) strings in the app's timezone for an event start/end."""
+    if 'dateTime' in value:
+        moment = datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00'))
+        moment = india_tz.localize(moment) if moment.tzinfo is None else moment.astimezone(india_tz)
+        return moment.strftime('%Y-%m-%d'), moment.strftime('%H:%M')
+    return value['date'], '00:00'
+
+
+def event_task(event):
+    """The event in the task shape conflict checks read, or None if it
+    doesn't block time (cancelled, marked free, or missing times)."""
+    if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+        return None
+    try:
+        startdate, starttime = _moment(event['start'])
+        enddate, endtime = _moment(event['end'])
+    except (KeyError, ValueError):
+        return None
+    # Only daily recurrence maps onto the task model; other rules keep their
+    # first occurrence.
+    daily = any(rule.startswith('RRULE:') and 'FREQ=DAILY' in rule for rule in event.get('recurrence', []))
+    summary = event.get('summary') or 'Busy'
+    return {
+        'task': summary,
+        'summary': summary,
+        'startdate': startdate,
+        'starttime': starttime,
+        'enddate': enddate,
+        'endtime': endtime,
+        'daily': daily,
+        'addedToCalendar': True,
+        'source': 'calendar',
+    }
+
+
+def event_writes(email, events):
+    writes = []
+    for event in events:
+        task = event_task(event)
+        key = {'email': email, 'event_id': event['id']}
+        if task is None:
+            writes.append(DeleteOne(key))
+        else:
+            writes.append(UpdateOne(key, {'$set': {'task': task, 'updated': event.get('updated')}}, upsert=True))
+    return writes
+
+
+async def list_events(access_token, sync_token=None, page_token=None):
+    params = {'maxResults': CALENDAR_MIRROR_PAGE_SIZE}
+    if sync_token:
+        params['syncToken'] = sync_token
+    if page_token:
+        params['pageToken'] = page_token
+    response = await calendar_client.request('GET', EVENTS_PATH, access_token, params=params)
+    if response.status_code == 410:
+        raise SyncTokenExpired()
+    response.raise_for_status()
+    return response.json()
+
+
+@query_shape('CalendarSync', {'email': EMAIL})
+@query_shape('CalendarEvents', {'email': EMAIL})
+async def sync_events(email, access_token):
+    """Pull changes since the stored syncToken (or everything, the first time
+    or after Google expires the token) into CalendarEvents."""
+    state = await utils1.calendar_sync_collection.find_one({'email': email}) or {}
+    sync_token = state.get('sync_token')
+    try:
+        changed = await _pull(email, access_token, sync_token)
+    except SyncTokenExpired:
+        await utils1.events_collection.delete_many({'email': email})
+        changed = await _pull(email, access_token, None)
+    return changed
+
+
+@query_shape('CalendarEvents', {'email': EMAIL, 'event_id': 'event'})
+@query_shape('CalendarSync', {'email': EMAIL})
+async def _pull(email, access_token, sync_token):
+    changed = 0
+    page_token = None
+    while True:
+        page = await list_events(access_token, sync_token, page_token)
+        writes = event_writes(email, page.get('items', []))
+        if writes:
+            await utils1.events_collection.bulk_write(writes, ordered=False)
+            changed += len(writes)
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            break
+    update = {'$set': {'sync_token': page.get('nextSyncToken'), 'synced_at': datetime.utcnow()}}
+    if changed or not sync_token:
+        update['$inc'] = {'version': 1}
+    await utils1.calendar_sync_collection.find_one_and_update(
+        {'email': email}, update, upsert=True, return_document=ReturnDocument.AFTER)
+    return changed
+
+
+_syncing = {}
+
+
+def refresh_mirror(email, access_token, synced_at=None):
+    """Start a background sync when the user's mirror is older than
+    CALENDAR_MIRROR_STALE_SECONDS. Never blocks the caller."""
+    if not CALENDAR_MIRROR or not access_token or email in _syncing:
+        return None
+    if synced_at is not None and datetime.utcnow() - synced_at < timedelta(seconds=CALENDAR_MIRROR_STALE_SECONDS):
+        return None
+    task = asyncio.create_task(_refresh(email, access_token))
+    _syncing[email] = task
+    task.add_done_callback(lambda _: _syncing.pop(email, None))
+    return task
+
+
+async def _refresh(email, access_token):
+    try:
+        return await sync_events(email, access_token)
+    except Exception as e:
+        logger.warning('Error syncing calendar mirror for %s: %s', email, e)
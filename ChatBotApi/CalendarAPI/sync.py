@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from CalendarAPI.batch import BATCH_LIMIT, batch_calendar_operations
+from CalendarAPI.client import RETRY_STATUSES
+from CalendarAPI.utils import create_google_calendar_event, update_google_calendar_event
+from database import outbox
+from database.utils1 import setEventId
+
+load_dotenv('./config.env')
+
+logger = logging.getLogger(__name__)
+
+# "outbox" replies to /chat as soon as the task is stored and lets the worker
+# push it to Calendar; "inline" drains the user's outbox before replying.
+CALENDAR_SYNC_MODE = os.getenv("CALENDAR_SYNC_MODE", "outbox").lower()
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+OUTBOX_TOKEN_USERS = int(os.getenv("OUTBOX_TOKEN_USERS", "10000"))
+# Google access tokens last an hour; stop using one a little before that.
+OUTBOX_TOKEN_TTL = float(os.getenv("OUTBOX_TOKEN_TTL", "3300"))
+
+# 403 is how Calendar reports per-user rate limits. An expired access token
+# (401) is retried too: the token is dropped and the job waits for the
+# user's next request to bring a fresh one, until outbox.expireStranded
+# dead-letters it. A missing event never recovers.
+RETRYABLE = RETRY_STATUSES | {401, 403}
+
+
+def retryable(result):
+    # An uncertain create may already exist in Calendar; retrying could
+    # duplicate it, so it is dead-lettered with its reason instead.
+    if result.get('uncertain'):
+        return False
+    status = result.get('status')
+    return not status or status in RETRYABLE
+
+
+def _fields(task):
+    return (task.get('summary', ''), task.get('desc', ''), task.get('startdate'), task.get('starttime'),
+            task.get('enddate'), task.get('endtime'), task.get('daily', False))
+
+
+class CalendarSyncWorker:
+    def __init__(self, poll_seconds=OUTBOX_POLL_SECONDS, concurrency=OUTBOX_CONCURRENCY):
+        self.poll_seconds = poll_seconds
+        self.concurrency = concurrency
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.users = {}
+        # email -> (newest access token seen on a request, when to stop using
+        # it). Tokens are kept in memory only and never written to the
+        # outbox; a user's jobs wait until a request to some worker supplies
+        # one, or are dead-lettered once they have waited OUTBOX_TOKEN_WAIT.
+        self.tokens = OrderedDict()
+        self.stats = {"synced": 0, "retried": 0, "dead": 0}
+
+    def start(self):
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def wake(self):
+        self.wakeup.set()
+
+    def remember(self, email, access_token):
+        if not access_token:
+            return
+        self.tokens[email] = (access_token, time.monotonic() + OUTBOX_TOKEN_TTL)
+        self.tokens.move_to_end(email)
+        while len(self.tokens) > OUTBOX_TOKEN_USERS:
+            self.tokens.popitem(last=False)
+
+    def token(self, email):
+        """The user's access token, or None once it has expired."""
+        entry = self.tokens.get(email)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self.tokens.pop(email, None)
+            return None
+        return entry[0]
+
+    async def run(self):
+        while True:
+            try:
+                await outbox.expireStranded()
+                live = {email for email in list(self.tokens) if self.token(email)}
+                emails = await outbox.dueUsers(self.concurrency * 4, live)
+                limiter = asyncio.Semaphore(self.concurrency)
+
+                async def drain(email):
+                    async with limiter:
+                        await self.drain(email)
+
+                await asyncio.gather(*(drain(email) for email in emails))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Calendar sync worker error: %s", e)
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+    async def drain(self, email):
+        """Process a user's due jobs in order, if we hold a token for them."""
+        # One drain per user at a time, so the inline path and the background
+        # loop don't race on the same queue.
+        entry = self.users.setdefault(email, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                while self.token(email):
+                    jobs = await outbox.claimHead(email, BATCH_LIMIT)
+                    if not jobs:
+                        break
+                    if jobs[0]['op'] == 'delete':
+                        await self.delete(jobs)
+                    else:
+                        await self.apply(jobs[0])
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                self.users.pop(email, None)
+
+    async def apply(self, job):
+        task = job.get('task') or {}
+        access_token = self.token(job['email'])
+        if job['op'] == 'create':
+            result = await create_google_calendar_event(access_token, *_fields(task))
+        elif job.get('event_id'):
+            result = await update_google_calendar_event(access_token, job['event_id'], *_fields(task))
+        else:
+            # The create never reached Calendar, so there is no event to update.
+            result = {'success': True}
+        if not result.get('success'):
+            await self.fail(job, result)
+            return
+        await outbox.completeJob(job)
+        self.stats["synced"] += 1
+        if job['op'] == 'create' and result.get('id'):
+            await setEventId(job['task_id'], result['id'])
+            await outbox.fillEventId(job['task_id'], result['id'])
+
+    async def delete(self, jobs):
+        for job in [job for job in jobs if not job.get('event_id')]:
+            await outbox.completeJob(job)
+            self.stats["synced"] += 1
+        jobs = [job for job in jobs if job.get('event_id')]
+        if not jobs:
+            return
+        operations = [{'op': 'delete', 'task_id': str(job['_id']), 'event_id': job['event_id']} for job in jobs]
+        results = await batch_calendar_operations(self.token(jobs[0]['email']), operations)
+        for job in jobs:
+            result = results.get(str(job['_id']), {'success': False, 'message': 'Missing from batch response'})
+            if result.get('success'):
+                await outbox.completeJob(job)
+                self.stats["synced"] += 1
+            else:
+                await self.fail(job, result)
+
+    async def fail(self, job, result):
+        error = result.get('message', 'Calendar request failed')
+        if result.get('status') == 401:
+            self.tokens.pop(job['email'], None)
+        if retryable(result):
+            self.stats["retried"] += 1
+            await outbox.retryJob(job, error)
+        else:
+            self.stats["dead"] += 1
+            await outbox.deadJob(job, error)
+
+
+calendar_worker = CalendarSyncWorker()
+
+
+async def sync_calendar(email):
+    if CALENDAR_SYNC_MODE == "inline":
+        await calendar_worker.drain(email)
+    else:
+        calendar_worker.wake()
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv('./config.env')
+
+CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "2048"))
+CACHE_DISK_PATH = os.getenv("GEMINI_CACHE_PATH")
+
+# Seconds a response stays fresh, per prompt function. Functions not listed
+# (generalDialog, conflictChecker, searchToGoogle) depend on the clock or on
+# live data and are never cached.
+CACHE_TTLS = {
+    "messageGenerator": int(os.getenv("GEMINI_CACHE_TTL_MESSAGE", "3600")),
+    "classify": int(os.getenv("GEMINI_CACHE_TTL_CLASSIFY", "600")),
+    "conversaction": int(os.getenv("GEMINI_CACHE_TTL_CONV", "300")),
+}
+
+_space_re = re.compile(r"\s+")
+
+
+def prompt_key(prompt, model_id, kind="json"):
+    normalized = _space_re.sub(" ", prompt).strip()
+    return hashlib.sha256(f"{model_id}\x00{kind}\x00{normalized}".encode()).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, disk_path=CACHE_DISK_PATH):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.disk_path = disk_path
+        self.stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0}
+        self._db = None
+        self._lock = threading.Lock()
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            self._db.commit()
+
+    def _remember(self, key, value, expires):
+        self.entries[key] = (value, expires)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _disk_get(self, key):
+        with self._lock:
+            return self._db.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+
+    def _disk_set(self, key, value, expires):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, value, expires))
+            self._db.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+            self._db.commit()
+
+    async def get(self, key):
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry and entry[1] > now:
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return json.loads(entry[0])
+        if entry:
+            del self.entries[key]
+        if self._db is not None:
+            row = await asyncio.to_thread(self._disk_get, key)
+            if row and row[1] > now:
+                self._remember(key, row[0], row[1])
+                self.stats["hits"] += 1
+                self.stats["disk_hits"] += 1
+                return json.loads(row[0])
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key, value, ttl):
+        expires = time.time() + ttl
+        serialized = json.dumps(value)
+        self._remember(key, serialized, expires)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, serialized, expires)
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,202 @@
+import json
+import logging
+import math
+import os
+import queue
+import re
+import sys
+import threading
+import zlib
+from dotenv import load_dotenv
+
+load_dotenv('./config.env')
+
+logger = logging.getLogger(__name__)
+
+LOCAL_INTENT = os.getenv("LOCAL_INTENT", "true").lower() == "true"
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "./intent_model.json")
+INTENT_LOG_PATH = os.getenv("INTENT_LOG_PATH")
+INTENT_CONFIDENCE = float(os.getenv("INTENT_CONFIDENCE", "0.85"))
+INTENT_LOG_QUEUE = 1000
+
+TASK_PATTERNS = [
+    r"\b(remind|reminder|schedule|reschedule|postpone|cancel|delete|remove|update|change|move|add|create|set up)\b",
+    r"\b(task|tasks|meeting|appointment|event|calendar|to-?do|agenda|plan|plans)\b",
+    r"\bmy (day|week|schedule|tasks?|events?|meetings?)\b",
+    r"\b(at|by|from|until|till) \d{1,2}(:\d{2})?\s*(am|pm)?\b",
+    r"\b(yes|yeah|yep|ok|okay|sure|confirm|go ahead|no|nope)\b[.! ]*$",
+]
+
+SEARCH_PATTERNS = [
+    r"\b(weather|temperature|forecast|news|headlines|score|match|stock|price|exchange rate|election)\b",
+    r"\b(who|what|where|when|why|how) (is|are|was|were|did|does|do)\b(?!.*\bmy\b)",
+    r"\b(capital of|population of|meaning of|definition of|latest|current|today's|recipe|translate)\b",
+]
+
+_task_re = [re.compile(p, re.IGNORECASE) for p in TASK_PATTERNS]
+_search_re = [re.compile(p, re.IGNORECASE) for p in SEARCH_PATTERNS]
+_token_re = re.compile(r"[a-z0-9']+")
+
+
+def rule_vote(text):
+    """The label the patterns agree on, and how many patterns matched it."""
+    task_hits = sum(1 for r in _task_re if r.search(text))
+    search_hits = sum(1 for r in _search_re if r.search(text))
+    if task_hits and not search_hits:
+        return "first", task_hits
+    if search_hits and not task_hits:
+        return "second", search_hits
+    return None, 0
+
+
+def strip_dataresult(chat_history):
+    index = chat_history.rfind("\nDATARESULT:")
+    return chat_history if index == -1 else chat_history[:index]
+
+
+class IntentClassifier:
+    """Hashed n-gram logistic regression; P(first) is the positive class."""
+
+    def __init__(self, n_features=2 ** 18, threshold=INTENT_CONFIDENCE):
+        self.n_features = n_features
+        self.threshold = threshold
+        self.weights = {}
+        self.bias = 0.0
+
+    @property
+    def trained(self):
+        return bool(self.weights)
+
+    def features(self, text):
+        text = text.lower()
+        words = _token_re.findall(text)
+        grams = [f"w:{w}" for w in words]
+        grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        padded = f" {' '.join(words)} "
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        counts = {}
+        for gram in grams:
+            h = zlib.crc32(gram.encode()) % self.n_features
+            counts[h] = counts.get(h, 0.0) + 1.0
+        norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+        return {h: v / norm for h, v in counts.items()}
+
+    def probability(self, text):
+        z = self.bias + sum(self.weights.get(h, 0.0) * v for h, v in self.features(text).items())
+        z = max(-30.0, min(30.0, z))
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def fit(self, samples, epochs=8, lr=0.5, l2=1e-5):
+        data = [(self.features(text), 1.0 if label == "first" else 0.0) for text, label in samples]
+        for _ in range(epochs):
+            for x, y in data:
+                z = self.bias + sum(self.weights.get(h, 0.0) * v for h, v in x.items())
+                z = max(-30.0, min(30.0, z))
+                error = 1.0 / (1.0 + math.exp(-z)) - y
+                self.bias -= lr * error
+                for h, v in x.items():
+                    w = self.weights.get(h, 0.0)
+                    self.weights[h] = w - lr * (error * v + l2 * w)
+        return self
+
+    def predict(self, text):
+        vote, hits = rule_vote(text)
+        if not self.trained:
+            # Without a model one keyword ("event horizon") is too weak to
+            # skip Gemini; it takes two patterns agreeing.
+            if not vote:
+                return None, 0.0
+            return vote, self.threshold if hits >= 2 else self.threshold / 2
+        p = self.probability(text)
+        label, confidence = ("first", p) if p >= 0.5 else ("second", 1.0 - p)
+        if vote and vote != label:
+            return None, 0.0
+        if vote:
+            return label, max(confidence, self.threshold)
+        return label, confidence
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"n_features": self.n_features, "bias": self.bias,
+                       "weights": {str(h): w for h, w in self.weights.items()}}, f)
+
+    @classmethod
+    def load(cls, path, threshold=INTENT_CONFIDENCE):
+        with open(path) as f:
+            data = json.load(f)
+        classifier = cls(n_features=data["n_features"], threshold=threshold)
+        classifier.bias = data["bias"]
+        classifier.weights = {int(h): w for h, w in data["weights"].items()}
+        return classifier
+
+
+def load_classifier():
+    if INTENT_MODEL_PATH and os.path.exists(INTENT_MODEL_PATH):
+        return IntentClassifier.load(INTENT_MODEL_PATH)
+    return IntentClassifier()
+
+
+intent_classifier = load_classifier()
+
+
+def local_classify(user_input, chat_history):
+    if not LOCAL_INTENT:
+        return None
+    label, confidence = intent_classifier.predict(user_input)
+    if label is None or confidence < intent_classifier.threshold:
+        return None
+    return {"res": label, "history": strip_dataresult(chat_history) if label == "second" else ""}
+
+
+_samples = queue.Queue(INTENT_LOG_QUEUE)
+_writer = None
+
+
+def _write_samples():
+    while True:
+        lines = [_samples.get()]
+        while True:
+            try:
+                lines.append(_samples.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with open(INTENT_LOG_PATH, "a") as f:
+                f.write("".join(lines))
+        except OSError as e:
+            logger.warning("Error logging %d intent samples: %s", len(lines), e)
+
+
+def record_intent(user_input, label):
+    """Queue a labelled sample for INTENT_LOG_PATH; a writer thread does the
+    file I/O so classify never blocks the event loop on disk."""
+    global _writer
+    if not INTENT_LOG_PATH or label not in ("first", "second"):
+        return
+    if _writer is None:
+        _writer = threading.Thread(target=_write_samples, name="intent-samples", daemon=True)
+        _writer.start()
+    try:
+        _samples.put_nowait(json.dumps({"text": user_input, "label": label}) + "\n")
+    except queue.Full:
+        # Training samples are best effort; a stalled disk just loses some.
+        pass
+
+
+def read_samples(path):
+    samples = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                row = json.loads(line)
+                samples.append((row["text"], row["label"]))
+    return samples
+
+
+if __name__ == "__main__":
+    # python -m GeminiAPI.classifier <intent_log.jsonl> [model.json]
+    samples = read_samples(sys.argv[1])
+    output = sys.argv[2] if len(sys.argv) > 2 else INTENT_MODEL_PATH
+    IntentClassifier().fit(samples).save(output)
+    print(f"Trained on {len(samples)} samples -> {output}")
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+from dotenv import load_dotenv
+import google.generativeai as genai2
+from google import genai
+from google.genai.types import Tool, GenerateContentConfig, GoogleSearch
+from GeminiAPI.prompts import token_usage
+from GeminiAPI.quota import gemini_quota
+from monitoring.metrics import span
+
+load_dotenv('./config.env')
+
+GEMINI_KEY = os.getenv("GEMINI_KEY")
+MODEL_ID = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+
+genai2.configure(api_key=GEMINI_KEY)
+model = genai2.GenerativeModel(MODEL_ID)
+search_client = genai.Client(api_key=GEMINI_KEY)
+google_search_tool = Tool(google_search=GoogleSearch())
+
+# Caps the number of in-flight Gemini requests per process so a burst of
+# chats queues here instead of piling up sockets against the API quota.
+limiter = asyncio.Semaphore(GEMINI_CONCURRENCY)
+
+# One model per template, built with the template's static instructions as
+# its system instruction; only the rendered context goes out as content.
+models = {}
+
+
+def model_for(template, model_id=MODEL_ID):
+    if template is None:
+        return model if model_id == MODEL_ID else genai2.GenerativeModel(model_id)
+    key = (template.name, model_id)
+    if key not in models:
+        models[key] = genai2.GenerativeModel(model_id, system_instruction=template.system)
+    return models[key]
+
+
+def search_config(template):
+    return GenerateContentConfig(
+        system_instruction=template.system if template else None,
+        tools=[google_search_tool],
+        response_modalities=["TEXT"],
+    )
+
+
+def template_name(template):
+    return template.name if template else None
+
+
+# granted, when given, is called once the quota lets the call go out, so
+# resilience can time the call itself rather than the wait for quota.
+async def generate_json(prompt, template=None, model_id=MODEL_ID, granted=None):
+    estimate = await gemini_quota.acquire(prompt, template)
+    if granted:
+        granted()
+    async with limiter, span("gemini", template=template_name(template) or "raw"):
+        try:
+            result = await model_for(template, model_id).generate_content_async(
+                prompt,
+                generation_config=genai2.GenerationConfig(
+                    response_mime_type="application/json"
+                ),
+            )
+        except Exception as e:
+            raise gemini_quota.rejected(e)
+    gemini_quota.settle(estimate, result.usage_metadata)
+    token_usage.record(template_name(template), result.usage_metadata)
+    return json.loads(result.text)
+
+
+async def generate_search_text(prompt, template=None, model_id=MODEL_ID, granted=None):
+    estimate = await gemini_quota.acquire(prompt, template)
+    if granted:
+        granted()
+    async with limiter, span("gemini", template=template_name(template) or "raw"):
+        try:
+            response = await search_client.aio.models.generate_content(
+                model=model_id,
+                contents=prompt,
+                config=search_config(template)
+            )
+        except Exception as e:
+            raise gemini_quota.rejected(e)
+    gemini_quota.settle(estimate, response.usage_metadata)
+    token_usage.record(template_name(template), response.usage_metadata)
+    return response.candidates[0].content.parts[0].text.strip()
+
+
+async def stream_text(prompt, search=False, template=None, model_id=MODEL_ID, granted=None):
+    usage = None
+    estimate = await gemini_quota.acquire(prompt, template)
+    if granted:
+        granted()
+    async with span("gemini_stream", template=template_name(template) or "raw"):
+        async with limiter:
+            try:
+                if search:
+                    stream = await search_client.aio.models.generate_content_stream(
+                        model=model_id,
+                        contents=prompt,
+                        config=search_config(template)
+                    )
+                else:
+                    stream = await model_for(template, model_id).generate_content_async(prompt, stream=True)
+            except Exception as e:
+                raise gemini_quota.rejected(e)
+        chunks = stream.__aiter__()
+        while True:
+            # The limiter is held for one chunk at a time, never while the
+            # caller handles it, so slow readers don't use up Gemini slots.
+            async with limiter:
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    raise gemini_quota.rejected(e)
+            # Usage arrives with the final chunk.
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yield chunk.text
+    gemini_quota.settle(estimate, usage)
+    token_usage.record(template_name(template), usage)
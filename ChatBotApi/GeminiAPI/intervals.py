@@ -0,0 +1,206 @@
+from bisect import bisect_left
+from datetime import date
+
+DAY = 24 * 60
+
+
+def is_daily(value):
+    return value is True or str(value).lower() == "true"
+
+
+def to_minutes(day, time):
+    year, month, dom = (int(p) for p in day.split("-"))
+    hour, minute = (int(p) for p in time.split(":")[:2])
+    return date(year, month, dom).toordinal() * DAY + hour * 60 + minute
+
+
+def day_pieces(start, end):
+    """Minute-of-day ranges covered by [start, end), split at midnight."""
+    if end - start >= DAY:
+        return [(0, DAY)]
+    if end < start:
+        return []
+    lo = start % DAY
+    hi = lo + end - start
+    if hi <= DAY:
+        return [(lo, hi)]
+    return [(lo, DAY), (0, hi - DAY)]
+
+
+class IntervalTree:
+    """Static interval tree over half-open ranges laid out as an implicit BST.
+
+    Items are sorted by start; each node (the midpoint of its slice) stores the
+    largest end in its subtree so whole branches ending before the query are
+    skipped. Overlap queries cost O(log n + k).
+    """
+
+    def __init__(self, intervals):
+        self.items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self.starts = [item[0] for item in self.items]
+        self.max_end = [0] * len(self.items)
+        self._build(0, len(self.items))
+
+    def __len__(self):
+        return len(self.items)
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return float("-inf")
+        mid = (lo + hi) // 2
+        best = max(self.items[mid][1], self._build(lo, mid), self._build(mid + 1, hi))
+        self.max_end[mid] = best
+        return best
+
+    def overlap(self, start, end):
+        found = []
+        limit = bisect_left(self.starts, end)
+        stack = [(0, len(self.items))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi or lo >= limit:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_end[mid] <= start:
+                continue
+            if mid < limit:
+                stack.append((mid + 1, hi))
+                if self.items[mid][1] > start:
+                    found.append(self.items[mid])
+            stack.append((lo, mid))
+        return found
+
+
+class Entry:
+    __slots__ = ("task_id", "name", "start", "end", "daily")
+
+    def __init__(self, task_id, name, start, end, daily):
+        self.task_id = task_id
+        self.name = name
+        self.start = start
+        self.end = end
+        self.daily = daily
+
+    def occurs_within(self, start, end):
+        """Whether any occurrence of this (daily) entry overlaps [start, end)."""
+        if not self.daily:
+            return self.start < end and self.end > start
+        length = self.end - self.start
+        if length >= DAY:
+            return end > self.start
+        first = max(self.start // DAY, (start - length) // DAY)
+        for day in range(first, end // DAY + 1):
+            occurrence = day * DAY + self.start % DAY
+            if occurrence < self.start:
+                continue
+            if occurrence < end and occurrence + length > start:
+                return True
+        return False
+
+
+def parse_entry(task_id, data):
+    try:
+        start = to_minutes(data["startdate"], data["starttime"])
+        end = to_minutes(data["enddate"], data["endtime"])
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    return Entry(task_id, data.get("task"), start, end, is_daily(data.get("daily", False)))
+
+
+def signature(data):
+    return (data.get("startdate"), data.get("starttime"), data.get("enddate"),
+            data.get("endtime"), data.get("daily"), data.get("task"))
+
+
+class TaskSchedule:
+    def __init__(self):
+        self.entries = {}
+        self.signatures = {}
+        self.version = None
+        self._indexes = None
+
+    def upsert(self, task_id, data):
+        sig = signature(data)
+        if self.signatures.get(task_id) == sig:
+            return
+        entry = parse_entry(task_id, data)
+        self.signatures[task_id] = sig
+        if entry is None:
+            self.entries.pop(task_id, None)
+        else:
+            self.entries[task_id] = entry
+        self._indexes = None
+
+    def remove(self, task_id):
+        self.signatures.pop(task_id, None)
+        if self.entries.pop(task_id, None) is not None:
+            self._indexes = None
+
+    def sync(self, tasks, version=None):
+        if version is not None and version == self.version:
+            return
+        seen = set()
+        for task in tasks:
+            task_id = task.get("task_id")
+            seen.add(task_id)
+            self.upsert(task_id, task.get("task") or {})
+        for task_id in [t for t in self.signatures if t not in seen]:
+            self.remove(task_id)
+        self.version = version
+
+    def indexes(self):
+        if self._indexes is None:
+            absolute, daily, time_of_day = [], [], []
+            for entry in self.entries.values():
+                if entry.daily:
+                    for lo, hi in day_pieces(entry.start, entry.end):
+                        daily.append((lo, hi, entry))
+                else:
+                    absolute.append((entry.start, entry.end, entry))
+                    for lo, hi in day_pieces(entry.start, entry.end):
+                        time_of_day.append((lo, hi, entry))
+            self._indexes = (IntervalTree(absolute), IntervalTree(daily), IntervalTree(time_of_day))
+        return self._indexes
+
+    def conflicts(self, new_entry, exclude_id=None):
+        absolute, daily, time_of_day = self.indexes()
+        found = {}
+        pieces = day_pieces(new_entry.start, new_entry.end)
+
+        if new_entry.daily:
+            for lo, hi in pieces:
+                for _, _, entry in daily.overlap(lo, hi):
+                    found[entry.task_id] = entry
+                for _, _, entry in time_of_day.overlap(lo, hi):
+                    if entry.task_id not in found and new_entry.occurs_within(entry.start, entry.end):
+                        found[entry.task_id] = entry
+        else:
+            for _, _, entry in absolute.overlap(new_entry.start, new_entry.end):
+                found[entry.task_id] = entry
+            for lo, hi in pieces:
+                for _, _, entry in daily.overlap(lo, hi):
+                    if entry.task_id not in found and entry.occurs_within(new_entry.start, new_entry.end):
+                        found[entry.task_id] = entry
+
+        found.pop(exclude_id, None)
+        return sorted(found.values(), key=lambda entry: (entry.start, str(entry.task_id)))
+
+
+class ConflictEngine:
+    def __init__(self, max_users=1024):
+        self.max_users = max_users
+        self.schedules = {}
+
+    def schedule(self, email, tasks, version=None):
+        schedule = self.schedules.pop(email, None) or TaskSchedule()
+        self.schedules[email] = schedule
+        while len(self.schedules) > self.max_users:
+            self.schedules.pop(next(iter(self.schedules)))
+        schedule.sync(tasks, version)
+        return schedule
+
+    def forget(self, email):
+        self.schedules.pop(email, None)
+
+
+conflict_engine = ConflictEngine()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from database.utils1 import retriveMessages, retriveRecentMessages, retriveSummary, saveSummary
+from GeminiAPI.slots import mentioned_tasks
+from GeminiAPI.utils import summarizeConversation
+
+logger = logging.getLogger(__name__)
+
+load_dotenv('./config.env')
+
+SERVER_MEMORY = os.getenv("SERVER_MEMORY", "true").lower() == "true"
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+TASK_TOKEN_BUDGET = int(os.getenv("TASK_TOKEN_BUDGET", "1500"))
+HISTORY_FETCH_LIMIT = int(os.getenv("HISTORY_FETCH_LIMIT", "60"))
+# Messages per summarizeConversation call, and calls per fold; a longer
+# backlog carries on from the saved cursor after the next turn.
+HISTORY_FOLD_PAGE = int(os.getenv("HISTORY_FOLD_PAGE", "60"))
+HISTORY_FOLD_PAGES = int(os.getenv("HISTORY_FOLD_PAGES", "4"))
+# Cursor before any message, for users with no summary yet.
+EPOCH = datetime.min.isoformat()
+
+_folding = set()
+_background = set()
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text, which is all the
+    # budget needs; exact counts come back from Gemini after the call.
+    return len(text) // 4 + 1
+
+
+def render_turn(message):
+    return f"{message.get('by')}: {message.get('msg')}"
+
+
+def window_messages(messages, budget=HISTORY_TOKEN_BUDGET):
+    window = []
+    used = 0
+    for message in reversed(messages):
+        cost = estimate_tokens(render_turn(message))
+        if window and used + cost > budget:
+            break
+        window.append(message)
+        used += cost
+    window.reverse()
+    return window, messages[:len(messages) - len(window)]
+
+
+def _task_start(task):
+    data = task.get('task', {}) if isinstance(task, dict) else {}
+    try:
+        return datetime.strptime(f"{data['startdate']} {data['starttime']}", "%Y-%m-%d %H:%M")
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def select_tasks(tasks, query="", budget=TASK_TOKEN_BUDGET):
+    """Tasks the request mentions by name or date, then the ones starting
+    nearest to now until the budget runs out."""
+    now = datetime.now()
+
+    def distance(task):
+        start = _task_start(task)
+        if start is None:
+            return (1, 0)
+        delta = (start - now).total_seconds()
+        return (0, delta if delta >= 0 else -delta * 4)
+
+    selected = mentioned_tasks(query, tasks, now.date()) if query else []
+    used = sum(estimate_tokens(str(task)) for task in selected)
+    pinned = {id(task) for task in selected}
+    for task in sorted(tasks, key=distance):
+        if id(task) in pinned:
+            continue
+        cost = estimate_tokens(str(task))
+        if selected and used + cost > budget:
+            continue
+        selected.append(task)
+        used += cost
+    return selected
+
+
+def task_context(tasks, query=""):
+    """The DATARESULT text: the selected tasks, and a note when some were left out."""
+    selected = select_tasks(tasks, query)
+    if len(selected) == len(tasks):
+        return str(selected)
+    return (f"{selected}\n(Only {len(selected)} of the user's {len(tasks)} tasks are listed: those this request "
+            "names or dates, then the nearest. If the task the user means is not here, ask for its name or date "
+            "rather than saying it doesn't exist.)")
+
+
+async def fold_history(email, summary, upto, until):
+    """Fold the messages after upto and before until into the summary,
+    reading forward from the summary's cursor rather than from the recent
+    tail, so no turn is skipped however far behind the summary is."""
+    try:
+        for _ in range(HISTORY_FOLD_PAGES):
+            page = (await retriveMessages(email, after=upto or EPOCH, limit=HISTORY_FOLD_PAGE)).get('data', [])
+            messages = [m for m in page if m['dateTime'] < until]
+            if not messages:
+                break
+            turns = "\n".join(render_turn(m) for m in messages)
+            summary = await summarizeConversation(summary, turns)
+            upto = messages[-1]['dateTime']
+            await saveSummary(email, summary, upto)
+            if len(messages) < HISTORY_FOLD_PAGE:
+                break
+    except Exception as e:
+        logger.warning("Error summarizing conversation: %s", e)
+    finally:
+        _folding.discard(email)
+
+
+async def build_history(email, fallback=""):
+    if not SERVER_MEMORY or not email:
+        return fallback
+    messages, stored = await asyncio.gather(
+        retriveRecentMessages(email, HISTORY_FETCH_LIMIT),
+        retriveSummary(email),
+    )
+    summary = stored.get('summary', '')
+    upto = stored.get('upto') or ''
+    window, older = window_messages(messages)
+    # Everything before the window should be in the summary. The fetched
+    # tail only shows whether that's so when some of it fell outside the
+    # window; if it all fit, older messages may still be waiting.
+    if older:
+        behind = older[-1]['dateTime'] > upto
+    else:
+        behind = len(messages) >= HISTORY_FETCH_LIMIT and messages[0]['dateTime'] > upto
+    if behind and email not in _folding:
+        # Folding runs after the reply; this turn still uses the previous
+        # summary, the next one picks up the new summary.
+        _folding.add(email)
+        task = asyncio.create_task(fold_history(email, summary, upto, window[0]['dateTime']))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+    lines = []
+    if summary:
+        lines.append(f"Summary of earlier conversation: {summary}")
+    lines.extend(render_turn(m) for m in window)
+    return "\n".join(lines)
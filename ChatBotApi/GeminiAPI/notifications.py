@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from GeminiAPI.utils import notificationCopy
+from database.notifyjobs import claimNotifications, completeNotification, queueNotification, retryNotification
+from database.utils1 import retriveNotifications, saveNotification
+
+load_dotenv('./config.env')
+
+logger = logging.getLogger(__name__)
+
+# Tasks written into one notificationCopy prompt, and how long the worker
+# waits for more to arrive before sending a partial batch.
+NOTIFY_BATCH = int(os.getenv("NOTIFY_BATCH", "10"))
+NOTIFY_BATCH_WAIT = float(os.getenv("NOTIFY_BATCH_WAIT", "0.5"))
+NOTIFY_POLL_SECONDS = float(os.getenv("NOTIFY_POLL_SECONDS", "2"))
+# How often an open /notifications socket checks Mongo for copy saved by
+# another worker; copy saved by this one is sent straight away.
+NOTIFY_SOCKET_POLL = float(os.getenv("NOTIFY_SOCKET_POLL", "5"))
+
+COPY_FIELDS = ("title", "body", "title1", "body1")
+
+
+def _brief(task):
+    return {key: task.get(key) for key in ("task", "summary", "desc", "startdate", "starttime", "enddate", "endtime", "daily")}
+
+
+class NotificationWorker:
+    """Writes notification copy for saved tasks off the request path.
+
+    /chat queues the task in NotificationJobs once it is stored and replies
+    with notificationPending; the worker gathers up to NOTIFY_BATCH due jobs
+    into a single prompt and saves each task's copy on its document. The
+    document is what /notifications delivers from, so the copy reaches the
+    client whichever worker wrote it and whenever the client connects. Jobs
+    survive a restart and failed batches are retried with the outbox's
+    backoff.
+    """
+
+    def __init__(self, batch=NOTIFY_BATCH, batch_wait=NOTIFY_BATCH_WAIT, poll_seconds=NOTIFY_POLL_SECONDS):
+        self.batch = batch
+        self.batch_wait = batch_wait
+        self.poll_seconds = poll_seconds
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.subscribers = {}
+        self.stats = {"queued": 0, "generated": 0, "failed": 0, "retried": 0, "dead": 0,
+                      "dropped": 0, "batches": 0, "pushed": 0}
+
+    def start(self):
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def enqueue(self, email, task_id, task):
+        try:
+            await queueNotification(email, task_id, task)
+        except Exception as e:
+            self.stats["dropped"] += 1
+            logger.warning("Error queueing notification copy for %s: %s", task_id, e)
+            return False
+        self.stats["queued"] += 1
+        self.wakeup.set()
+        return True
+
+    async def run(self):
+        while True:
+            try:
+                # Let a burst of enqueues land in one prompt.
+                await asyncio.sleep(self.batch_wait)
+                while True:
+                    jobs = await claimNotifications(self.batch)
+                    if jobs:
+                        await self.process(jobs)
+                    if len(jobs) < self.batch:
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Notification worker error: %s", e)
+            # asyncio.wait, unlike wait_for, can't swallow a stop() that lands
+            # as an enqueue sets wakeup.
+            wakeup = asyncio.ensure_future(self.wakeup.wait())
+            try:
+                await asyncio.wait([wakeup], timeout=self.poll_seconds)
+            finally:
+                wakeup.cancel()
+            self.wakeup.clear()
+
+    async def process(self, jobs):
+        try:
+            await self.generate(jobs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Error generating notification copy for %d tasks: %s", len(jobs), e)
+            for job in jobs:
+                await self.fail(job, str(e))
+
+    async def fail(self, job, error):
+        self.stats["failed"] += 1
+        if await retryNotification(job, error):
+            self.stats["retried"] += 1
+        else:
+            self.stats["dead"] += 1
+
+    async def generate(self, jobs):
+        self.stats["batches"] += 1
+        copies = await notificationCopy([dict(_brief(job["task"]), id=str(index)) for index, job in enumerate(jobs)])
+        for index, job in enumerate(jobs):
+            item = copies.get(str(index))
+            if not item:
+                await self.fail(job, "Missing from notificationCopy response")
+                continue
+            notification = {key: item.get(key) for key in COPY_FIELDS}
+            notification["at"] = datetime.utcnow()
+            saved = await saveNotification(job["task_id"], notification)
+            if saved.get("code") == 500:
+                await self.fail(job, saved["msg"])
+                continue
+            # A 404 means the task was deleted meanwhile; nothing to retry. A
+            # superseded job's copy is overwritten by the newer one shortly.
+            current = await completeNotification(job)
+            if saved.get("code") != 200 or not current:
+                continue
+            self.stats["generated"] += 1
+            self.wake_sockets(job["email"])
+
+    def wake_sockets(self, email):
+        for event in self.subscribers.get(email, ()):
+            event.set()
+
+    async def deliveries(self, email, since=None):
+        """Yield the user's saved copy as it appears, oldest first.
+
+        Starts with everything saved after since (ever, when since is
+        None), skipping tasks already over, then waits for this worker to save more or, for
+        copy saved elsewhere, NOTIFY_SOCKET_POLL seconds.
+        """
+        event = asyncio.Event()
+        self.subscribers.setdefault(email, set()).add(event)
+        try:
+            while True:
+                event.clear()
+                today = datetime.now().strftime("%Y-%m-%d")
+                for message in await retriveNotifications(email, since):
+                    since = message["at"]
+                    if not message.get("daily") and (message.get("enddate") or message.get("startdate") or "") < today:
+                        continue
+                    self.stats["pushed"] += 1
+                    yield message
+                # asyncio.wait rather than wait_for, which can swallow the
+                # cancellation of a socket closing as copy arrives.
+                waiter = asyncio.ensure_future(event.wait())
+                try:
+                    await asyncio.wait([waiter], timeout=NOTIFY_SOCKET_POLL)
+                finally:
+                    waiter.cancel()
+        finally:
+            subscribers = self.subscribers.get(email)
+            if subscribers is not None:
+                subscribers.discard(event)
+                if not subscribers:
+                    del self.subscribers[email]
+
+
+notification_worker = NotificationWorker()
@@ -0,0 +1,305 @@
+import hashlib
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+from string import Formatter
+from textwrap import dedent
+from dotenv import load_dotenv
+
+load_dotenv('./config.env')
+
+logger = logging.getLogger(__name__)
+
+# Every this many calls a template's average token counts are logged at
+# INFO; 0 leaves them to DEBUG and /metrics.
+TOKEN_LOG_EVERY = int(os.getenv("TOKEN_LOG_EVERY", "100"))
+
+CLOCK_FIELDS = {"current_date", "current_day", "current_time"}
+
+
+def clock():
+    now = datetime.now()
+    return {
+        "current_date": now.strftime("%Y-%m-%d"),
+        "current_day": now.strftime("%A"),
+        "current_time": now.strftime("%H:%M"),
+    }
+
+
+class PromptTemplate:
+    """A prompt split into a static system instruction, sent once per model,
+    and a small context block that is formatted on every call. Date and time
+    fields are filled from the clock at render time."""
+
+    def __init__(self, name, system, context, json=True):
+        self.name = name
+        self.system = dedent(system).strip()
+        self.context = dedent(context).strip()
+        self.json = json
+        self.fields = {field for _, field, _, _ in Formatter().parse(self.context) if field}
+        self.uses_clock = bool(self.fields & CLOCK_FIELDS)
+        # Part of every cache key, so editing a template never serves answers
+        # produced by the old wording.
+        self.digest = hashlib.sha256(self.system.encode()).hexdigest()[:12]
+
+    def render(self, **fields):
+        if self.uses_clock:
+            fields = {**clock(), **fields}
+        return self.context.format(**fields)
+
+
+class TokenUsage:
+    def __init__(self):
+        self.stats = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0})
+
+    def record(self, name, usage):
+        if usage is None:
+            return
+        prompt = getattr(usage, "prompt_token_count", 0) or 0
+        completion = getattr(usage, "candidates_token_count", 0) or 0
+        cached = getattr(usage, "cached_content_token_count", 0) or 0
+        entry = self.stats[name or "raw"]
+        entry["calls"] += 1
+        entry["prompt_tokens"] += prompt
+        entry["completion_tokens"] += completion
+        entry["cached_tokens"] += cached
+        logger.debug("Gemini tokens [%s]: prompt=%d completion=%d cached=%d", name or "raw", prompt, completion, cached)
+        if TOKEN_LOG_EVERY and entry["calls"] % TOKEN_LOG_EVERY == 0:
+            calls = entry["calls"]
+            logger.info("Gemini tokens [%s] over %d calls: prompt=%.0f completion=%.0f cached=%.0f per call",
+                        name or "raw", calls, entry["prompt_tokens"] / calls,
+                        entry["completion_tokens"] / calls, entry["cached_tokens"] / calls)
+
+    def per_call(self):
+        return {
+            name: {
+                "prompt": entry["prompt_tokens"] / entry["calls"],
+                "completion": entry["completion_tokens"] / entry["calls"],
+            }
+            for name, entry in self.stats.items() if entry["calls"]
+        }
+
+
+token_usage = TokenUsage()
+
+TEMPLATES = {}
+
+
+def register(template):
+    TEMPLATES[template.name] = template
+    return template
+
+
+register(PromptTemplate("generalDialog", """
+    You are a helpful and versatile assistant. You have to answer general knowledge questions, manage user tasks, and handle calendar requests.
+
+    - can not do multiple task at a time.
+    - based on user query you can do following actions
+      - answer any questions user have and try to help according to your knowledge.
+      additionally you can
+      - add task into the calendar (for this start dateTime and end dateTime required)
+      - update specific task
+      - delete specific task
+    - current tasks of the user is given to you in chat history
+    - Some important instruction to follow:
+      - in case of adding task
+        - if user has provided start date and time then it must be of future not past. (current date and time provided to you).
+        - if only start date time provided then ask user for providing end datetime.
+        - if user not want to give endtime then take 1 minute by default.
+      - in case of updating task
+        - if the updated event is added to calendar and update is on timing then updated timing must be in future with respect to current timing.
+      - in case of deleting task
+        - important -> take confirmation from user that the action can not be undone and specify task that you are going to delete.
+        - while asking for confirmation make dbAction to noAction
+    - if user wants to retrive task then give in setence format rather than json format.
+    - for performing corrsponding action to database before response sended to user make dbAction = action to be performed and isInfoIncomplete = False.
+    - never specify anyting regarding Changes saved to database but notification not allowed. you can allow notification in the app settings. in your response.
+    - Context (today's date, current time, previous conversation and user input) is given in the user message.
+    - Your response should be in JSON format with the following structure:
+    {
+        "text": "Response text to the user",
+        "isInfoIncomplete": true/false,  # true if more information is needed; false if information is enough to perform operation on database
+        "dbAction": "add/update/delete/noaction",  # Action to perform in the database
+        "calendarAction":"add/update/delete/noaction" # Action to perform in calendar
+        decide payload based on dbAction rather than calendarAction.
+        "payload": {
+            - for adding task it should have following structure
+              "task": "<e.g., 'meeting', 'reminder', 'to-do'>",
+              "desc": "Description of the task for Google Calendar (if all information is gathered)",
+              "summary": "Summary of the task for Google Calendar (if all information is gathered)",
+              --optional fields
+              "startdate": "<date in YYYY-MM-DD format if specified>",
+              "starttime": "<time in HH:MM format if specified>",
+              "enddate": "<date in YYYY-MM-DD format if specified>",
+              "endtime": "<time in HH:MM format if specified>",
+              "daily":"daily event true / false"
+              "other_info": "<other relevant information for the task>"
+
+            - for updating task it should have following structure.
+              "_id": id of the task to be updated.
+              "updatedPayload":{
+                "full object from dataresult with updated field."
+              }
+              e.g  'updatedPayload': ('task_id': 'id of task', 'task': ('task': 'meeting', 'desc': 'meeting with fenil', 'summary': 'meeting with fenil', 'startdate': '2025-01-03', 'starttime': '16:00', 'enddate': '2025-01-03', 'endtime': '19:00', 'other_info': None, 'addedToCalendar': True))
+
+            - for deleting task it should have following structure.
+              "deletePayload":[list of objects of form Object("_id":"","addedToCalendar":"")] or none
+
+        }  # This section is required if dbAction is other than noaction.
+    }
+""", """
+    - Context:
+      - Today Date and Day: {current_date} ({current_day})
+      - Current Time: {current_time}
+      - Previous Conversation: {chat_history}
+      - User Input: "{user_input}"
+"""))
+
+register(PromptTemplate("messageGenerator", """
+    # you are message provide which is creative and beautifull to the given task.
+    - give title and body as a output.
+    - each time msg title and body should be completly different from given.
+    - the task is given in the user message.
+
+    - Output response
+    {
+      "title":"should contains title of notification given to user."
+      "body":"should contains the body of notification given to user."
+    }
+""", """
+    - Context
+      - Task : {task}
+"""))
+
+register(PromptTemplate("conflictChecker", """
+    # first task : you are conflict checker.
+    - you are given with list of task already added and conflict information.
+    - give output isConflict = true if conflict information is not empty;
+    - in text give message need to output to user.
+    - if same task exist in dataresult then give duplicate task message.
+    - if pastrestult is true it means the task starting time is in past so give message accroding to that to user.
+
+    # second task:
+     - output response given which should provided to user modify if need and give new text to send to user.
+
+    - Context is given in the user message.
+    - output response should be json object not array
+    - Output response
+    {
+
+      "isConflict":true/false
+      "text":response to user which gives information which tasks are overlapping
+
+      # second task
+      "response": modified response if needed.
+    }
+""", """
+    - Context
+      - Conflict information:{conflict_result}
+      - is start time in past : {past_result}
+      - dataResult:{data_result}
+      - intent:{intent}
+      - task : {task}
+      - Today Date and Day: {current_date} ({current_day})
+      - Current Time: {current_time}
+      - response provided to user : {response}
+"""))
+
+register(PromptTemplate("notificationCopy", """
+    # you write notification messages for a list of tasks.
+    - each task in the list has an id; give one output item per task with the same id.
+    - for each task :
+      - first notification is shown at the time the task starts
+      which contains good and creative beautiful message related to task and make mood for user to start that task.
+      - second notification is shown some time after the task starts
+      which contains good and creative beautiful interactive message related to task.
+      - use task information provided to you.
+    - the tasks are given in the user message.
+
+    - Output response
+    {
+      "notifications": [
+        {
+          "id": "id of the task as given",
+          "title": "title of the first notification" eg. Time for sweet dreams
+          "body": "body of the first notification" eg. You got your sleep now please go to bed.
+          "title1": "title of intereactive msg by bot to the user",
+          "body1": "body of intereactive msg by bot to the user"
+        }
+      ]
+    }
+""", """
+    - Context
+      - Tasks : {tasks}
+"""))
+
+register(PromptTemplate("search", """
+    user has following query and chat history please give answer of user.
+    just output the answer only.
+""", """
+    Context:
+      - User input : {user_input}
+      - Chat history : {chat_history}
+      - Today date and day : {current_date} {current_day}
+      - Current Time : {current_time}
+""", json=False))
+
+register(PromptTemplate("classify", """
+    - you are given with user sentence and history.
+    - based on that please classify it to one of the following
+        1.first : if related to task management like retrive,delete tasks information on task available etc.
+        2.second : if real time and general information required which is seprate from task management application.
+
+    output in following format
+    {
+      res:"first/second"
+      history : if res is second then from chat history put some part which is required to solve the user input.
+    }
+""", """
+    - Context:
+      user input : {user_input}
+      chat history : {chat_history}
+"""))
+
+register(PromptTemplate("conversaction", """
+    # you have a general conversation with user.
+    - history and msg of user provided to you
+    - in response give msg which i should give to user.
+    - output in 70 word max.
+    - Output response
+    {
+      res:"response need to give to the user.
+    }
+""", """
+    Context :
+      - message : {msg}
+      - history : {history}
+"""))
+
+register(PromptTemplate("summarizeConversation", """
+    # you maintain a running summary of a conversation between a user and a task assistant.
+    - merge the previous summary with the new turns.
+    - keep facts that matter later: user preferences, pending questions, tasks discussed and their dates/times, confirmations asked.
+    - drop greetings and small talk.
+    - output in 150 word max.
+    - Output response
+    {
+      "summary":"updated summary"
+    }
+""", """
+    - Context
+      - previous summary : {summary}
+      - new turns : {turns}
+"""))
+
+register(PromptTemplate("conversactionStream", """
+    # you have a general conversation with user.
+    - history and msg of user provided to you
+    - reply with the plain text msg which i should give to user, no json.
+    - output in 70 word max.
+""", """
+    Context :
+      - message : {msg}
+      - history : {history}
+""", json=False))
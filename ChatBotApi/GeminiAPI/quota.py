@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from admission.limits import Throttled, TokenBucket
+from monitoring.metrics import registry
+
+load_dotenv('./config.env')
+
+logger = logging.getLogger(__name__)
+
+# The project's Gemini quota. Requests are paced to stay under it rather than
+# finding it with a 429 and failing the user's request.
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "2000"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "4000000"))
+# Longest a call waits for quota before the request is answered with a 429.
+GEMINI_QUOTA_WAIT = float(os.getenv("GEMINI_QUOTA_WAIT", "5"))
+# How long to stop sending after Gemini itself answers 429.
+GEMINI_QUOTA_BACKOFF = float(os.getenv("GEMINI_QUOTA_BACKOFF", "10"))
+# Tokens assumed for the answer until the real count comes back.
+GEMINI_OUTPUT_ESTIMATE = int(os.getenv("GEMINI_OUTPUT_ESTIMATE", "300"))
+
+quota_total = registry.counter("gemini_quota_total", "Gemini calls sent, paced or refused by the quota scheduler.")
+quota_wait = registry.histogram("gemini_quota_wait_seconds", "Time Gemini calls waited for quota.")
+
+
+def estimate_tokens(prompt, template=None):
+    # About four characters per token for English; good enough for pacing,
+    # the bucket is corrected once usage comes back.
+    chars = len(prompt) + (len(template.system) if template else 0)
+    return chars // 4 + GEMINI_OUTPUT_ESTIMATE
+
+
+def is_quota_error(error):
+    # google-generativeai raises ResourceExhausted and google-genai an
+    # APIError; both carry the HTTP status as .code.
+    return getattr(error, "code", None) == 429
+
+
+class GeminiQuota:
+    """Process-wide scheduler for Gemini calls.
+
+    Two reservation buckets, requests and tokens, each holding a quarter of
+    a minute's quota so bursts are smoothed instead of spending the whole
+    minute up front. Calls wait in arrival order for their share; a call
+    that would wait longer than max_wait raises Throttled instead.
+    """
+
+    def __init__(self, rpm, tpm, max_wait=GEMINI_QUOTA_WAIT):
+        self.requests = TokenBucket(rpm / 60, max(1.0, rpm / 4))
+        self.tokens = TokenBucket(tpm / 60, max(1.0, tpm / 4))
+        self.max_wait = max_wait
+        self.paused_until = 0.0
+
+    async def acquire(self, prompt, template=None):
+        estimate = min(estimate_tokens(prompt, template), self.tokens.burst)
+        pause = self.paused_until - time.monotonic()
+        wait = max(pause, self.requests.wait_for(), self.tokens.wait_for(estimate))
+        if wait > self.max_wait:
+            quota_total.inc(outcome="refused")
+            raise Throttled(wait, "Gemini quota")
+        self.requests.take()
+        self.tokens.take(estimate)
+        if wait > 0:
+            quota_total.inc(outcome="paced")
+            quota_wait.observe(wait)
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.requests.give()
+                self.tokens.give(estimate)
+                raise
+        quota_total.inc(outcome="sent")
+        return estimate
+
+    def settle(self, estimate, usage):
+        """Correct the token bucket with what the call actually used."""
+        if usage is None:
+            return
+        used = getattr(usage, "total_token_count", 0) or 0
+        if not used:
+            return
+        if used > estimate:
+            self.tokens.take(used - estimate)
+        else:
+            self.tokens.give(estimate - used)
+
+    def rejected(self, error):
+        """Turn a 429 from Gemini into Throttled and hold every call back
+        for GEMINI_QUOTA_BACKOFF; other errors pass through untouched."""
+        if not is_quota_error(error):
+            return error
+        self.paused_until = max(self.paused_until, time.monotonic() + GEMINI_QUOTA_BACKOFF)
+        quota_total.inc(outcome="rejected_upstream")
+        logger.warning("Gemini quota exhausted, pausing calls for %.0fs", GEMINI_QUOTA_BACKOFF)
+        return Throttled(GEMINI_QUOTA_BACKOFF, "Gemini quota")
+
+
+gemini_quota = GeminiQuota(GEMINI_RPM, GEMINI_TPM)
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from dotenv import load_dotenv
+from admission.limits import Throttled
+from GeminiAPI.client import MODEL_ID
+
+load_dotenv('./config.env')
+
+logger = logging.getLogger(__name__)
+
+GEMINI_HEDGE = os.getenv("GEMINI_HEDGE", "true").lower() == "true"
+# A duplicate call goes out once the first has run longer than this
+# percentile of the template's recent latencies.
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+# Used until a template has GEMINI_HEDGE_MIN_SAMPLES latencies recorded.
+GEMINI_HEDGE_DELAY = float(os.getenv("GEMINI_HEDGE_DELAY", "3"))
+GEMINI_HEDGE_MIN_DELAY = float(os.getenv("GEMINI_HEDGE_MIN_DELAY", "0.3"))
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+# Hedges allowed as a share of all calls, so a slow spell can't double the
+# quota spend.
+GEMINI_HEDGE_BUDGET = float(os.getenv("GEMINI_HEDGE_BUDGET", "0.1"))
+
+GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE", "30"))
+# Seconds a template's call (hedge included) may take before it is abandoned.
+GEMINI_DEADLINES = {
+    "classify": float(os.getenv("GEMINI_DEADLINE_CLASSIFY", "8")),
+    "generalDialog": float(os.getenv("GEMINI_DEADLINE_DIALOG", "15")),
+    "conflictChecker": float(os.getenv("GEMINI_DEADLINE_CONFLICT", "15")),
+    "search": float(os.getenv("GEMINI_DEADLINE_SEARCH", "25")),
+}
+
+GEMINI_BREAKER_WINDOW = float(os.getenv("GEMINI_BREAKER_WINDOW", "30"))
+GEMINI_BREAKER_MIN_CALLS = int(os.getenv("GEMINI_BREAKER_MIN_CALLS", "10"))
+GEMINI_BREAKER_ERROR_RATE = float(os.getenv("GEMINI_BREAKER_ERROR_RATE", "0.5"))
+GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "15"))
+# Served while the breaker is open; without one, calls fail fast instead.
+GEMINI_FALLBACK_MODEL = os.getenv("GEMINI_FALLBACK_MODEL")
+
+LATENCY_WINDOW = 200
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Opens when at least min_calls calls in the last window seconds
+    failed at error_rate or worse. After cooldown one probe call is let
+    through; its outcome closes the breaker or opens it again."""
+
+    def __init__(self, window=GEMINI_BREAKER_WINDOW, min_calls=GEMINI_BREAKER_MIN_CALLS,
+                 error_rate=GEMINI_BREAKER_ERROR_RATE, cooldown=GEMINI_BREAKER_COOLDOWN):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.outcomes = deque()
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record(self, ok):
+        now = time.monotonic()
+        if self.probing:
+            self.probing = False
+            self.outcomes.clear()
+            self.opened_at = None if ok else now
+            return
+        self.outcomes.append((now, ok))
+        while self.outcomes and now - self.outcomes[0][0] > self.window:
+            self.outcomes.popleft()
+        failures = sum(1 for _, success in self.outcomes if not success)
+        if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.error_rate:
+            logger.warning("Gemini circuit opened: %d of %d calls failed", failures, len(self.outcomes))
+            self.opened_at = now
+            self.outcomes.clear()
+
+
+def _cancel(tasks):
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+
+
+class Resilience:
+    """Wraps one Gemini call with a deadline, a hedge and a circuit breaker.
+
+    call(name, fn) runs fn(model_id, granted), where fn calls granted()
+    once the Gemini quota lets it go out. If it hasn't answered by the
+    template's hedge delay after that, a second fn is started and whichever
+    succeeds first wins; the loser is cancelled. hedge=False skips the
+    second call, for results that can't simply be dropped, like an open
+    stream.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.breaker = CircuitBreaker()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_won": 0, "deadline": 0, "fallback": 0, "rejected": 0}
+
+    def hedge_delay(self, name):
+        samples = self.latencies.get(name)
+        if not samples or len(samples) < GEMINI_HEDGE_MIN_SAMPLES:
+            return GEMINI_HEDGE_DELAY
+        ordered = sorted(samples)
+        index = max(0, math.ceil(GEMINI_HEDGE_PERCENTILE / 100 * len(ordered)) - 1)
+        return max(GEMINI_HEDGE_MIN_DELAY, ordered[index])
+
+    def _observe(self, name, seconds):
+        self.latencies.setdefault(name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def _may_hedge(self):
+        return GEMINI_HEDGE and self.stats["hedged"] < GEMINI_HEDGE_BUDGET * self.stats["calls"]
+
+    async def _hedged(self, name, call, hedge=True):
+        granted = asyncio.Event()
+        first = asyncio.ensure_future(call(granted.set))
+        tasks = [first]
+        waiter = asyncio.ensure_future(granted.wait())
+        try:
+            # Time spent waiting for quota isn't Gemini being slow, and a
+            # duplicate would only wait behind it.
+            await asyncio.wait([first, waiter], return_when=asyncio.FIRST_COMPLETED)
+            start = time.monotonic()
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(name))
+            if not done and hedge and self._may_hedge():
+                self.stats["hedged"] += 1
+                tasks.append(asyncio.ensure_future(call(lambda: None)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.stats["hedge_won"] += 1
+                        self._observe(name, time.monotonic() - start)
+                        return task.result()
+            # Every attempt failed; report the original call's error.
+            raise first.exception()
+        finally:
+            _cancel(tasks + [waiter])
+
+    async def call(self, name, fn, hedge=True):
+        self.stats["calls"] += 1
+        deadline = GEMINI_DEADLINES.get(name, GEMINI_DEADLINE)
+        if not self.breaker.allow():
+            if not GEMINI_FALLBACK_MODEL:
+                self.stats["rejected"] += 1
+                raise CircuitOpen(f"Gemini circuit open, not calling {name}")
+            self.stats["fallback"] += 1
+            return await asyncio.wait_for(fn(GEMINI_FALLBACK_MODEL, lambda: None), deadline)
+        try:
+            call = lambda granted: fn(MODEL_ID, granted)
+            result = await asyncio.wait_for(self._hedged(name, call, hedge), deadline)
+        except (Throttled, asyncio.CancelledError):
+            # Our own quota pacing or a caller going away says nothing about
+            # Gemini's health; just free the probe slot if this was it.
+            self.breaker.probing = False
+            raise
+        except asyncio.TimeoutError:
+            self.stats["deadline"] += 1
+            self.breaker.record(False)
+            raise
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True)
+        return result
+
+
+resilience = Resilience()
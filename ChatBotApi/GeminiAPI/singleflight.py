@@ -0,0 +1,68 @@
+import asyncio
+import copy
+import os
+from dotenv import load_dotenv
+
+load_dotenv('./config.env')
+
+SINGLE_FLIGHT = os.getenv("GEMINI_SINGLE_FLIGHT", "true").lower() == "true"
+
+
+class Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one in-flight call.
+
+    Unlike the response cache nothing outlives the call: once it finishes the
+    next caller starts a fresh one. Every caller gets its own copy of the
+    result, so callers that mutate it don't see each other's changes.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.stats = {"calls": 0, "coalesced": 0, "errors": 0}
+
+    async def do(self, key, fn):
+        self.stats["calls"] += 1
+        if not SINGLE_FLIGHT:
+            return await fn()
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = Flight(asyncio.create_task(fn()))
+            self.flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._land(key, flight))
+        else:
+            self.stats["coalesced"] += 1
+        flight.waiters += 1
+        try:
+            # Shielded so one caller going away doesn't cancel the call for
+            # the others; it is only cancelled once nobody is waiting.
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Cancellation only lands on the next loop turn; unregister
+                # now so a caller arriving before then starts a fresh call
+                # instead of joining one that is about to be cancelled.
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+                flight.task.cancel()
+        return copy.deepcopy(result)
+
+    def _land(self, key, flight):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            self.stats["errors"] += 1
+
+    def coalesce_rate(self):
+        return self.stats["coalesced"] / self.stats["calls"] if self.stats["calls"] else 0.0
+
+
+single_flight = SingleFlight()
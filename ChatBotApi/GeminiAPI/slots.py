@@ -0,0 +1,324 @@
+import os
+import re
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv('./config.env')
+
+LOCAL_SLOTS = os.getenv("LOCAL_SLOTS", "true").lower() == "true"
+
+# Deterministic slot filling for plain task commands. Anything the rules
+# below can't read with certainty (two times, a bare "at 5", "every monday",
+# "this evening", several matching tasks...) returns None and the turn goes
+# through classify and generalDialog as before.
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august",
+          "september", "october", "november", "december"]
+_month = r"(?P<month>jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_clock = r"\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)?"
+
+ADD_RE = re.compile(r"^\s*(?:please\s+|can you\s+|could you\s+)?"
+                    r"(?:remind me(?:\s+to)?|add(?:\s+an?)?(?:\s+(?:task|event|reminder))?(?:\s+to)?|"
+                    r"schedule(?:\s+an?)?|create(?:\s+an?)?(?:\s+(?:task|event|reminder))?(?:\s+to)?|"
+                    r"set up(?:\s+an?)?|book(?:\s+an?)?)\b", re.IGNORECASE)
+DELETE_RE = re.compile(r"^\s*(?:please\s+)?(?:delete|remove|cancel)\s+(?:my\s+|the\s+)?(?P<what>.+?)"
+                       r"(?:\s+(?:task|event|reminder|meeting))?\s*[.!]?\s*$", re.IGNORECASE)
+
+RANGE_RE = re.compile(rf"\b(?:from\s+)?(?P<start>{_clock})\s*(?:-|to|until|till)\s*(?P<end>{_clock})(?![\w:])", re.IGNORECASE)
+TIME_RE = re.compile(rf"\b(?:at\s+)?(?P<time>{_clock}|noon|midnight)(?![\w:])", re.IGNORECASE)
+UNTIL_RE = re.compile(rf"\b(?:until|till)\s+(?P<time>{_clock}|noon|midnight)(?![\w:])", re.IGNORECASE)
+DURATION_RE = re.compile(r"\bfor\s+(?P<amount>\d+(?:\.\d+)?|an?|half an)\s*(?P<unit>hours?|hrs?|minutes?|mins?)"
+                         r"(?:\s+(?:and\s+)?(?P<extra>\d+)\s*(?:minutes?|mins?))?\b", re.IGNORECASE)
+DAILY_RE = re.compile(r"\b(?:every\s*day|daily|each day)\b", re.IGNORECASE)
+
+ISO_DATE_RE = re.compile(r"\b(?:on\s+)?(?P<date>\d{4}-\d{2}-\d{2})\b")
+RELATIVE_RE = re.compile(r"\b(?:on\s+)?(?P<word>today|tomorrow|day after tomorrow)\b", re.IGNORECASE)
+IN_DAYS_RE = re.compile(r"\bin\s+(?P<days>\d+|a|one|two|three)\s+days?\b", re.IGNORECASE)
+WEEKDAY_RE = re.compile(r"\b(?:on\s+|next\s+|this\s+|coming\s+)?(?P<weekday>monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b",
+                        re.IGNORECASE)
+DAY_MONTH_RE = re.compile(rf"\b(?:on\s+)?(?:the\s+)?(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?{_month}\b", re.IGNORECASE)
+MONTH_DAY_RE = re.compile(rf"\b(?:on\s+)?{_month}\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\b", re.IGNORECASE)
+
+# Phrases we can't pin to a clock time or a supported recurrence.
+VAGUE_RE = re.compile(r"\b(morning|afternoon|evening|tonight|night|noonish|later|soon|weekly|monthly|every\s+(?!day)\w+|"
+                      r"weekend|next week|next month|and then|also)\b|\?", re.IGNORECASE)
+
+FILLER_RE = re.compile(r"^(?:to|about|for|that|regarding|on|at)\s+|\s+(?:to|for|on|at|from)$", re.IGNORECASE)
+STOPWORDS = {"my", "the", "a", "an", "task", "event", "reminder", "meeting", "please", "for", "to", "on", "at", "of"}
+SMALL_NUMBERS = {"a": 1, "one": 1, "two": 2, "three": 3}
+
+stats = {"parsed": 0, "deferred": 0}
+
+
+def parse_clock(text):
+    """HH:MM for '5pm', '5:30 pm', '17:30', 'noon'; None when a bare hour
+    could be morning or evening."""
+    text = text.lower().replace(".", "").replace(" ", "")
+    if text == "noon":
+        return "12:00"
+    if text == "midnight":
+        return "00:00"
+    match = re.fullmatch(r"(\d{1,2})(?::(\d{2}))?(am|pm)?", text)
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if minute > 59:
+        return None
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    elif hour > 23 or (hour <= 12 and not match.group(1).startswith("0") and hour != 0):
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _meridiem(text):
+    text = text.lower().replace(".", "")
+    return "pm" if text.endswith("pm") else "am" if text.endswith("am") else ""
+
+
+def _next_weekday(today, name):
+    days = (WEEKDAYS.index(name.lower()) - today.weekday()) % 7
+    return today + timedelta(days=days or 7)
+
+
+def _month_index(name):
+    name = name.lower()
+    return next(index for index, month in enumerate(MONTHS, 1) if month.startswith(name[:3]))
+
+
+def _calendar_date(today, month, day):
+    try:
+        date = today.replace(month=month, day=day)
+        if date < today:
+            date = date.replace(year=today.year + 1)
+    except ValueError:
+        return None
+    return date
+
+
+class Slots:
+    """Collects the spans each rule consumed so what is left is the title."""
+
+    def __init__(self, text):
+        self.text = text
+        self.used = []
+
+    def find(self, pattern):
+        matches = [m for m in pattern.finditer(self.text) if not self._overlaps(m.span())]
+        if len(matches) > 1:
+            raise ValueError("ambiguous")
+        if matches:
+            self.used.append(matches[0].span())
+            return matches[0]
+        return None
+
+    def _overlaps(self, span):
+        return any(span[0] < end and start < span[1] for start, end in self.used)
+
+    def rest(self):
+        parts, last = [], 0
+        for start, end in sorted(self.used):
+            parts.append(self.text[last:start])
+            last = end
+        parts.append(self.text[last:])
+        rest = re.sub(r"\s+", " ", " ".join(parts)).strip(" ,.!")
+        previous = None
+        while rest != previous:
+            previous, rest = rest, FILLER_RE.sub("", rest).strip(" ,.!")
+        return rest
+
+
+def parse_date(slots, today):
+    found = []
+    for pattern in (ISO_DATE_RE, RELATIVE_RE, IN_DAYS_RE, WEEKDAY_RE, DAY_MONTH_RE, MONTH_DAY_RE):
+        match = slots.find(pattern)
+        if match:
+            found.append((pattern, match))
+    if len(found) > 1:
+        raise ValueError("ambiguous")
+    if not found:
+        return None
+    pattern, match = found[0]
+    if pattern is ISO_DATE_RE:
+        return datetime.strptime(match.group("date"), "%Y-%m-%d").date()
+    if pattern is RELATIVE_RE:
+        word = match.group("word").lower()
+        return today + timedelta(days={"today": 0, "tomorrow": 1}.get(word, 2))
+    if pattern is IN_DAYS_RE:
+        days = match.group("days").lower()
+        return today + timedelta(days=int(days) if days.isdigit() else SMALL_NUMBERS[days])
+    if pattern is WEEKDAY_RE:
+        return _next_weekday(today, match.group("weekday"))
+    date = _calendar_date(today, _month_index(match.group("month")), int(match.group("day")))
+    if date is None:
+        raise ValueError("no such date")
+    return date
+
+
+def parse_duration(match):
+    amount, unit = match.group("amount").lower(), match.group("unit").lower()
+    value = 0.5 if amount == "half an" else 1 if amount in ("a", "an") else float(amount)
+    minutes = value * 60 if unit.startswith("h") else value
+    minutes += int(match.group("extra") or 0)
+    return timedelta(minutes=minutes) if minutes > 0 else None
+
+
+def parse_add(text, now):
+    if not ADD_RE.match(text) or VAGUE_RE.search(text):
+        return None
+    slots = Slots(text)
+    slots.used.append(ADD_RE.match(text).span())
+    daily = bool(slots.find(DAILY_RE))
+    date = parse_date(slots, now.date())
+    # Before the clock rules, so "for 30 minutes" isn't read as a time.
+    duration = slots.find(DURATION_RE)
+
+    start = end = None
+    span = slots.find(RANGE_RE)
+    if span:
+        end_text = span.group("end")
+        start_text = span.group("start")
+        # "5 to 6pm": the start borrows the end's am/pm.
+        if not _meridiem(start_text) and _meridiem(end_text):
+            start_text += _meridiem(end_text)
+        start, end = parse_clock(start_text), parse_clock(end_text)
+        if start is None or end is None:
+            return None
+    else:
+        until = slots.find(UNTIL_RE)
+        at = slots.find(TIME_RE)
+        if at is None:
+            return None
+        start = parse_clock(at.group("time"))
+        end = parse_clock(until.group("time")) if until else None
+        if start is None or (until and end is None):
+            return None
+
+    if duration and end:
+        return None
+    # "at 5pm" with no day means today.
+    date = date or now.date()
+    start_at = datetime.combine(date, datetime.strptime(start, "%H:%M").time())
+    if start_at <= now and not daily:
+        # New tasks must start in the future; let the model explain that.
+        return None
+    if end:
+        end_at = datetime.combine(date, datetime.strptime(end, "%H:%M").time())
+        if end_at <= start_at:
+            return None
+    elif duration:
+        length = parse_duration(duration)
+        if length is None:
+            return None
+        end_at = start_at + length
+    else:
+        end_at = None
+
+    title = slots.rest()
+    if not title or len(title) > 80:
+        return None
+    return title, start_at, end_at, daily
+
+
+def add_response(title, start_at, end_at, daily):
+    summary = title[0].upper() + title[1:]
+    payload = {
+        "task": title,
+        "desc": summary,
+        "summary": summary,
+        "startdate": start_at.strftime("%Y-%m-%d"),
+        "starttime": start_at.strftime("%H:%M"),
+        "daily": daily,
+        "other_info": None,
+    }
+    if end_at is None:
+        when = f"{payload['startdate']} at {payload['starttime']}"
+        return {
+            "text": f"When should '{summary}' on {when} end? Give me an end time, or say no end time.",
+            "isInfoIncomplete": True,
+            "dbAction": "noaction",
+            "calendarAction": "noaction",
+            "payload": payload,
+        }
+    payload["enddate"] = end_at.strftime("%Y-%m-%d")
+    payload["endtime"] = end_at.strftime("%H:%M")
+    return {
+        "text": f"Added '{summary}' on {payload['startdate']} from {payload['starttime']} to {payload['endtime']}"
+                f"{' every day' if daily else ''}.",
+        "isInfoIncomplete": False,
+        "dbAction": "add",
+        "calendarAction": "add",
+        "payload": payload,
+    }
+
+
+def _words(text):
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS}
+
+
+def parse_delete(text, tasks):
+    match = DELETE_RE.match(text)
+    if not match or VAGUE_RE.search(text):
+        return None
+    wanted = _words(match.group("what"))
+    if not wanted:
+        return None
+    found = []
+    for entry in tasks:
+        task = entry.get("task") or {}
+        if not isinstance(task, dict):
+            continue
+        names = _words(" ".join(str(task.get(key) or "") for key in ("task", "summary", "desc")))
+        if wanted <= names:
+            found.append(entry)
+    if len(found) != 1:
+        return None
+    task = found[0]["task"]
+    name = task.get("summary") or task.get("task")
+    when = f" on {task['startdate']} at {task['starttime']}" if task.get("startdate") and task.get("starttime") else ""
+    # Deleting can't be undone, so like generalDialog we only ask here; the
+    # user's "yes" goes to the model with this question in the history.
+    return {
+        "text": f"I'm going to delete '{name}'{when}. This can't be undone. Shall I go ahead?",
+        "isInfoIncomplete": True,
+        "dbAction": "noaction",
+        "calendarAction": "noaction",
+    }
+
+
+def mentioned_tasks(text, tasks, today=None):
+    """Tasks the request names, or that start on a date it gives."""
+    today = today or datetime.now().date()
+    try:
+        date = parse_date(Slots(text), today)
+    except ValueError:
+        date = None
+    day = date.isoformat() if date else None
+    wanted = {word for word in _words(text) if len(word) > 2 and not word.isdigit()}
+    found = []
+    for entry in tasks:
+        task = entry.get("task") or {}
+        if not isinstance(task, dict):
+            continue
+        names = _words(" ".join(str(task.get(key) or "") for key in ("task", "summary", "desc")))
+        if (day and task.get("startdate") == day) or wanted & names:
+            found.append(entry)
+    return found
+
+
+def local_dialog(user_input, tasks, now=None):
+    """A generalDialog-shaped response for a plain add or delete command, or
+    None when the model should handle the turn."""
+    if not LOCAL_SLOTS:
+        return None
+    now = now or datetime.now()
+    try:
+        parsed = parse_add(user_input, now)
+        response = add_response(*parsed) if parsed else parse_delete(user_input, tasks)
+    except ValueError:
+        response = None
+    stats["parsed" if response else "deferred"] += 1
+    return response
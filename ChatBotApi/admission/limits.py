@@ -0,0 +1,137 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from monitoring.metrics import registry
+
+load_dotenv('./config.env')
+
+ADMISSION = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Longest a request is held waiting for a token before it is turned away.
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "2"))
+ADMISSION_MAX_KEYS = int(os.getenv("ADMISSION_MAX_KEYS", "10000"))
+
+
+def _limit(name, user_rpm, user_burst, endpoint_rps):
+    return (
+        float(os.getenv(f"ADMISSION_{name}_USER_RPM", str(user_rpm))),
+        float(os.getenv(f"ADMISSION_{name}_USER_BURST", str(user_burst))),
+        float(os.getenv(f"ADMISSION_{name}_RPS", str(endpoint_rps))),
+    )
+
+
+# endpoint: (requests per minute per user, burst per user, requests per
+# second across all users). Every one of these ends in at least one Gemini
+# call; the streaming routes share their non-streaming route's budget.
+LIMITS = {
+    "/chat": _limit("CHAT", 20, 5, 20),
+    "/conv": _limit("CONV", 30, 6, 30),
+    "/message": _limit("MESSAGE", 60, 20, 20),
+}
+
+admission_total = registry.counter("chatbot_admission_total", "Requests admitted, queued or rejected per endpoint.")
+admission_wait = registry.histogram("chatbot_admission_wait_seconds", "Time requests spent queued for admission.")
+
+
+class Throttled(Exception):
+    """Raised when a request is over budget; answered with a 429."""
+
+    def __init__(self, retry_after, reason):
+        super().__init__(f"{reason}: retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+    def header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """A token bucket that hands out reservations: the balance may go
+    negative, and a caller that takes a token from an empty bucket is told
+    how long to wait for it. Waiters are thereby served in arrival order."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, cost=1):
+        """Seconds until cost tokens would be available, without taking them."""
+        self._refill(time.monotonic())
+        if self.tokens >= cost:
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost=1):
+        self._refill(time.monotonic())
+        self.tokens -= cost
+
+    def give(self, cost=1):
+        self._refill(time.monotonic())
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+class Admission:
+    def __init__(self, limits, max_wait=ADMISSION_MAX_WAIT, max_keys=ADMISSION_MAX_KEYS):
+        self.limits = limits
+        self.max_wait = max_wait
+        self.max_keys = max_keys
+        self.endpoints = {endpoint: TokenBucket(rps, max(1.0, rps)) for endpoint, (_, _, rps) in limits.items()}
+        # (endpoint, user) -> bucket, least recently used first. A bucket
+        # evicted here was idle long enough to have refilled anyway.
+        self.users = OrderedDict()
+
+    def _user(self, endpoint, user):
+        key = (endpoint, user)
+        bucket = self.users.get(key)
+        if bucket is None:
+            rpm, burst, _ = self.limits[endpoint]
+            bucket = self.users[key] = TokenBucket(rpm / 60, burst)
+            while len(self.users) > self.max_keys:
+                self.users.popitem(last=False)
+        else:
+            self.users.move_to_end(key)
+        return bucket
+
+    async def admit(self, endpoint, user):
+        """Wait for a slot for user on endpoint, or raise Throttled when the
+        wait would be longer than max_wait."""
+        if not ADMISSION or endpoint not in self.limits:
+            return
+        user_bucket = self._user(endpoint, user)
+        endpoint_bucket = self.endpoints[endpoint]
+        user_wait = user_bucket.wait_for()
+        if user_wait > self.max_wait:
+            admission_total.inc(endpoint=endpoint, outcome="rejected_user")
+            raise Throttled(user_wait, "user rate limit")
+        endpoint_wait = endpoint_bucket.wait_for()
+        if endpoint_wait > self.max_wait:
+            admission_total.inc(endpoint=endpoint, outcome="rejected_endpoint")
+            raise Throttled(endpoint_wait, "endpoint rate limit")
+        user_bucket.take()
+        endpoint_bucket.take()
+        wait = max(user_wait, endpoint_wait)
+        if wait <= 0:
+            admission_total.inc(endpoint=endpoint, outcome="admitted")
+            return
+        admission_total.inc(endpoint=endpoint, outcome="queued")
+        admission_wait.observe(wait)
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # The client went away while queued; hand its slot back.
+            user_bucket.give()
+            endpoint_bucket.give()
+            raise
+
+
+admission = Admission(LIMITS)
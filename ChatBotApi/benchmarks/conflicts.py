@@ -0,0 +1,75 @@
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from GeminiAPI.intervals import TaskSchedule, parse_entry
+
+SIZES = [10, 100, 1000, 10000, 100000]
+
+
+def linear_conflicts(new_task, existing_tasks):
+    # The pre-index implementation of check_task_conflict, minus its prints.
+    new_task_start = datetime.strptime(f"{new_task['startdate']} {new_task['starttime']}", "%Y-%m-%d %H:%M")
+    new_task_end = datetime.strptime(f"{new_task['enddate']} {new_task['endtime']}", "%Y-%m-%d %H:%M")
+    conflicting_tasks = []
+    for task in existing_tasks:
+        task_data = task['task']
+        task_start = datetime.strptime(f"{task_data['startdate']} {task_data['starttime']}", "%Y-%m-%d %H:%M")
+        task_end = datetime.strptime(f"{task_data['enddate']} {task_data['endtime']}", "%Y-%m-%d %H:%M")
+        if task_data.get('daily', False):
+            if new_task_start.time() < task_end.time() and new_task_end.time() > task_start.time():
+                conflicting_tasks.append(task['task_id'])
+        elif new_task_start < task_end and new_task_end > task_start:
+            conflicting_tasks.append(task['task_id'])
+    return conflicting_tasks
+
+
+def make_task(rng, base, daily_ratio=0.02):
+    start = base + timedelta(minutes=rng.randrange(0, 365 * 24 * 60, 15))
+    end = start + timedelta(minutes=rng.choice([15, 30, 60, 90, 120]))
+    return {
+        "task": "meeting",
+        "startdate": start.strftime("%Y-%m-%d"),
+        "starttime": start.strftime("%H:%M"),
+        "enddate": end.strftime("%Y-%m-%d"),
+        "endtime": end.strftime("%H:%M"),
+        "daily": rng.random() < daily_ratio,
+    }
+
+
+def timed(fn, repeat):
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - begin) / repeat
+
+
+def run(sizes=SIZES, queries=50, seed=7):
+    rng = random.Random(seed)
+    base = datetime(2025, 1, 1)
+    print(f"{'tasks':>8} {'linear ms':>10} {'build ms':>10} {'query us':>10} {'resync us':>10}")
+    for size in sizes:
+        tasks = [{"task_id": str(i), "task": make_task(rng, base)} for i in range(size)]
+        probes = [make_task(rng, base, daily_ratio=0) for _ in range(queries)]
+        entries = [parse_entry(None, probe) for probe in probes]
+
+        linear_repeat = max(1, min(queries, 20000 // size))
+        linear = timed(lambda: [linear_conflicts(p, tasks) for p in probes[:linear_repeat]], 1) / linear_repeat
+
+        def build():
+            schedule = TaskSchedule()
+            schedule.sync(tasks)
+            schedule.indexes()
+            return schedule
+
+        build_time = timed(build, 1)
+        schedule = build()
+        query = timed(lambda: [schedule.conflicts(entry) for entry in entries], 1) / queries
+        resync = timed(lambda: schedule.sync(tasks), 3)
+        print(f"{size:>8} {linear * 1e3:>10.3f} {build_time * 1e3:>10.3f} {query * 1e6:>10.1f} {resync * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.conflicts [max_tasks]
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else SIZES[-1]
+    run([size for size in SIZES if size <= limit])
@@ -0,0 +1,170 @@
+import asyncio
+import contextvars
+import json
+import re
+from datetime import date, timedelta
+import httpx
+
+# (email, scripted turn) of the request being served; set by the load runner.
+current_turn = contextvars.ContextVar("current_turn", default=None)
+
+# Mean seconds per Gemini template, roughly what gemini-2.0-flash takes for
+# these prompts. Scaled by --gemini-scale.
+GEMINI_LATENCY = {
+    "classify": 0.35,
+    "generalDialog": 0.9,
+    "conflictChecker": 0.4,
+    "notificationCopy": 1.5,
+    "search": 1.2,
+    "messageGenerator": 0.5,
+    "conversaction": 0.5,
+    "conversactionStream": 0.5,
+    "summarizeConversation": 0.6,
+}
+
+
+class InjectedFailure(Exception):
+    pass
+
+
+class Latency:
+    def __init__(self, rng, scale=1.0, jitter=0.25, error_rate=0.0):
+        self.rng = rng
+        self.scale = scale
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    async def wait(self, mean):
+        mean *= self.scale
+        if mean > 0:
+            await asyncio.sleep(max(0.0, self.rng.gauss(mean, mean * self.jitter)))
+
+    def fails(self):
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+
+def fill(value, names):
+    """Replace {placeholders} in a scripted response, recursively."""
+    if isinstance(value, str):
+        return re.sub(r"\{(\w+)\}", lambda m: str(names.get(m.group(1), m.group(0))), value)
+    if isinstance(value, list):
+        return [fill(item, names) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, names) for key, item in value.items()}
+    return value
+
+
+class FakeGemini:
+    """Stands in for the three GeminiAPI.client calls. Answers are keyed by
+    prompt template; generalDialog replays the turn's scripted response."""
+
+    def __init__(self, latency, tasks_for):
+        self.latency = latency
+        self.tasks_for = tasks_for
+        self.calls = {}
+
+    async def _begin(self, name, granted=None):
+        if granted:
+            granted()
+        self.calls[name] = self.calls.get(name, 0) + 1
+        await self.latency.wait(GEMINI_LATENCY.get(name, 0.5))
+        if self.latency.fails():
+            raise InjectedFailure(f"injected Gemini failure in {name}")
+
+    async def _names(self, email):
+        tasks = await self.tasks_for(email) if email else []
+        today = date.today()
+        return {
+            "today": today.isoformat(),
+            "tomorrow": (today + timedelta(days=1)).isoformat(),
+            "last_task_id": tasks[-1]["task_id"] if tasks else "",
+        }
+
+    async def generate_json(self, prompt, template=None, model_id=None, granted=None):
+        name = template.name if template else "raw"
+        await self._begin(name, granted)
+        email, turn = current_turn.get() or (None, {})
+        if name == "classify":
+            return {"res": turn.get("intent", "first"), "history": ""}
+        if name == "generalDialog":
+            dialog = turn.get("dialog") or {"text": "Okay.", "isInfoIncomplete": False, "dbAction": "noaction",
+                                            "calendarAction": "noaction"}
+            return fill(dialog, await self._names(email))
+        if name == "conflictChecker":
+            conflict = "'isConflict': True" in prompt
+            return {"isConflict": conflict, "text": "That overlaps another task." if conflict else "",
+                    "response": "Done."}
+        if name == "notificationCopy":
+            return {"notifications": [{"id": task_id, "title": "Time to start", "body": "Your task starts now.",
+                                       "title1": "How is it going?", "body1": "Keep it up."}
+                                      for task_id in re.findall(r'"id": "(\d+)"', prompt)]}
+        if name == "summarizeConversation":
+            return {"summary": "The user manages tasks and asks questions."}
+        if name == "messageGenerator":
+            return {"title": "Reminder", "body": "Your task is coming up."}
+        return {"res": "Sure."}
+
+    async def generate_search_text(self, prompt, template=None, model_id=None, granted=None):
+        await self._begin(template.name if template else "search", granted)
+        return "Here is what I found."
+
+    async def stream_text(self, prompt, search=False, template=None, model_id=None, granted=None):
+        await self._begin(template.name if template else "raw", granted)
+        for word in "Here is what I found for you today .".split():
+            await asyncio.sleep(0)
+            yield word + " "
+
+
+class FakeCalendar:
+    """In-memory Google Calendar behind an httpx.MockTransport, one calendar
+    per access token."""
+
+    def __init__(self, latency, mean=0.15):
+        self.latency = latency
+        self.mean = mean
+        self.calendars = {}
+        self.counter = 0
+        self.requests = 0
+
+    def transport(self):
+        return httpx.MockTransport(self.handle)
+
+    def _event(self, events, body, event_id=None):
+        if event_id is None:
+            self.counter += 1
+            event_id = f"ev{self.counter}"
+        event = dict(body, id=event_id, status="confirmed")
+        events[event_id] = event
+        return event
+
+    async def handle(self, request):
+        self.requests += 1
+        await self.latency.wait(self.mean)
+        if self.latency.fails():
+            return httpx.Response(503, json={"error": {"message": "injected"}})
+        events = self.calendars.setdefault(request.headers.get("Authorization", ""), {})
+        path = request.url.path
+        if path.startswith("/batch/"):
+            return self._batch(events, request)
+        event_id = path.rsplit("/events", 1)[1].strip("/") or None
+        if request.method == "GET":
+            return httpx.Response(200, json={"items": list(events.values()), "nextSyncToken": f"s{self.counter}"})
+        if request.method == "POST":
+            return httpx.Response(200, json=self._event(events, json.loads(request.content)))
+        if request.method == "PATCH":
+            body = dict(events.get(event_id, {}), **json.loads(request.content))
+            return httpx.Response(200, json=self._event(events, body, event_id))
+        if request.method == "DELETE":
+            events.pop(event_id, None)
+            return httpx.Response(204)
+        return httpx.Response(405)
+
+    def _batch(self, events, request):
+        body = request.content.decode()
+        parts = []
+        for index, event_id in enumerate(re.findall(r"DELETE \S+/events/(\S+) HTTP", body)):
+            status = 204 if events.pop(event_id, None) is not None else 404
+            parts.append(f"--bench\r\nContent-Type: application/http\r\nContent-ID: <response-item{index}>\r\n\r\n"
+                         f"HTTP/1.1 {status} No Content\r\n\r\n\r\n")
+        content = "".join(parts) + "--bench--\r\n"
+        return httpx.Response(200, headers={"Content-Type": "multipart/mixed; boundary=bench"}, content=content)
@@ -0,0 +1,222 @@
+"""Offline load test for the FastAPI app.
+
+Gemini and Google Calendar are replaced by in-process fakes with configurable
+latency and failure rates, and Mongo by mongomock-motor, so this runs on a
+laptop with no network and no quota. Each virtual user replays the recorded
+conversations in benchmarks/conversations.json against the app.
+
+    pip install mongomock-motor
+    python -m benchmarks.load --concurrency 20 --iterations 3 --out before.json
+    python -m benchmarks.load --concurrency 20 --iterations 3 --compare before.json
+
+Results are printed as JSON with the commit they were taken on. Keep the
+flags and seed the same when comparing two commits.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from functools import partial
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def git_commit():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=HERE).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, cwd=HERE).stdout.strip())
+        return sha or "unknown", dirty
+    except OSError:
+        return "unknown", False
+
+
+def request_body(turn, email):
+    endpoint = turn["endpoint"]
+    if endpoint in ("/chat", "/chat/stream"):
+        return {"query": turn["query"], "chat_history": turn.get("chat_history", ""), "stage": "", "email": email}
+    if endpoint in ("/conv", "/conv/stream"):
+        return {"msg": turn["msg"], "history": turn.get("history", ""), "email": email}
+    if endpoint == "/message":
+        return {"task": turn["task"]}
+    return {"email": email}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, endpoint, seconds, ok):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self):
+        report = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            report[endpoint] = {
+                "count": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "mean": round(sum(values) / len(values), 4),
+                "p50": round(percentile(values, 50), 4),
+                "p95": round(percentile(values, 95), 4),
+                "p99": round(percentile(values, 99), 4),
+                "max": round(max(values), 4),
+            }
+        return report
+
+
+async def virtual_user(client, index, conversations, iterations, recorder, current_turn):
+    email = f"user{index}@bench.local"
+    headers = {"Authorization": f"Bearer bench-token-{index}"}
+    for _ in range(iterations):
+        for conversation in conversations:
+            for turn in conversation["turns"]:
+                current_turn.set((email, turn))
+                start = time.perf_counter()
+                try:
+                    response = await client.post(turn["endpoint"], json=request_body(turn, email), headers=headers)
+                    if turn["endpoint"].endswith("/stream"):
+                        await response.aread()
+                    ok = response.status_code < 400
+                except Exception:
+                    ok = False
+                recorder.record(turn["endpoint"], time.perf_counter() - start, ok)
+
+
+def stage_means():
+    from monitoring.metrics import stage_seconds
+    means = {}
+    for key, (_, total, count) in stage_seconds.values.items():
+        labels = dict(key)
+        if labels.get("stage") == "mongo":
+            continue
+        name = labels.pop("stage") + "".join(f"[{value}]" for _, value in sorted(labels.items()))
+        means[name] = {"count": count, "mean": round(total / count, 4)}
+    return dict(sorted(means.items()))
+
+
+async def run(args):
+    os.environ.setdefault("GEMINI_KEY", "offline")
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("benchmarks.load needs mongomock-motor: pip install mongomock-motor")
+    import httpx
+    import main
+    from CalendarAPI import sync
+    from admission import limits
+    from CalendarAPI.client import calendar_client
+    from GeminiAPI import utils as gemini_utils
+    from database import utils1
+    from benchmarks.fakes import FakeCalendar, FakeGemini, Latency, current_turn
+
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(args.seed)
+
+    async def tasks_for(email):
+        return (await utils1.retriveAllTask(email)).get("data", [])
+
+    gemini = FakeGemini(Latency(rng, args.gemini_scale, error_rate=args.gemini_errors), tasks_for)
+    gemini_utils.generate_json = gemini.generate_json
+    gemini_utils.generate_search_text = gemini.generate_search_text
+    gemini_utils.stream_text = gemini.stream_text
+
+    calendar = FakeCalendar(Latency(rng, error_rate=args.calendar_errors), args.calendar_latency)
+    calendar_client.transport = calendar.transport()
+    calendar_client._http = None
+    sync.CALENDAR_SYNC_MODE = args.calendar_sync
+    limits.ADMISSION = args.admission
+
+    utils1.connect = partial(utils1.connect, AsyncMongoMockClient())
+
+    with open(args.conversations) as f:
+        conversations = json.load(f)
+
+    recorder = Recorder()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                start = time.perf_counter()
+                await asyncio.gather(*(
+                    virtual_user(client, index, conversations, args.iterations, recorder, current_turn)
+                    for index in range(args.concurrency)
+                ))
+                wall = time.perf_counter() - start
+
+    sha, dirty = git_commit()
+    requests = sum(len(values) for values in recorder.latencies.values())
+    return {
+        "commit": sha,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("out", "compare")},
+        "wall_seconds": round(wall, 3),
+        "requests": requests,
+        "throughput_rps": round(requests / wall, 2) if wall else None,
+        "endpoints": recorder.summary(),
+        "stages": stage_means(),
+        "gemini_calls": dict(sorted(gemini.calls.items())),
+        "calendar_requests": calendar.requests,
+    }
+
+
+def compare(current, previous):
+    lines = [f"{previous['commit'][:10]} -> {current['commit'][:10]}",
+             f"  throughput_rps {previous['throughput_rps']} -> {current['throughput_rps']}"]
+    for endpoint, now in current["endpoints"].items():
+        before = previous["endpoints"].get(endpoint)
+        if not before:
+            continue
+        deltas = " ".join(f"{q} {before[q]}->{now[q]}" for q in ("p50", "p95", "p99"))
+        lines.append(f"  {endpoint}: {deltas}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users replaying at once")
+    parser.add_argument("--iterations", type=int, default=2, help="times each user replays every conversation")
+    parser.add_argument("--conversations", default=os.path.join(HERE, "conversations.json"))
+    parser.add_argument("--gemini-scale", type=float, default=1.0, help="multiplier on fake Gemini latencies")
+    parser.add_argument("--gemini-errors", type=float, default=0.0, help="fraction of Gemini calls that fail")
+    parser.add_argument("--calendar-latency", type=float, default=0.15, help="mean fake Calendar latency (s)")
+    parser.add_argument("--calendar-errors", type=float, default=0.0, help="fraction of Calendar calls that 503")
+    parser.add_argument("--calendar-sync", choices=("outbox", "inline"), default="outbox")
+    parser.add_argument("--admission", action="store_true",
+                        help="keep per-user rate limits on; off by default since every virtual user is a burst")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to diff against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.load [options]
+    args = parse_args()
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(report, json.load(f)), file=sys.stderr)
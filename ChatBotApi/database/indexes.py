@@ -0,0 +1,145 @@
+import asyncio
+import importlib
+import logging
+import os
+import sys
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+load_dotenv('./config.env')
+
+logger = logging.getLogger(__name__)
+
+MONGO_VERIFY_PLANS = os.getenv("MONGO_VERIFY_PLANS", "false").lower() == "true"
+
+INDEXES = {
+    "Tasks": [
+        ([("email", ASCENDING), ("task.startdate", ASCENDING), ("task.starttime", ASCENDING)],
+         {"name": "email_start"}),
+        ([("task_id", ASCENDING)],
+         {"name": "task_id_unique", "unique": True,
+          "partialFilterExpression": {"task_id": {"$gt": ""}}}),
+    ],
+    "Messages": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ],
+    "MessageBuckets": [
+        ([("email", ASCENDING), ("bucket", ASCENDING)], {"name": "email_bucket_unique", "unique": True}),
+    ],
+    "Summaries": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ],
+    "TaskVersions": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ],
+    "CalendarOutbox": [
+        ([("status", ASCENDING), ("available_at", ASCENDING)], {"name": "status_available"}),
+        ([("email", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)], {"name": "email_status_id"}),
+        ([("task_id", ASCENDING), ("status", ASCENDING)], {"name": "task_id_status"}),
+    ],
+    "CalendarEvents": [
+        ([("email", ASCENDING), ("event_id", ASCENDING)], {"name": "email_event_unique", "unique": True}),
+    ],
+    "CalendarSync": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ],
+    "NotificationJobs": [
+        ([("status", ASCENDING), ("available_at", ASCENDING)], {"name": "status_available"}),
+        ([("task_id", ASCENDING)],
+         {"name": "task_id_pending_unique", "unique": True,
+          "partialFilterExpression": {"status": "pending"}}),
+    ],
+}
+
+# Every filter the database modules send to Mongo, with placeholder values.
+# Each function that sends one declares it with @query_shape, so the shape
+# sits next to the query; SHAPE_MODULES are imported before the plan check so
+# all of them are registered.
+QUERY_SHAPES = []
+SHAPE_MODULES = ("database.utils1", "database.outbox", "database.notifyjobs", "CalendarAPI.mirror")
+EMAIL = "user@example.com"
+AT = "2025-01-01T00:00:00"
+
+
+def query_shape(collection, query, sort=None):
+    def register(function):
+        QUERY_SHAPES.append((collection, query, sort, f"{function.__module__}.{function.__name__}"))
+        return function
+    return register
+
+
+def query_shapes():
+    for module in SHAPE_MODULES:
+        importlib.import_module(module)
+    return QUERY_SHAPES
+
+
+async def ensure_indexes(db):
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                logger.error("Error creating index %s on %s: %s", options['name'], collection, e)
+
+
+def plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+
+async def collection_scans(db):
+    """(collection, query, sender) for every shape whose winning plan scans."""
+    scans = []
+    explained = {}
+    for collection, query, sort, sender in query_shapes():
+        key = (collection, repr(query), repr(sort))
+        if key not in explained:
+            cursor = db[collection].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = (await cursor.explain()).get("queryPlanner", {}).get("winningPlan", {})
+            explained[key] = "COLLSCAN" in set(plan_stages(plan))
+        if explained[key]:
+            scans.append((collection, query, sender))
+    return scans
+
+
+async def verify_query_plans(db):
+    scans = await collection_scans(db)
+    if scans:
+        shapes = ", ".join(f"{collection} {query} ({sender})" for collection, query, sender in scans)
+        raise RuntimeError(f"Collection scan in query plan: {shapes}")
+
+
+async def bootstrap(db):
+    await ensure_indexes(db)
+    if MONGO_VERIFY_PLANS:
+        await verify_query_plans(db)
+
+
+async def main():
+    from database import utils1
+    db = await utils1.connect()
+    try:
+        await ensure_indexes(db)
+        await verify_query_plans(db)
+        print("Indexes in place; no collection scans")
+    finally:
+        await utils1.close()
+
+
+if __name__ == "__main__":
+    # python -m database.indexes
+    try:
+        asyncio.run(main())
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,25 @@
+import asyncio
+from database import utils1
+
+
+async def migrate_messages():
+    users = migrated = 0
+    cursor = utils1.messages_collection.find({"messages": {"$exists": True}}, {"email": 1})
+    async for legacy in cursor:
+        migrated += await utils1.migrateUserMessages(legacy["email"])
+        users += 1
+    return users, migrated
+
+
+async def main():
+    await utils1.connect()
+    try:
+        users, migrated = await migrate_messages()
+        print(f"Moved {migrated} messages for {users} users into MessageBuckets")
+    finally:
+        await utils1.close()
+
+
+if __name__ == "__main__":
+    # python -m database.migrations
+    asyncio.run(main())
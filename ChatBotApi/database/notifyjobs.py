@@ -0,0 +1,77 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import ASCENDING, ReturnDocument
+from database import utils1
+from database.indexes import AT, query_shape
+from database.outbox import retryDelay
+
+load_dotenv('./config.env')
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_LEASE_SECONDS = float(os.getenv("NOTIFY_LEASE_SECONDS", "60"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+
+# One pending job per task: queueing a task again replaces the copy request
+# and bumps revision, so a worker still writing the old copy can't complete
+# the new one. available_at is the retry time and the lease, as in the
+# calendar outbox.
+
+
+@query_shape("NotificationJobs", {"task_id": "task", "status": "pending"})
+async def queueNotification(email, task_id, task):
+    now = datetime.utcnow()
+    return await utils1.notify_collection.find_one_and_update(
+        {"task_id": task_id, "status": "pending"},
+        {"$set": {"email": email, "task": task, "available_at": now},
+         "$inc": {"revision": 1},
+         "$setOnInsert": {"_id": ObjectId(), "attempts": 0, "created_at": now}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+@query_shape("NotificationJobs", {"status": "pending", "available_at": {"$lte": AT}}, [("available_at", ASCENDING)])
+@query_shape("NotificationJobs", {"_id": "job", "revision": 1, "available_at": AT})
+async def claimNotifications(limit):
+    now = datetime.utcnow()
+    cursor = utils1.notify_collection.find(
+        {"status": "pending", "available_at": {"$lte": now}}).sort("available_at", ASCENDING).limit(limit)
+    claimed = []
+    async for job in cursor:
+        job = await utils1.notify_collection.find_one_and_update(
+            {"_id": job["_id"], "revision": job["revision"], "available_at": job["available_at"]},
+            {"$set": {"available_at": now + timedelta(seconds=NOTIFY_LEASE_SECONDS)},
+             "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is not None:
+            claimed.append(job)
+    return claimed
+
+
+@query_shape("NotificationJobs", {"_id": "job", "revision": 1})
+async def completeNotification(job):
+    """False when the task was queued again while this job ran."""
+    result = await utils1.notify_collection.delete_one({"_id": job["_id"], "revision": job["revision"]})
+    return result.deleted_count == 1
+
+
+@query_shape("NotificationJobs", {"_id": "job", "revision": 1})
+async def retryNotification(job, error):
+    if job["attempts"] >= NOTIFY_MAX_ATTEMPTS:
+        logger.warning("Notification job for %s dead-lettered: %s", job["task_id"], error)
+        await utils1.notify_collection.update_one(
+            {"_id": job["_id"], "revision": job["revision"]},
+            {"$set": {"status": "dead", "error": error, "dead_at": datetime.utcnow()}}
+        )
+        return False
+    await utils1.notify_collection.update_one(
+        {"_id": job["_id"], "revision": job["revision"]},
+        {"$set": {"available_at": datetime.utcnow() + timedelta(seconds=retryDelay(job["attempts"])),
+                  "error": error}}
+    )
+    return True
@@ -0,0 +1,146 @@
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import ASCENDING, ReturnDocument
+from database import utils1
+from database.indexes import AT, EMAIL, query_shape
+
+load_dotenv('./config.env')
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "2"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))
+# Access tokens only reach the worker that served the user's request and are
+# never stored, so a job that stays due this long has nobody able to run it.
+OUTBOX_TOKEN_WAIT = float(os.getenv("OUTBOX_TOKEN_WAIT", "3600"))
+
+# Jobs stay "pending" until they succeed (and are removed) or are moved to
+# "dead". available_at doubles as the retry time and the worker's lease: a
+# claimed job is pushed OUTBOX_LEASE_SECONDS ahead, so a worker that dies
+# mid-call hands it back once the lease runs out.
+
+
+def calendarJob(op, email, task=None, task_id=None, event_id=None):
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "op": op,
+        "email": email,
+        "task_id": task_id,
+        "event_id": event_id,
+        "task": task,
+        "status": "pending",
+        "attempts": 0,
+        "available_at": now,
+        "created_at": now,
+    }
+
+
+def retryDelay(attempts):
+    return random.uniform(0, min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** attempts))
+
+
+@query_shape("CalendarOutbox", {"status": "pending", "available_at": {"$lte": AT}})
+async def dueUsers(limit=100, known=None):
+    now = datetime.utcnow()
+    emails = await utils1.outbox_collection.distinct("email", {"status": "pending", "available_at": {"$lte": now}})
+    if known is not None:
+        emails = [email for email in emails if email in known]
+    return emails[:limit]
+
+
+@query_shape("CalendarOutbox", {"_id": "job", "status": "pending", "available_at": AT})
+async def claimJob(job):
+    return await utils1.outbox_collection.find_one_and_update(
+        {"_id": job["_id"], "status": "pending", "available_at": job["available_at"]},
+        {"$set": {"available_at": datetime.utcnow() + timedelta(seconds=OUTBOX_LEASE_SECONDS)},
+         "$inc": {"attempts": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+@query_shape("CalendarOutbox", {"email": EMAIL, "status": "pending"}, [("_id", ASCENDING)])
+async def claimHead(email, batch=1):
+    """Claim the oldest pending job for a user, and for deletes the run of
+    deletes right behind it (up to batch). Nothing is claimed while that
+    oldest job is leased or waiting out a retry, so a user's jobs always
+    reach Calendar in the order they were written.
+    """
+    now = datetime.utcnow()
+    cursor = utils1.outbox_collection.find({"email": email, "status": "pending"}).sort("_id", ASCENDING).limit(batch)
+    claimed = []
+    async for job in cursor:
+        if job["available_at"] > now:
+            break
+        if claimed and (job["op"] != "delete" or claimed[0]["op"] != "delete"):
+            break
+        job = await claimJob(job)
+        if job is None:
+            break
+        claimed.append(job)
+        if job["op"] != "delete":
+            break
+    return claimed
+
+
+@query_shape("CalendarOutbox", {"_id": "job"})
+async def completeJob(job):
+    await utils1.outbox_collection.delete_one({"_id": job["_id"]})
+
+
+@query_shape("CalendarOutbox", {"_id": "job"})
+async def retryJob(job, error):
+    if job["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+        return await deadJob(job, error)
+    await utils1.outbox_collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"available_at": datetime.utcnow() + timedelta(seconds=retryDelay(job["attempts"])),
+                  "error": error},
+         "$unset": {"access_token": ""}}
+    )
+
+
+@query_shape("CalendarOutbox", {"_id": "job"})
+async def deadJob(job, error):
+    logger.warning("Calendar job %s (%s %s) dead-lettered: %s", job['_id'], job['op'], job.get('task_id'), error)
+    await utils1.outbox_collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": "dead", "error": error, "dead_at": datetime.utcnow()},
+         "$unset": {"access_token": ""}}
+    )
+
+
+@query_shape("CalendarOutbox", {"status": "pending", "available_at": {"$lte": AT}})
+async def expireStranded(wait=OUTBOX_TOKEN_WAIT):
+    """Dead-letter jobs that have been due for more than wait seconds."""
+    now = datetime.utcnow()
+    result = await utils1.outbox_collection.update_many(
+        {"status": "pending", "available_at": {"$lte": now - timedelta(seconds=wait)}},
+        {"$set": {"status": "dead", "dead_at": now,
+                  "error": f"No valid Google access token for this user in {wait:.0f}s; "
+                           "the user has to sign in again for it to sync"},
+         "$unset": {"access_token": ""}}
+    )
+    if result.modified_count:
+        logger.warning("Dead-lettered %d calendar jobs with no valid access token", result.modified_count)
+    return result.modified_count
+
+
+@query_shape("CalendarOutbox", {"task_id": "task", "status": "pending", "event_id": None})
+async def fillEventId(task_id, event_id):
+    """Point jobs queued behind a task's create at the event it produced."""
+    await utils1.outbox_collection.update_many(
+        {"task_id": task_id, "status": "pending", "event_id": None},
+        {"$set": {"event_id": event_id}}
+    )
+
+
+@query_shape("CalendarOutbox", {"email": EMAIL, "status": "pending"})
+async def pendingJobs(email):
+    return await utils1.outbox_collection.count_documents({"email": email, "status": "pending"})
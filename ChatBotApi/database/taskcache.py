@@ -0,0 +1,137 @@
+import copy
+import itertools
+import os
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv('./config.env')
+
+TASK_CACHE_USERS = int(os.getenv("TASK_CACHE_USERS", "1000"))
+# Reads compare a per-user version document in Mongo before trusting the
+# in-process copy, so a write made by another worker is never missed. Turning
+# this off saves that round trip but is only correct with a single worker.
+TASK_CACHE_SHARED = os.getenv("TASK_CACHE_SHARED", "true").lower() == "true"
+
+_stamps = itertools.count(1)
+
+
+class CachedTasks:
+    __slots__ = ("tasks", "version", "remote")
+
+    def __init__(self, tasks, remote=None):
+        self.tasks = OrderedDict((t["task_id"], copy.deepcopy(t["task"])) for t in tasks)
+        self.version = next(_stamps)
+        self.remote = remote
+
+    def touch(self):
+        self.version = next(_stamps)
+
+    def listing(self):
+        return [{"task_id": task_id, "task": task} for task_id, task in self.tasks.items()]
+
+
+class TaskCache:
+    def __init__(self, max_users=TASK_CACHE_USERS):
+        self.max_users = max_users
+        self.users = OrderedDict()
+        self.owners = {}
+        # email -> [fills in flight, writes seen since]; only users with a
+        # miss reading Mongo have an entry.
+        self.fills = {}
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "raced": 0}
+
+    def get(self, email, remote=None):
+        entry = self.users.get(email)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if remote is not None and entry.remote != remote:
+            self.stats["stale"] += 1
+            self.drop(email)
+            return None
+        self.users.move_to_end(email)
+        self.stats["hits"] += 1
+        return entry
+
+    def put(self, email, tasks, remote=None):
+        self.drop(email)
+        entry = CachedTasks(tasks, remote)
+        self.users[email] = entry
+        for task_id in entry.tasks:
+            self.owners[task_id] = email
+        while len(self.users) > self.max_users:
+            evicted, _ = next(iter(self.users.items()))
+            self.drop(evicted)
+            self.stats["evictions"] += 1
+        return entry
+
+    def begin_fill(self, email):
+        state = self.fills.setdefault(email, [0, 0])
+        state[0] += 1
+        return state[1]
+
+    def end_fill(self, email, token):
+        """True when no write for email landed since begin_fill returned
+        token, so the list read in between is safe to put()."""
+        state = self.fills[email]
+        state[0] -= 1
+        if not state[0]:
+            del self.fills[email]
+        if state[1] != token:
+            self.stats["raced"] += 1
+            return False
+        return True
+
+    def _wrote(self, email):
+        state = self.fills.get(email)
+        if state is not None:
+            state[1] += 1
+
+    def drop(self, email):
+        entry = self.users.pop(email, None)
+        if entry is not None:
+            for task_id in entry.tasks:
+                if self.owners.get(task_id) == email:
+                    del self.owners[task_id]
+
+    def _advance(self, email, entry, remote):
+        # A shared write bumps the remote version by one; any other jump means
+        # another worker wrote in between and this copy can't be patched.
+        if remote is None:
+            return True
+        if entry.remote is None or remote != entry.remote + 1:
+            self.drop(email)
+            return False
+        entry.remote = remote
+        return True
+
+    def upsert(self, email, task_id, task, new_id=None, remote=None):
+        self._wrote(email)
+        entry = self.users.get(email)
+        if entry is None or not self._advance(email, entry, remote):
+            return
+        new_id = new_id or task_id
+        if new_id != task_id:
+            entry.tasks.pop(task_id, None)
+            self.owners.pop(task_id, None)
+        entry.tasks[new_id] = copy.deepcopy(task)
+        self.owners[new_id] = email
+        entry.touch()
+
+    def remove(self, task_id, email=None, remote=None):
+        self.remove_many([task_id], email or self.owners.get(task_id), remote)
+
+    def remove_many(self, task_ids, email, remote=None):
+        self._wrote(email)
+        for task_id in task_ids:
+            if self.owners.get(task_id) == email:
+                del self.owners[task_id]
+        entry = self.users.get(email)
+        if entry is None or not self._advance(email, entry, remote):
+            return
+        for task_id in task_ids:
+            entry.tasks.pop(task_id, None)
+        entry.touch()
+
+
+task_cache = TaskCache()
@@ -1,165 +1,547 @@
+import asyncio
+import logging
+import os
 from datetime import datetime
-from pymongo import MongoClient
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
 from bson import ObjectId
-from typing import List, Dict, Any
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+from database.taskcache import TASK_CACHE_SHARED, TASK_CACHE_USERS, CachedTasks, task_cache
+from database.indexes import AT, EMAIL, query_shape
+from monitoring.metrics import MongoCommandTimer
 
-# Initialize MongoDB client
-client = MongoClient('mongodb://localhost:27017/') 
-db = client['ChatBot']
-tasks_collection = db['Tasks']
+load_dotenv('./config.env')
 
-async def insertTask(email: str, task: str, event_id: str = None) -> Dict[str, Any]:
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DB = os.getenv("MONGO_DB", "ChatBot")
+MONGO_MAX_POOL = int(os.getenv("MONGO_MAX_POOL", "100"))
+MONGO_MIN_POOL = int(os.getenv("MONGO_MIN_POOL", "5"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+# Width of one message bucket; must divide 24.
+MESSAGE_BUCKET_HOURS = int(os.getenv("MESSAGE_BUCKET_HOURS", "24"))
+MESSAGE_PAGE_SIZE = int(os.getenv("MESSAGE_PAGE_SIZE", "50"))
+MESSAGE_PAGE_MAX = int(os.getenv("MESSAGE_PAGE_MAX", "200"))
+# Legacy Messages documents are moved into buckets on a user's first short
+# read. Once python -m database.migrations has run, turn this off to take
+# that lookup off the read path.
+MESSAGE_LAZY_MIGRATION = os.getenv("MESSAGE_LAZY_MIGRATION", "true").lower() == "true"
+# Users already checked for legacy messages, remembered per process.
+MESSAGE_MIGRATED_USERS = int(os.getenv("MESSAGE_MIGRATED_USERS", "10000"))
+# Write a task and its calendar outbox job in one transaction (needs a replica set).
+MONGO_TRANSACTIONS = os.getenv("MONGO_TRANSACTIONS", "false").lower() == "true"
+
+client = None
+db = None
+tasks_collection = None
+messages_collection = None
+buckets_collection = None
+summaries_collection = None
+versions_collection = None
+outbox_collection = None
+events_collection = None
+calendar_sync_collection = None
+notify_collection = None
+
+async def connect(mongo_client=None):
+    global client, db, tasks_collection, messages_collection, buckets_collection, summaries_collection, versions_collection, outbox_collection
+    global events_collection, calendar_sync_collection, notify_collection
+    client = mongo_client or AsyncIOMotorClient(
+        MONGO_URI,
+        maxPoolSize=MONGO_MAX_POOL,
+        minPoolSize=MONGO_MIN_POOL,
+        serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_TIMEOUT_MS * 2,
+        waitQueueTimeoutMS=MONGO_TIMEOUT_MS,
+        retryWrites=True,
+        event_listeners=[MongoCommandTimer()],
+    )
+    db = client[MONGO_DB]
+    tasks_collection = db['Tasks']
+    messages_collection = db['Messages']
+    buckets_collection = db['MessageBuckets']
+    summaries_collection = db['Summaries']
+    versions_collection = db['TaskVersions']
+    outbox_collection = db['CalendarOutbox']
+    events_collection = db['CalendarEvents']
+    calendar_sync_collection = db['CalendarSync']
+    notify_collection = db['NotificationJobs']
+    if mongo_client is None:
+        await client.admin.command("ping")
+    return db
+
+async def close():
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+async def withJobs(write, jobs):
+    """Run write(session) and queue the calendar outbox jobs it produced.
+
+    With MONGO_TRANSACTIONS both land in one transaction; otherwise the jobs
+    are inserted right after the task write succeeds.
+    """
+    if not jobs:
+        return await write(None)
+    if MONGO_TRANSACTIONS:
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                result = await write(session)
+                if result is not None:
+                    await outbox_collection.insert_many(jobs, session=session)
+                return result
+    result = await write(None)
+    if result is not None:
+        await outbox_collection.insert_many(jobs)
+    return result
+
+def jobTrips(jobs, queued: bool) -> int:
+    """Round trips withJobs added on top of the write itself."""
+    if not jobs:
+        return 0
+    return int(queued) + (1 if MONGO_TRANSACTIONS else 0)
+
+def versionTrips(email: str) -> int:
+    return 1 if TASK_CACHE_SHARED and email else 0
+
+@query_shape("TaskVersions", {"email": EMAIL})
+async def bumpTaskVersion(email: str) -> Optional[int]:
+    if not TASK_CACHE_SHARED or not email:
+        return None
+    doc = await versions_collection.find_one_and_update(
+        {"email": email},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+async def insertTask(email: str, task: str, event_id: str = None, job: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     if not email or not task:
         return {"msg": "Email and task are required", "code": 400}
     
     try:
-        task_id = event_id if event_id else None
+        _id = ObjectId()
+        task_id = event_id if event_id else str(_id)
 
+        # task_id never changes once handed out; the Calendar event behind
+        # the task is recorded in event_id when the outbox creates it.
         task_data = {
+            "_id": _id,
             "email": email,
             "task": task,
-            "task_id": task_id
+            "task_id": task_id,
+            "event_id": event_id
         }
 
-        result = tasks_collection.insert_one(task_data)
-        if(not task_id):
-            task_id = str(result.inserted_id)
-            tasks_collection.update_one(
-                {"_id": result.inserted_id},
-                {"$set": {"task_id": task_id}}
-            )
+        if job is None:
+            await tasks_collection.insert_one(task_data)
+        else:
+            job["task_id"] = task_id
+            await withJobs(lambda session: tasks_collection.insert_one(task_data, session=session), [job])
+        # Bumped only once the task is stored, so no reader can pair the new
+        # version with a list that lacks it.
+        remote = await bumpTaskVersion(email)
+        task_cache.upsert(email, task_id, task, remote=remote)
 
         return {
             "msg": "Task inserted successfully",
             "code": 200,
-            "task_id": task_id
+            "task_id": task_id,
+            "roundTrips": 1 + jobTrips([job] if job else None, True) + versionTrips(email)
         }
 
     except Exception as e:
         return {"msg": f"Error inserting task: {e}", "code": 500}
 
-async def retriveAllTask(email: str) -> Dict[str, Any]:
+# email -> (mirror version, events); refreshed whenever CalendarSync moves on.
+calendar_cache = OrderedDict()
+
+@query_shape("CalendarSync", {"email": EMAIL})
+@query_shape("CalendarEvents", {"email": EMAIL})
+async def retriveCalendarEvents(email: str) -> Dict[str, Any]:
+    state = await calendar_sync_collection.find_one({"email": email}, {"version": 1, "synced_at": 1})
+    if state is None:
+        return {"data": [], "version": 0, "synced_at": None}
+    cached = calendar_cache.get(email)
+    if cached is None or cached[0] != state.get("version"):
+        events = events_collection.find({"email": email}, {"_id": 0, "event_id": 1, "task": 1})
+        calendar_events = [{"task_id": event["event_id"], "task": event["task"]} async for event in events]
+        cached = (state.get("version"), calendar_events)
+        calendar_cache[email] = cached
+        while len(calendar_cache) > TASK_CACHE_USERS:
+            calendar_cache.popitem(last=False)
+    calendar_cache.move_to_end(email)
+    return {"data": cached[1], "version": cached[0], "synced_at": state.get("synced_at")}
+
+@query_shape("Tasks", {"email": EMAIL})
+@query_shape("TaskVersions", {"email": EMAIL})
+async def retriveAllTask(email: str, include_calendar: bool = False) -> Dict[str, Any]:
     if not email:
         return {"msg": "Email is required", "code": 400}
     
     try:
-        tasks = tasks_collection.find({"email": email})
-    
-        task_list = [{"task_id": task["task_id"], "task": task["task"]} for task in tasks]
+        if include_calendar:
+            info, calendar = await asyncio.gather(retriveAllTask(email), retriveCalendarEvents(email))
+            if info.get("code") not in (200, 404):
+                return info
+            # Events this app created are already tasks; keep one copy.
+            known = {task["task_id"] for task in info.get("data", [])}
+            if calendar["data"]:
+                known.update(await tasks_collection.distinct("event_id", {"email": email}))
+            info["calendar"] = [event for event in calendar["data"] if event["task_id"] not in known]
+            info["calendarSyncedAt"] = calendar["synced_at"]
+            info["version"] = (info["version"], calendar["version"])
+            return info
+
+        remote = None
+        if TASK_CACHE_SHARED:
+            doc = await versions_collection.find_one({"email": email}, {"version": 1})
+            remote = doc["version"] if doc else 0
+
+        entry = task_cache.get(email, remote)
+        if entry is None:
+            # A write landing while the find runs may be missing from its
+            # result; such a list is served once but not cached.
+            token = task_cache.begin_fill(email)
+            try:
+                tasks = tasks_collection.find({"email": email}, {"_id": 0, "task_id": 1, "task": 1})
+                task_list = [{"task_id": task["task_id"], "task": task["task"]} async for task in tasks]
+            finally:
+                fresh = task_cache.end_fill(email, token)
+            entry = task_cache.put(email, task_list, remote) if fresh else CachedTasks(task_list, remote)
+
+        task_list = entry.listing()
         
         if not task_list:
-            return {"msg": "No tasks found for this user", "code": 404}
+            return {"msg": "No tasks found for this user", "code": 404, "version": entry.version}
         
-        return {"msg": "Tasks retrieved successfully", "code": 200, "data": task_list}
+        return {"msg": "Tasks retrieved successfully", "code": 200, "data": task_list, "version": entry.version}
     
     except Exception as e:
         return {"msg": f"Error retrieving tasks: {e}", "code": 500}
    
 
-async def updateTask(task_id: str, new_task: str,newid=None) -> Dict[str, Any]:
+def eventIdOf(task: Dict[str, Any], task_id: str) -> Optional[str]:
+    # Tasks stored before event_id existed were keyed by their event id.
+    return task["event_id"] if "event_id" in task else task_id
+
+@query_shape("Tasks", {"task_id": "task"})
+async def updateTask(task_id: str, new_task: str,newid=None, job: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     if not task_id or not new_task:
         return {"msg": "Task ID and new task content are required", "code": 400}
     
     try:
-        if newid:
-            result = tasks_collection.update_one(
-                {"task_id": task_id},  
-                {"$set": {"task": new_task,"task_id":newid}}
-            )
-        else:
-            result = tasks_collection.update_one(
+        update = {"task": new_task, "task_id": newid} if newid else {"task": new_task}
+
+        async def write(session):
+            result = await tasks_collection.find_one_and_update(
                 {"task_id": task_id},  
-                {"$set": {"task": new_task}}
+                {"$set": update},
+                projection={"email": 1, "event_id": 1},
+                session=session
             )
+            if result is not None and job is not None and job["op"] != "create":
+                job["event_id"] = eventIdOf(result, task_id)
+            return result
+
+        jobs = [job] if job else None
+        result = await withJobs(write, jobs)
         
-        if result.matched_count == 0:
-            return {"msg": "Task not found", "code": 404}
-        return {"msg": "Task updated successfully", "code": 200}
+        if result is None:
+            return {"msg": "Task not found", "code": 404, "roundTrips": 1 + jobTrips(jobs, False)}
+        remote = await bumpTaskVersion(result["email"])
+        task_cache.upsert(result["email"], task_id, new_task, newid, remote=remote)
+        return {"msg": "Task updated successfully", "code": 200,
+                "roundTrips": 1 + jobTrips(jobs, True) + versionTrips(result["email"])}
     except Exception as e:
         return {"msg": f"Error updating task: {e}", "code": 500}
+
+@query_shape("Tasks", {"task_id": "task"})
+async def setEventId(task_id: str, event_id: str) -> Dict[str, Any]:
+    try:
+        result = await tasks_collection.update_one({"task_id": task_id}, {"$set": {"event_id": event_id}})
+        if not result.matched_count:
+            return {"msg": "Task not found", "code": 404}
+        return {"msg": "Event ID saved successfully", "code": 200}
+    except Exception as e:
+        return {"msg": f"Error saving event ID: {e}", "code": 500}
     
     
+@query_shape("Tasks", {"task_id": "task"})
+async def saveNotification(task_id: str, notification: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        result = await tasks_collection.find_one_and_update(
+            {"task_id": task_id},
+            {"$set": {"notification": notification}},
+            projection={"email": 1, "task_id": 1}
+        )
+        if result is None:
+            return {"msg": "Task not found", "code": 404}
+        return {"msg": "Notification saved successfully", "code": 200, "task_id": result["task_id"]}
+    except Exception as e:
+        return {"msg": f"Error saving notification: {e}", "code": 500}
+
+
+@query_shape("Tasks", {"email": EMAIL, "notification": {"$exists": True}})
+@query_shape("Tasks", {"email": EMAIL, "notification.at": {"$gt": AT}})
+async def retriveNotifications(email: str, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Notification copy saved on the user's tasks after since (or ever),
+    oldest first, with the schedule it belongs to."""
+    if since is None:
+        query = {"email": email, "notification": {"$exists": True}}
+    else:
+        query = {"email": email, "notification.at": {"$gt": since}}
+    messages = []
+    async for doc in tasks_collection.find(query, {"_id": 0, "task_id": 1, "task": 1, "notification": 1}):
+        task = doc["task"] if isinstance(doc.get("task"), dict) else {}
+        message = dict(doc["notification"], task_id=doc["task_id"])
+        message.update({key: task.get(key) for key in ("startdate", "starttime", "enddate", "endtime", "daily")})
+        messages.append(message)
+    messages.sort(key=lambda message: message["at"])
+    return messages
+
+
+@query_shape("Tasks", {"task_id": "task"})
 async def deleteTask(task_id: str) -> Dict[str, Any]:
     if not task_id:
         return {"msg": "Task ID is required", "code": 400}
     
     try:
-        result = tasks_collection.delete_one({"task_id": task_id})  
+        result = await tasks_collection.find_one_and_delete({"task_id": task_id}, projection={"email": 1})
         
-        if result.deleted_count == 0:
-            return {"msg": "Task not found", "code": 404}
+        if result is None:
+            return {"msg": "Task not found", "code": 404, "roundTrips": 1}
+        remote = await bumpTaskVersion(result["email"])
+        task_cache.remove(task_id, result["email"], remote=remote)
         
-        return {"msg": "Task deleted successfully", "code": 200}
+        return {"msg": "Task deleted successfully", "code": 200, "roundTrips": 1 + versionTrips(result["email"])}
     
     except Exception as e:
         return {"msg": f"Error deleting task: {e}", "code": 500}
-    
-messages_collection = db['Messages']
 
-async def insertMessage(email: str, msg: str, by: str) -> Dict[str, Any]:
-    if not email or not msg or not by:
-        return {"msg": "Email, message, and sender (bot/user) are required", "code": 400}
 
-    if by not in ['bot', 'user']:
-        return {"msg": "Sender must be either 'bot' or 'user'", "code": 400}
+@query_shape("Tasks", {"email": EMAIL, "task_id": {"$in": ["task"]}})
+async def deleteTasks(task_ids: List[str], email: str, jobs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    if not task_ids:
+        return {"msg": "Task IDs are required", "code": 400}
 
     try:
-        date_time = datetime.now().isoformat()
+        if jobs:
+            # Delete jobs need the event ids, which go with the documents.
+            events = {task["task_id"]: eventIdOf(task, task["task_id"]) async for task in tasks_collection.find(
+                {"email": email, "task_id": {"$in": task_ids}}, {"_id": 0, "task_id": 1, "event_id": 1})}
+            for job in jobs:
+                job["event_id"] = events.get(job["task_id"])
+        result = await withJobs(lambda session: tasks_collection.delete_many(
+            {"email": email, "task_id": {"$in": task_ids}}, session=session), jobs)
+        remote = await bumpTaskVersion(email)
+        task_cache.remove_many(task_ids, email, remote=remote)
+        # The event id lookup, the delete, the outbox insert and the version bump.
+        return {"msg": "Tasks deleted successfully", "code": 200, "deleted": result.deleted_count,
+                "roundTrips": (1 if jobs else 0) + 1 + jobTrips(jobs, True) + versionTrips(email)}
+    except Exception as e:
+        return {"msg": f"Error deleting tasks: {e}", "code": 500}
 
-        message_data = {
-            "dateTime": date_time,
-            "by": by,
-            "msg": msg
-        }
+def bucket_of(date_time: str) -> str:
+    moment = datetime.fromisoformat(date_time)
+    hour = moment.hour - moment.hour % MESSAGE_BUCKET_HOURS
+    return moment.replace(hour=hour, minute=0, second=0, microsecond=0).isoformat()
+
+def message_update(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"$push": {"messages": {"$each": messages, "$sort": {"dateTime": 1}}}}
+
+def newMessage(msg: str, by: str) -> Dict[str, Any]:
+    return {
+        "dateTime": datetime.now().isoformat(timespec="microseconds"),
+        "by": by,
+        "msg": msg
+    }
+
+@query_shape("MessageBuckets", {"email": EMAIL, "bucket": AT})
+async def insertMessages(email: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if not email or not messages:
+        return {"msg": "Email and messages are required", "code": 400}
 
-        existing_user_messages = messages_collection.find_one({"email": email})
+    for message in messages:
+        if not message.get("msg") or not message.get("dateTime"):
+            return {"msg": "Each message needs text and a dateTime", "code": 400}
+        if message.get("by") not in ['bot', 'user']:
+            return {"msg": "Sender must be either 'bot' or 'user'", "code": 400}
 
-        if existing_user_messages:
-            result = messages_collection.update_one(
-                {"email": email},
-                {"$push": {"messages": message_data}}
+    try:
+        buckets = {}
+        for message in messages:
+            buckets.setdefault(bucket_of(message["dateTime"]), []).append(message)
+
+        # Turns that straddle a bucket boundary still go out as one bulk
+        # write, i.e. a single round trip.
+        if len(buckets) == 1:
+            bucket, grouped = next(iter(buckets.items()))
+            await buckets_collection.update_one(
+                {"email": email, "bucket": bucket},
+                message_update(grouped),
+                upsert=True
             )
         else:
-            result = messages_collection.insert_one({
-                "email": email,
-                "messages": [message_data]
-            })
+            await buckets_collection.bulk_write([
+                UpdateOne({"email": email, "bucket": bucket}, message_update(grouped), upsert=True)
+                for bucket, grouped in buckets.items()
+            ])
 
-        return {"msg": "Message added successfully", "code": 200}
+        return {"msg": "Message added successfully", "code": 200, "roundTrips": 1}
 
     except Exception as e:
         return {"msg": f"Error inserting message: {e}", "code": 500}
-    
-async def retriveMessages(email: str) -> Dict[str, Any]:
+
+async def insertMessage(email: str, msg: str, by: str) -> Dict[str, Any]:
+    if not email or not msg or not by:
+        return {"msg": "Email, message, and sender (bot/user) are required", "code": 400}
+
+    if by not in ['bot', 'user']:
+        return {"msg": "Sender must be either 'bot' or 'user'", "code": 400}
+
+    return await insertMessages(email, [newMessage(msg, by)])
+
+_migrated = OrderedDict()
+
+@query_shape("Messages", {"email": EMAIL, "messages": {"$exists": True}})
+@query_shape("MessageBuckets", {"email": EMAIL, "bucket": AT})
+async def migrateUserMessages(email: str) -> int:
+    if email in _migrated:
+        _migrated.move_to_end(email)
+        return 0
+    legacy = await messages_collection.find_one({"email": email, "messages": {"$exists": True}})
+    _migrated[email] = True
+    while len(_migrated) > MESSAGE_MIGRATED_USERS:
+        _migrated.popitem(last=False)
+    if not legacy:
+        return 0
+
+    buckets = {}
+    for message in legacy.get("messages", []):
+        buckets.setdefault(bucket_of(message["dateTime"]), []).append(message)
+
+    # $addToSet keeps a re-run after a crash from duplicating messages; the
+    # empty $push that follows restores dateTime order inside the bucket.
+    operations = []
+    for bucket, messages in buckets.items():
+        key = {"email": email, "bucket": bucket}
+        operations.append(UpdateOne(key, {"$addToSet": {"messages": {"$each": messages}}}, upsert=True))
+        operations.append(UpdateOne(key, message_update([])))
+    if operations:
+        await buckets_collection.bulk_write(operations, ordered=True)
+    await messages_collection.update_one(
+        {"_id": legacy["_id"]},
+        {"$unset": {"messages": ""}, "$set": {"migratedAt": datetime.now().isoformat()}}
+    )
+    return len(legacy.get("messages", []))
+
+@query_shape("MessageBuckets", {"email": EMAIL}, [("bucket", DESCENDING)])
+@query_shape("MessageBuckets", {"email": EMAIL, "bucket": {"$lte": AT}}, [("bucket", DESCENDING)])
+@query_shape("MessageBuckets", {"email": EMAIL, "bucket": {"$gte": AT}}, [("bucket", ASCENDING)])
+async def _page(email: str, before: Optional[str], after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    page = []
+    if after:
+        cursor = buckets_collection.find(
+            {"email": email, "bucket": {"$gte": bucket_of(after)}}
+        ).sort("bucket", ASCENDING).batch_size(2)
+        async for bucket in cursor:
+            page.extend(m for m in bucket["messages"] if m["dateTime"] > after)
+            if len(page) > limit:
+                break
+        return page[:limit + 1]
+
+    query = {"email": email}
+    if before:
+        query["bucket"] = {"$lte": bucket_of(before)}
+    cursor = buckets_collection.find(query).sort("bucket", DESCENDING).batch_size(2)
+    async for bucket in cursor:
+        messages = bucket["messages"]
+        if before:
+            messages = [m for m in messages if m["dateTime"] < before]
+        page.extend(reversed(messages))
+        if len(page) > limit:
+            break
+    page = page[:limit + 1]
+    page.reverse()
+    return page
+
+async def retriveMessages(email: str, before: Optional[str] = None, after: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
     if not email:
         return {"msg": "Email is required", "code": 400}
 
     try:
-        user_messages = messages_collection.find_one({"email": email})
+        limit = min(limit or MESSAGE_PAGE_SIZE, MESSAGE_PAGE_MAX)
+        page = await _page(email, before, after, limit)
+        if len(page) <= limit and not after and MESSAGE_LAZY_MIGRATION and await migrateUserMessages(email):
+            page = await _page(email, before, after, limit)
 
-        if not user_messages or not user_messages.get("messages"):
+        if not page:
             return {"msg": "No messages found for this user", "code": 404}
 
-        sorted_messages = sorted(user_messages["messages"], key=lambda x: x["dateTime"])
+        has_more = len(page) > limit
+        if has_more:
+            page = page[:limit] if after else page[1:]
 
         return {
             "msg": "Messages retrieved successfully",
             "code": 200,
-            "data": sorted_messages
+            "data": page,
+            "before": page[0]["dateTime"],
+            "after": page[-1]["dateTime"],
+            "hasMore": has_more
         }
 
     except Exception as e:
         return {"msg": f"Error retrieving messages: {e}", "code": 500}
 
+async def retriveRecentMessages(email: str, limit: int) -> List[Dict[str, Any]]:
+    res = await retriveMessages(email, limit=limit)
+    return res.get("data", [])
+
+@query_shape("Summaries", {"email": EMAIL})
+async def retriveSummary(email: str) -> Dict[str, Any]:
+    try:
+        return await summaries_collection.find_one({"email": email}, {"_id": 0}) or {}
+    except Exception as e:
+        logger.warning("Error retrieving summary: %s", e)
+        return {}
+
+@query_shape("Summaries", {"email": EMAIL})
+async def saveSummary(email: str, summary: str, upto: str) -> Dict[str, Any]:
+    if not email:
+        return {"msg": "Email is required", "code": 400}
+
+    try:
+        await summaries_collection.update_one(
+            {"email": email},
+            {"$set": {"summary": summary, "upto": upto}},
+            upsert=True
+        )
+        return {"msg": "Summary saved successfully", "code": 200}
+    except Exception as e:
+        return {"msg": f"Error saving summary: {e}", "code": 500}
+
+@query_shape("MessageBuckets", {"email": EMAIL})
+@query_shape("Messages", {"email": EMAIL})
+@query_shape("Summaries", {"email": EMAIL})
 async def deleteMessages(email: str) -> Dict[str, Any]:
     if not email:
         return {"msg": "Email is required", "code": 400}
 
     try:
-        result = messages_collection.delete_one({"email": email})
+        result = await buckets_collection.delete_many({"email": email})
+        legacy = await messages_collection.delete_one({"email": email})
+        await summaries_collection.delete_one({"email": email})
         
-        if result.deleted_count == 0:
+        if result.deleted_count == 0 and legacy.deleted_count == 0:
             return {"msg": "No messages found for this user", "code": 404}
         
         return {"msg": "Messages deleted successfully", "code": 200}
@@ -1,17 +1,59 @@
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, WebSocket, WebSocketDisconnect
+from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from database.utils1 import deleteMessages, insertTask, retriveAllTask, updateTask, deleteTask,insertMessage,retriveMessages
-from GeminiAPI.utils import generalDialog, conflictChecker,messageGenerator,conversaction,check_task_conflict,searchToGoogle,classify
-from CalendarAPI.utils import create_google_calendar_event, update_google_calendar_event, delete_google_calendar_event
+from typing import Optional
+from contextlib import asynccontextmanager
+from database import utils1 as database
+from database.indexes import bootstrap
+from CalendarAPI.client import calendar_client
+from database.utils1 import deleteMessages, insertTask, retriveAllTask, updateTask, deleteTasks,insertMessages,newMessage,retriveMessages
+from GeminiAPI.utils import generalDialog, conflictChecker,messageGenerator,conversaction,check_task_conflict,searchToGoogle,classify,searchToGoogleStream,conversactionStream
+from GeminiAPI.memory import build_history, task_context
+from GeminiAPI.slots import local_dialog
+from GeminiAPI.notifications import notification_worker
+from CalendarAPI.sync import calendar_worker, sync_calendar
+from CalendarAPI.mirror import refresh_mirror
+from database.outbox import calendarJob
+from admission.limits import Throttled, admission
+from monitoring.logs import setup_logging, stop_logging
+from monitoring.metrics import http_seconds, new_request_id, registry, request_id, span, timed
+from monitoring.collectors import register_collectors
 from fastapi.middleware.cors import CORSMiddleware
+from dotenv import load_dotenv
+import asyncio
+import json
+import os
 import re
+import time
 import logging
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
+register_collectors()
 
-app = FastAPI()
+load_dotenv('./config.env')
+
+# Start generalDialog alongside classify and drop it if the turn turns out to be a search.
+SPECULATIVE_DIALOG = os.getenv("SPECULATIVE_DIALOG", "false").lower() == "true"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = await database.connect()
+    await bootstrap(db)
+    calendar_worker.start()
+    notification_worker.start()
+    try:
+        yield
+    finally:
+        await notification_worker.stop()
+        await calendar_worker.stop()
+        await calendar_client.aclose()
+        await database.close()
+        stop_logging()
+
+app = FastAPI(lifespan=lifespan)
 
 class QueryInput(BaseModel):
     query: str
@@ -19,6 +61,27 @@ class QueryInput(BaseModel):
     stage: str
     email: str
 
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    rid = request.headers.get("X-Request-ID") or new_request_id()
+    token = request_id.set(rid)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = rid
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_seconds.observe(time.perf_counter() - start, route=getattr(route, "path", "unmatched"), status=status)
+        request_id.reset(token)
+
+@app.exception_handler(Throttled)
+async def throttled(request: Request, e: Throttled):
+    return JSONResponse(status_code=429, content={"detail": "Too Many Requests", "reason": e.reason},
+                        headers={"Retry-After": e.header()})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -38,159 +101,255 @@ def is_past_task(startdate: str, starttime: str) -> bool:
         task_datetime = datetime.strptime(startdate + ' ' + starttime, '%Y-%m-%d %H:%M')
         return task_datetime < datetime.now() 
     except ValueError:
-        print("Invalid date or time format")
+        logger.warning("Invalid date or time format: %s %s", startdate, starttime)
         return False 
 
+def _discard(task):
+    if not task.cancelled():
+        task.exception()
+
+async def _resolved(value):
+    return value
+
+async def route_query(user_input, history, tasks=()):
+    # Plain add/delete commands are filled in locally without classify or generalDialog.
+    local = local_dialog(user_input, tasks)
+    if local is not None:
+        # Read back (and removed) by handle_task_dialog.
+        local['local'] = True
+        return {'res': 'first', 'history': ''}, _resolved(local)
+
+    if not SPECULATIVE_DIALOG:
+        classification_res = await timed("classify", classify(user_input, history))
+        dialog = timed("generalDialog", generalDialog(user_input, history)) if classification_res['res'] == 'first' else None
+        return classification_res, dialog
+
+    dialog = asyncio.create_task(timed("generalDialog", generalDialog(user_input, history)))
+    dialog.add_done_callback(_discard)
+    try:
+        classification_res = await timed("classify", classify(user_input, history))
+    except BaseException:
+        dialog.cancel()
+        raise
+    if classification_res['res'] != 'first':
+        dialog.cancel()
+        return classification_res, None
+    return classification_res, dialog
+
+async def handle_task_dialog(email, response, tasks, access_token, version=None, calendar=()):
+    conflict_check = {}
+    notification = {}
+    local = response.pop('local', False)
+    calendar_worker.remember(email, access_token)
+    # Conflict checks also see the user's other Calendar events from the mirror.
+    busy = tasks + list(calendar)
+    if not response.get('isInfoIncomplete'):
+        db_action = response.get('dbAction')
+
+        if db_action == 'add':
+            payload = response.get('payload', {})
+            if all(k in payload for k in ['startdate', 'starttime', 'enddate', 'endtime']):
+                with span("check_task_conflict"):
+                    inter_conflict = check_task_conflict(payload,busy,email,version=version)
+                is_past = is_past_task(payload['startdate'], payload['starttime'])
+                if local and not inter_conflict['isConflict'] and not is_past:
+                    # Nothing for the model to explain: keep the local reply.
+                    conflict_check = {'isConflict': False, 'response': response['text']}
+                else:
+                    conflict_check = await timed("conflictChecker", conflictChecker(inter_conflict, task_context(tasks, f"{payload.get('summary', '')} {payload['startdate']}"), 'add',payload,response['text'],is_past))
+                logger.debug("Conflict check: %s", conflict_check)
+                if not conflict_check.get('isConflict'):
+                    response['text'] = conflict_check['response']
+                    payload['addedToCalendar'] = True
+                    temp = await insertTask(email, payload, job=calendarJob('create', email, task=payload))
+                    await timed("calendar_sync", sync_calendar(email))
+                    # Notification copy is written in the background and delivered over /notifications.
+                    notification = {'notificationPending': await timed("notification_queue", notification_worker.enqueue(email, temp['task_id'], payload))}
+                else:
+                    return conflict_check
+            else:
+                payload['addedToCalendar'] = False
+                temp = await insertTask(email, payload)
+
+            response['nInfo'].update({
+                'task_id': temp['task_id'],
+                'startdate': payload.get('startdate'),
+                'starttime': payload.get('starttime'),
+                'enddate': payload.get('enddate'),
+                'endtime': payload.get('endtime'),
+                **notification,
+            })
+
+            response['intent'] = 'new'
+
+        elif db_action == 'update':
+            updated_payload = response.get('payload', {}).get('updatedPayload', {}).get('task', {})
+            task_id = response.get('payload', {}).get('updatedPayload', {}).get('task_id')
+            job = None
+
+            if updated_payload.get('addedToCalendar') and task_id:
+                with span("check_task_conflict"):
+                    inter_conflict = check_task_conflict(updated_payload,busy,email,task_id,version)
+                tasks = [t for t in tasks if t.get('task_id') != task_id]
+                is_past = is_past_task(updated_payload['startdate'], updated_payload['starttime'])
+                conflict_check = await timed("conflictChecker", conflictChecker(inter_conflict, task_context(tasks, f"{updated_payload.get('summary', '')} {updated_payload['startdate']}"), 'update',updated_payload,response['text'],is_past))
+                if not conflict_check.get('isConflict'):
+                    response['text'] = conflict_check['response']
+                    if response.get('calendarAction') == 'add':
+                        job = calendarJob('create', email, task=updated_payload)
+                    elif response.get('calendarAction') == 'update':
+                        job = calendarJob('update', email, task=updated_payload, task_id=task_id)
+                else:
+                    return conflict_check
+            if job is not None:
+                job['task_id'] = task_id
+            await updateTask(task_id, updated_payload, job=job)
+            if job is not None:
+                await timed("calendar_sync", sync_calendar(email))
+            if conflict_check:
+                notification = {'notificationPending': await timed("notification_queue", notification_worker.enqueue(email, task_id, updated_payload))}
+            response['nInfo'].update({
+                'task_id': task_id,
+                'startdate': updated_payload.get('startdate'),
+                'starttime': updated_payload.get('starttime'),
+                'enddate': updated_payload.get('enddate'),
+                'endtime': updated_payload.get('endtime'),
+                **notification,
+            })
+            response['intent'] = 'new'
+
+        elif db_action == 'delete':
+            delete_payload = response.get('payload', {}).get('deletePayload', [])
+            task_ids = [obj.get('_id') for obj in delete_payload if obj.get('_id')]
+            jobs = [calendarJob('delete', email, task_id=obj.get('_id'))
+                    for obj in delete_payload if obj.get('_id') and obj.get('addedToCalendar')]
+            if task_ids:
+                await deleteTasks(task_ids, email, jobs)
+            if jobs:
+                await timed("calendar_sync", sync_calendar(email))
+            response['nInfo']['delete'] = task_ids
+            response['intent'] = 'new'
+    return response
+
+@app.websocket("/notifications")
+async def notifications(websocket: WebSocket, email: str, since: Optional[str] = None):
+    await websocket.accept()
+    # since is the "at" of the last copy the client stored; without it the
+    # client gets the copy for all of its upcoming tasks first.
+    try:
+        cursor = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        cursor = None
+
+    async def forward():
+        async for message in notification_worker.deliveries(email, cursor):
+            await websocket.send_json(dict(message, at=message["at"].isoformat()))
+
+    sender = asyncio.create_task(forward())
+    try:
+        while True:
+            # Nothing is expected from the client; reading is how a disconnect shows up.
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+async def save_user_turn(email, user_message):
+    # The reply and the user's turn are normally written together once the
+    # reply exists; when it never does, the user's turn is still kept.
+    result = await insertMessages(email, [user_message])
+    if result.get("code") != 200:
+        logger.warning("Error saving user message: %s", result.get("msg"))
+
 @app.post("/chat")
 async def process_query(input: QueryInput, authorization: str = Depends(extract_access_token)):
+    await admission.admit("/chat", input.email)
+    user_message = newMessage(input.query,'user')
     try:
         user_input = input.query
-        history = input.chat_history
         email = input.email
         access_token = authorization
-        logger.info(f"Access Token Received: {access_token}")
-        await insertMessage(email,user_input,'user')
-        info = await retriveAllTask(email)
+        history, info = await asyncio.gather(timed("history", build_history(email, input.chat_history)), timed("tasks", retriveAllTask(email, include_calendar=True)))
+        refresh_mirror(email, access_token, info.get('calendarSyncedAt'))
         tasks = info.get('data', []) if isinstance(info, dict) else []
-        history += f'\nDATARESULT:{tasks}'
-        classification_res = classify(user_input,history)
-        print(classification_res)
+        history += f'\nDATARESULT:{task_context(tasks, user_input)}'
+        classification_res, dialog = await route_query(user_input, history, tasks)
+        logger.debug("Classification: %s", classification_res)
         response = {'text': 'If this message appears then ', 'isInfoIncomplete': False, 'dbAction': 'noaction', 'calendarAction': 'noaction'}
         if(classification_res['res']=='first'):
-            response = generalDialog(user_input, history)
+            response = await dialog
             response["nInfo"] = response.get("nInfo", {}) 
-            logger.info(f"Generated Response: {response}")
-
-            if not response.get('isInfoIncomplete'):
-                db_action = response.get('dbAction')
-
-                if db_action == 'add':
-                    payload = response.get('payload', {})
-                    if all(k in payload for k in ['startdate', 'starttime', 'enddate', 'endtime']):
-                        inter_conflict = check_task_conflict(payload,tasks)
-                        is_past = is_past_task(payload['startdate'], payload['starttime'])
-                        conflict_check = conflictChecker(inter_conflict, tasks, 'add',payload,response['text'],is_past)
-                        print(conflict_check)
-                        if not conflict_check.get('isConflict'):
-                            response['text'] = conflict_check['response']
-                            event_info = create_google_calendar_event(
-                                access_token,
-                                payload.get('summary', ''),
-                                payload.get('desc', ''),
-                                payload['startdate'],
-                                payload['starttime'],
-                                payload['enddate'],
-                                payload['endtime'],
-                                payload.get('daily', False)
-                            )
-                            payload['addedToCalendar'] = True
-                            temp = await insertTask(email, payload, event_info.get('id'))
-                        else:
-                            await insertMessage(email,conflict_check['text'],'bot')
-                            return conflict_check
-                    else:
-                        payload['addedToCalendar'] = False
-                        temp = await insertTask(email, payload)
-
-                    response['nInfo'].update({
-                        'task_id': temp['task_id'],
-                        'startdate': payload.get('startdate'),
-                        'starttime': payload.get('starttime'),
-                        'enddate': payload.get('enddate'),
-                        'endtime': payload.get('endtime'),
-                        'title':conflict_check.get('title'),
-                        'body':conflict_check.get('body'),
-                        'title1':conflict_check.get('title1'),
-                        'body1':conflict_check.get('body1')
-                    })
-
-                    response['intent'] = 'new'
-
-                elif db_action == 'update':
-                    updated_payload = response.get('payload', {}).get('updatedPayload', {}).get('task', {})
-                    task_id = response.get('payload', {}).get('updatedPayload', {}).get('task_id')
-
-                    if updated_payload.get('addedToCalendar') and task_id:
-                        tasks = [t for t in tasks if t.get('task_id') != task_id]
-                        inter_conflict = check_task_conflict(updated_payload,tasks)
-                        is_past = is_past_task(updated_payload['startdate'], updated_payload['starttime'])
-                        conflict_check = conflictChecker(inter_conflict, tasks, 'update',updated_payload,response['text'],is_past)
-                        if not conflict_check.get('isConflict'):
-                            response['text'] = conflict_check['response']
-                            if response.get('calendarAction') == 'add':
-                                event_info = create_google_calendar_event(
-                                    access_token,
-                                    updated_payload.get('summary', ''),
-                                    updated_payload.get('desc', ''),
-                                    updated_payload['startdate'],
-                                    updated_payload['starttime'],
-                                    updated_payload['enddate'],
-                                    updated_payload['endtime'],
-                                    updated_payload.get('daily', False)
-                                )
-                                response['payload']['updatedPayload']['task_id'] = event_info.get('id')
-                            elif response.get('calendarAction') == 'update':
-                                update_google_calendar_event(
-                                    access_token,
-                                    task_id,
-                                    updated_payload.get('summary', ''),
-                                    updated_payload.get('desc', ''),
-                                    updated_payload['startdate'],
-                                    updated_payload['starttime'],
-                                    updated_payload['enddate'],
-                                    updated_payload['endtime'],
-                                    updated_payload.get('daily', False)
-                                )
-                        else:
-                            await insertMessage(email,conflict_check['text'],'bot')
-                            return conflict_check
-                        response['nInfo'].update({
-                            'title':conflict_check.get('title'),
-                            'body':conflict_check.get('body'),
-                            'title1':conflict_check.get('title1'),
-                            'body1':conflict_check.get('body1')
-                        })
-                    await updateTask(task_id, updated_payload, task_id)
-                    response['nInfo'].update({
-                        'task_id': task_id,
-                        'startdate': updated_payload.get('startdate'),
-                        'starttime': updated_payload.get('starttime'),
-                        'enddate': updated_payload.get('enddate'),
-                        'endtime': updated_payload.get('endtime'),
-                    })
-                    response['intent'] = 'new'
-
-                elif db_action == 'delete':
-                    delete_payload = response.get('payload', {}).get('deletePayload', [])
-                    response['nInfo']['delete'] = []
-                    for obj in delete_payload:
-                        if obj.get('addedToCalendar'):
-                            delete_google_calendar_event(access_token, obj.get('_id'))
-                        await deleteTask(obj.get('_id'))
-                        response['nInfo']['delete'].append(obj.get('_id'))
-                    response['intent'] = 'new'
-            print(response)
+            logger.debug("Generated response: %s", response)
+            response = await handle_task_dialog(email, response, tasks, access_token, info.get('version'), info.get('calendar', []))
         else:
-            response['text']=searchToGoogle(user_input,classification_res['history'])
-            print(response)
-        await insertMessage(email,response['text'],'bot')
+            response['text']=await timed("search", searchToGoogle(user_input,classification_res['history']))
+        await timed("save_messages", insertMessages(email,[user_message,newMessage(response['text'],'bot')]))
         return response
+    except Throttled:
+        raise
     except Exception as e:        
-        logger.error(f"Unexpected error: {e}")
-
+        logger.exception("Unexpected error: %s", e)
+        await save_user_turn(input.email, user_message)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def chat_events(input: QueryInput, access_token: str):
+    user_message = newMessage(input.query,'user')
+    try:
+        user_input = input.query
+        email = input.email
+        history, info = await asyncio.gather(timed("history", build_history(email, input.chat_history)), timed("tasks", retriveAllTask(email, include_calendar=True)))
+        refresh_mirror(email, access_token, info.get('calendarSyncedAt'))
+        tasks = info.get('data', []) if isinstance(info, dict) else []
+        history += f'\nDATARESULT:{task_context(tasks, user_input)}'
+        classification_res, dialog = await route_query(user_input, history, tasks)
+        response = {'text': '', 'isInfoIncomplete': False, 'dbAction': 'noaction', 'calendarAction': 'noaction'}
+        if(classification_res['res']=='first'):
+            response = await dialog
+            response["nInfo"] = response.get("nInfo", {})
+            response = await handle_task_dialog(email, response, tasks, access_token, info.get('version'), info.get('calendar', []))
+            yield sse("token", {"text": response['text']})
+        else:
+            parts = []
+            async for chunk in searchToGoogleStream(user_input,classification_res['history']):
+                parts.append(chunk)
+                yield sse("token", {"text": chunk})
+            response['text'] = ''.join(parts).strip()
+        await timed("save_messages", insertMessages(email,[user_message,newMessage(response['text'],'bot')]))
+        yield sse("done", response)
+    except Throttled as e:
+        yield sse("error", {"detail": "Too Many Requests", "retry_after": e.header()})
+    except Exception as e:
+        logger.exception("Unexpected error: %s", e)
+        await save_user_turn(input.email, user_message)
+        yield sse("error", {"detail": "Internal Server Error"})
+
+@app.post("/chat/stream")
+async def stream_query(input: QueryInput, authorization: str = Depends(extract_access_token)):
+    await admission.admit("/chat", input.email)
+    return StreamingResponse(chat_events(input, authorization), media_type="text/event-stream")
+
 class msg(BaseModel):
     task:str
 
 @app.post("/message")
-async def process_query(temp: msg):
+async def process_query(temp: msg, request: Request):
+    await admission.admit("/message", request.client.host if request.client else "-")
     try:
-        output = messageGenerator(temp.task)  
-        print(output)
+        output = await messageGenerator(temp.task)  
+        logger.debug("Output: %s", output)
         return output
+    except Throttled:
+        raise
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.exception("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 class Conv(BaseModel):
@@ -200,30 +359,62 @@ class Conv(BaseModel):
 
 @app.post("/conv")
 async def conv(d:Conv):
+    await admission.admit("/conv", d.email)
+    user_message = newMessage(d.msg,'user')
     try:
-        history = d.history
         msg = d.msg
         email = d.email
-        await insertMessage(email,msg,'user')
-        output = conversaction(msg, history)
-        await insertMessage(email,output['res'],'bot')
-        print(output)
+        history = await build_history(email, d.history)
+        output = await conversaction(msg, history)
+        await insertMessages(email,[user_message,newMessage(output['res'],'bot')])
+        logger.debug("Output: %s", output)
         return output  
+    except Throttled:
+        raise
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.exception("Unexpected error: %s", e)
+        await save_user_turn(d.email, user_message)
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
+async def conv_events(d: Conv):
+    user_message = newMessage(d.msg,'user')
+    try:
+        history = await build_history(d.email, d.history)
+        parts = []
+        async for chunk in conversactionStream(d.msg, history):
+            parts.append(chunk)
+            yield sse("token", {"text": chunk})
+        output = {'res': ''.join(parts).strip()}
+        await insertMessages(d.email,[user_message,newMessage(output['res'],'bot')])
+        yield sse("done", output)
+    except Throttled as e:
+        yield sse("error", {"detail": "Too Many Requests", "retry_after": e.header()})
+    except Exception as e:
+        logger.exception("Unexpected error: %s", e)
+        await save_user_turn(d.email, user_message)
+        yield sse("error", {"detail": "Internal Server Error"})
+
+@app.post("/conv/stream")
+async def conv_stream(d:Conv):
+    await admission.admit("/conv", d.email)
+    return StreamingResponse(conv_events(d), media_type="text/event-stream")
+
 class retriveDTO(BaseModel):
     email:str
 
+class pageDTO(retriveDTO):
+    before: Optional[str] = None
+    after: Optional[str] = None
+    limit: Optional[int] = None
+
 @app.post("/retriveMessages")
-async def ret(d:retriveDTO):
+async def ret(d:pageDTO):
     try:
         email = d.email
-        res = await retriveMessages(email)
+        res = await retriveMessages(email, d.before, d.after, d.limit)
         return res
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.exception("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
 @app.post("/deleteMessages")
@@ -233,5 +424,5 @@ async def delete_messages(d: retriveDTO):
         res = await deleteMessages(email)
         return res
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.exception("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
@@ -0,0 +1,51 @@
+from CalendarAPI.sync import calendar_worker
+from GeminiAPI.cache import response_cache
+from GeminiAPI.prompts import token_usage
+from GeminiAPI.resilience import resilience
+from GeminiAPI.notifications import notification_worker
+from GeminiAPI.singleflight import single_flight
+from GeminiAPI import slots
+from database.taskcache import task_cache
+from monitoring import logs
+from monitoring.metrics import registry
+
+
+def _events(stats):
+    return lambda: {(("event", event),): value for event, value in stats.items()}
+
+
+def _tokens():
+    samples = {}
+    for template, entry in token_usage.stats.items():
+        for kind in ("prompt", "completion", "cached"):
+            samples[(("kind", kind), ("template", template))] = entry[f"{kind}_tokens"]
+    return samples
+
+
+def _calls():
+    return {(("template", template),): entry["calls"] for template, entry in token_usage.stats.items()}
+
+
+def register_collectors():
+    registry.gauge("gemini_tokens_total", "Gemini tokens by prompt template.", _tokens, kind="counter")
+    registry.gauge("gemini_calls_total", "Gemini calls by prompt template.", _calls, kind="counter")
+    registry.gauge("gemini_cache_events_total", "Response cache hits, misses and evictions.",
+                   _events(response_cache.stats), kind="counter")
+    registry.gauge("gemini_cache_hit_ratio", "Response cache hit ratio since start.",
+                   lambda: {(): response_cache.hit_rate()})
+    registry.gauge("gemini_single_flight_total", "Gemini calls and how many joined an in-flight call.",
+                   _events(single_flight.stats), kind="counter")
+    registry.gauge("task_cache_events_total", "In-process task cache hits, misses and evictions.",
+                   _events(task_cache.stats), kind="counter")
+    registry.gauge("calendar_outbox_jobs_total", "Calendar outbox jobs synced, retried and dead-lettered.",
+                   _events(calendar_worker.stats), kind="counter")
+    registry.gauge("log_records_discarded_total", "Log records dropped on a full queue or sampled out.",
+                   _events(logs.stats), kind="counter")
+    registry.gauge("gemini_resilience_total", "Gemini calls hedged, past their deadline or diverted by the breaker.",
+                   _events(resilience.stats), kind="counter")
+    registry.gauge("gemini_circuit_open", "1 while the Gemini circuit breaker is open or probing.",
+                   lambda: {(): 0 if resilience.breaker.state == "closed" else 1})
+    registry.gauge("local_dialog_total", "Task commands filled in locally versus passed to generalDialog.",
+                   _events(slots.stats), kind="counter")
+    registry.gauge("notification_copy_total", "Background notification copy jobs queued, generated and pushed.",
+                   _events(notification_worker.stats), kind="counter")
@@ -0,0 +1,210 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import reprlib
+import sys
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from dotenv import load_dotenv
+from monitoring.metrics import RequestIdFilter
+
+load_dotenv('./config.env')
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Longest rendering of any one log argument before it is cut.
+LOG_FIELD_MAX = int(os.getenv("LOG_FIELD_MAX", "2000"))
+# Share of DEBUG records kept when LOG_LEVEL=DEBUG.
+LOG_DEBUG_SAMPLE = float(os.getenv("LOG_DEBUG_SAMPLE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Items kept per container when an argument is snapshotted for the queue.
+LOG_SNAPSHOT_ITEMS = int(os.getenv("LOG_SNAPSHOT_ITEMS", "50"))
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+
+_secrets = [
+    (re.compile(r"(Bearer\s+)[A-Za-z0-9\-._~+/]+=*", re.IGNORECASE), r"\1[REDACTED]"),
+    (re.compile(r"ya29\.[A-Za-z0-9\-._]+"), "[REDACTED]"),
+    (re.compile(r"""(["']?(?:access_token|refresh_token|authorization|api_key|GEMINI_KEY)["']?\s*[:=]\s*["']?)[^"',\s}]+""",
+                re.IGNORECASE), r"\1[REDACTED]"),
+]
+
+stats = {"dropped": 0, "sampled_out": 0}
+
+
+def redact(text):
+    for pattern, replacement in _secrets:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def cap(text, limit=LOG_FIELD_MAX):
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...(+{len(text) - limit} chars)"
+
+
+def _cap_arg(value):
+    # Numbers stay numbers so %d and %.2f placeholders still format.
+    if isinstance(value, (int, float)):
+        return value
+    return cap(str(value))
+
+
+_containers = (dict, list, tuple, set, frozenset, deque)
+
+_snapshot = reprlib.Repr()
+_snapshot.maxlevel = 4
+_snapshot.maxdict = _snapshot.maxlist = _snapshot.maxtuple = LOG_SNAPSHOT_ITEMS
+_snapshot.maxset = _snapshot.maxfrozenset = _snapshot.maxdeque = LOG_SNAPSHOT_ITEMS
+_snapshot.maxstring = _snapshot.maxother = LOG_FIELD_MAX
+
+
+def snapshot(value):
+    """A value the listener thread can render safely later.
+
+    Primitives are immutable and pass through; containers are rendered now,
+    bounded by reprlib, since the event loop may mutate them once the
+    record is queued. Anything else is reduced to str() as %s would.
+    """
+    if value is None or isinstance(value, (str, int, float, bytes)):
+        return value
+    if isinstance(value, _containers):
+        return _snapshot.repr(value)
+    return str(value)
+
+
+def render_message(record):
+    """record.getMessage() with every argument capped before interpolation."""
+    message = str(record.msg)
+    args = record.args
+    if not args:
+        return cap(message)
+    if isinstance(args, dict):
+        capped = {key: _cap_arg(value) for key, value in args.items()}
+    else:
+        capped = tuple(_cap_arg(arg) for arg in args)
+    try:
+        return message % capped
+    except (TypeError, ValueError):
+        return f"{message} {capped}"
+
+
+class SafeFormatter(logging.Formatter):
+    """Runs on the listener thread: interpolates, caps and redacts."""
+
+    def formatMessage(self, record):
+        return redact(super().formatMessage(record))
+
+    def format(self, record):
+        record.message = render_message(record)
+        if self.usesTime():
+            record.asctime = self.formatTime(record, self.datefmt)
+        text = self.formatMessage(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            text = f"{text}\n{redact(record.exc_text)}"
+        return text
+
+
+class JsonFormatter(SafeFormatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": redact(render_message(record)),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry["fields"] = {key: redact(cap(str(value))) for key, value in fields.items()}
+        if record.exc_info:
+            entry["exc"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry)
+
+
+class DebugSampler(logging.Filter):
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate:
+            return True
+        stats["sampled_out"] += 1
+        return False
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting them first.
+
+    The stock QueueHandler renders the message on the calling thread, which
+    for a list of tasks is exactly the work we want off the event loop.
+    Interpolation, capping and redaction happen on the listener; only the
+    arguments are snapshotted here so later mutation can't reach the log.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        if not isinstance(record.msg, str):
+            record.msg = snapshot(record.msg)
+        if isinstance(record.args, dict):
+            # LogRecord unwraps a lone mapping argument; only "%(key)s"
+            # messages need it kept as a mapping.
+            if "%(" in record.msg:
+                record.args = {key: snapshot(value) for key, value in record.args.items()}
+            else:
+                record.args = (snapshot(record.args),)
+        elif record.args:
+            record.args = tuple(snapshot(arg) for arg in record.args)
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = {key: snapshot(value) for key, value in fields.items()}
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            stats["dropped"] += 1
+
+
+_listener = None
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else SafeFormatter(TEXT_FORMAT))
+    records = queue.Queue(LOG_QUEUE_SIZE)
+    handler = DeferredQueueHandler(records)
+    # Request IDs live in a contextvar, so they have to be read before the
+    # record leaves the event loop thread.
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(DebugSampler(LOG_DEBUG_SAMPLE))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pymongo import monitoring
+
+# Request ID of the request being served; "-" outside of one.
+request_id = contextvars.ContextVar("request_id", default="-")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + inner + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = list(self.values.items())
+        for key, value in values:
+            yield self.name, key, value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self.lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self.values.items()]
+        for key, counts, total, count in values:
+            running = 0
+            for bound, bucket in zip(self.buckets + ("+Inf",), counts):
+                running += bucket
+                yield f"{self.name}_bucket", key + (("le", str(bound)),), running
+            yield f"{self.name}_sum", key, total
+            yield f"{self.name}_count", key, count
+
+
+class Gauge:
+    """Read at scrape time from a callback returning {labels tuple: value}.
+    kind="counter" exposes running totals kept elsewhere (e.g. cache stats)."""
+
+    def __init__(self, name, help, collect, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self):
+        for key, value in self.collect().items():
+            yield self.name, key, value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help):
+        return self.metrics.get(name) or self.register(Counter(name, help))
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self.metrics.get(name) or self.register(Histogram(name, help, buckets))
+
+    def gauge(self, name, help, collect, kind="gauge"):
+        return self.register(Gauge(name, help, collect, kind))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                for name, key, value in metric.samples():
+                    lines.append(f"{name}{_labels(key)} {value}")
+            except Exception as e:
+                logging.getLogger(__name__).warning("Failed to collect %s: %s", metric.name, e)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram("chatbot_stage_seconds", "Time spent per request stage.")
+stage_errors = registry.counter("chatbot_stage_errors_total", "Exceptions raised per request stage.")
+http_seconds = registry.histogram("chatbot_http_request_seconds", "HTTP request latency by route and status.")
+
+
+class span:
+    """Time a block as one stage. Usable with both `with` and `async with`."""
+
+    __slots__ = ("stage", "labels", "start")
+
+    def __init__(self, stage, **labels):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, error, traceback):
+        stage_seconds.observe(time.perf_counter() - self.start, stage=self.stage, **self.labels)
+        # Cancellation is how losing speculative calls end; not an error.
+        if error is not None and not isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            stage_errors.inc(stage=self.stage, error=kind.__name__, **self.labels)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, kind, error, traceback):
+        return self.__exit__(kind, error, traceback)
+
+
+async def timed(stage, awaitable, **labels):
+    with span(stage, **labels):
+        return await awaitable
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Feeds every Mongo command's server round trip into the stage histogram.
+    Called from driver threads, hence the locks on the metrics above."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        stage_seconds.observe(event.duration_micros / 1e6, stage="mongo", op=event.command_name)
+
+    def failed(self, event):
+        stage_seconds.observe(event.duration_micros / 1e6, stage="mongo", op=event.command_name)
+        stage_errors.inc(stage="mongo", op=event.command_name, error="CommandFailed")
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
@@ -0,0 +1,16 @@
+import asyncio
+import os
+import pytest
+
+# GeminiAPI.client builds its client at import time; the tests never call it.
+os.environ.setdefault("GEMINI_KEY", "test")
+
+
+@pytest.fixture
+def mongo():
+    """Point the database modules at a fresh in-memory Mongo."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from database import utils1
+    db = asyncio.run(utils1.connect(mongomock_motor.AsyncMongoMockClient()))
+    yield db
+    asyncio.run(utils1.close())
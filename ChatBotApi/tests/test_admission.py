@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from admission import limits
+from admission.limits import Admission, Throttled, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    state = {"now": 100.0, "slept": []}
+    monkeypatch.setattr(limits.time, "monotonic", lambda: state["now"])
+
+    async def sleep(seconds):
+        state["slept"].append(seconds)
+        state["now"] += seconds
+
+    monkeypatch.setattr(limits.asyncio, "sleep", sleep)
+    monkeypatch.setattr(limits, "ADMISSION", True)
+    return state
+
+
+def test_bucket_reserves_in_arrival_order(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_for() == 1
+    bucket.take()
+    # The next caller queues behind the reservation above.
+    assert bucket.wait_for() == 2
+    clock["now"] += 1
+    assert bucket.wait_for() == 1
+
+
+def test_bucket_refills_up_to_burst(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.take()
+    clock["now"] += 100
+    bucket.give()
+    assert bucket.tokens == 2
+
+
+def test_burst_is_admitted_then_queued_then_rejected(clock):
+    admission = Admission({"/chat": (60, 2, 100)}, max_wait=1.5)
+
+    async def admit():
+        await admission.admit("/chat", "a@x")
+
+    asyncio.run(admit())
+    asyncio.run(admit())
+    assert clock["slept"] == []
+    asyncio.run(admit())
+    assert clock["slept"] == [1]
+    admission.users[("/chat", "a@x")].take()
+    admission.users[("/chat", "a@x")].take()
+    with pytest.raises(Throttled) as raised:
+        asyncio.run(admit())
+    assert raised.value.reason == "user rate limit" and raised.value.header() == "3"
+
+
+def test_users_have_separate_budgets_under_a_shared_endpoint_cap(clock):
+    admission = Admission({"/chat": (60, 1, 1)}, max_wait=0.5)
+    asyncio.run(admission.admit("/chat", "a@x"))
+    with pytest.raises(Throttled) as raised:
+        asyncio.run(admission.admit("/chat", "b@x"))
+    assert raised.value.reason == "endpoint rate limit"
+    clock["now"] += 1
+    asyncio.run(admission.admit("/chat", "b@x"))
+
+
+def test_cancelled_waiter_hands_its_slot_back(clock, monkeypatch):
+    admission = Admission({"/chat": (60, 1, 100)}, max_wait=5)
+    asyncio.run(admission.admit("/chat", "a@x"))
+
+    async def cancelled(seconds):
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(limits.asyncio, "sleep", cancelled)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(admission.admit("/chat", "a@x"))
+    assert admission.users[("/chat", "a@x")].wait_for() == 1
+
+
+def test_unknown_endpoints_and_disabled_admission_pass(clock, monkeypatch):
+    admission = Admission({"/chat": (60, 0, 0)}, max_wait=0)
+    asyncio.run(admission.admit("/other", "a@x"))
+    monkeypatch.setattr(limits, "ADMISSION", False)
+    asyncio.run(admission.admit("/chat", "a@x"))
+
+
+def test_idle_user_buckets_are_evicted(clock):
+    admission = Admission({"/chat": (60, 5, 100)}, max_keys=2)
+    for user in ("a@x", "b@x", "a@x", "c@x"):
+        asyncio.run(admission.admit("/chat", user))
+    assert list(admission.users) == [("/chat", "a@x"), ("/chat", "c@x")]
@@ -0,0 +1,112 @@
+import asyncio
+import httpx
+import pytest
+from CalendarAPI import batch
+from CalendarAPI.batch import batch_calendar_operations, parse_batch_response
+from CalendarAPI.client import CalendarClient
+
+
+def part(index, status, body=None):
+    reason = {200: "OK", 204: "No Content", 404: "Not Found", 429: "Too Many Requests", 503: "Service Unavailable"}[status]
+    lines = ["--b", "Content-Type: application/http", f"Content-ID: <response-item{index}>", "",
+             f"HTTP/1.1 {status} {reason}", "Content-Type: application/json; charset=UTF-8", ""]
+    if body is not None:
+        lines.append(body)
+    return "\r\n".join(lines) + "\r\n"
+
+
+def multipart(*parts):
+    return "".join(parts) + "--b--\r\n"
+
+
+def test_parse_maps_mixed_statuses_to_items():
+    body = multipart(
+        part(1, 404, '{"error": {"message": "Not Found"}}'),
+        part(0, 200, '{"id": "ev0"}'),
+        part(2, 503, "upstream down"),
+        part(3, 204),
+    )
+    parts = parse_batch_response('multipart/mixed; boundary="b"', body)
+    assert parts[0] == (200, {"id": "ev0"})
+    assert parts[1] == (404, {"error": {"message": "Not Found"}})
+    assert parts[2] == (503, {"raw": "upstream down"})
+    assert parts[3] == (204, None)
+
+
+def test_parse_needs_a_boundary():
+    with pytest.raises(ValueError):
+        parse_batch_response("multipart/mixed", "")
+
+
+def run(monkeypatch, operations, handler):
+    seen = []
+
+    def record(request):
+        seen.append(request)
+        return handler(len(seen))
+
+    client = CalendarClient(transport=httpx.MockTransport(record), max_retries=2)
+
+    async def sleep(seconds):
+        pass
+
+    monkeypatch.setattr(batch, "calendar_client", client)
+    monkeypatch.setattr(batch.asyncio, "sleep", sleep)
+
+    async def go():
+        try:
+            return await batch_calendar_operations("token", operations)
+        finally:
+            await client.aclose()
+    return asyncio.run(go()), seen
+
+
+OPERATIONS = [
+    {"op": "create", "task_id": "t-create", "task": {"summary": "a", "startdate": "2030-01-01", "starttime": "09:00"}},
+    {"op": "delete", "task_id": "t-delete", "event_id": "ev1"},
+    {"op": "delete", "task_id": "t-gone", "event_id": "ev2"},
+]
+
+
+def reply(*parts):
+    return httpx.Response(200, headers={"Content-Type": "multipart/mixed; boundary=b"}, text=multipart(*parts))
+
+
+def test_results_are_keyed_by_task_id(monkeypatch):
+    results, _ = run(monkeypatch, OPERATIONS, lambda n: reply(
+        part(0, 200, '{"id": "new"}'), part(1, 204), part(2, 404)))
+    assert results["t-create"] == {"success": True, "status": 200, "id": "new"}
+    assert results["t-delete"]["success"] and results["t-gone"]["success"]
+
+
+def test_5xx_create_is_not_retried_but_delete_is(monkeypatch):
+    def handler(n):
+        if n == 1:
+            return reply(part(0, 503), part(1, 503), part(2, 204))
+        return reply(part(0, 204))
+    results, seen = run(monkeypatch, OPERATIONS, handler)
+    assert len(seen) == 2
+    assert b"DELETE" in seen[1].content and b"POST /calendar" not in seen[1].content
+    assert results["t-create"]["success"] is False and results["t-create"]["uncertain"]
+    assert results["t-delete"]["success"]
+
+
+def test_429_create_is_retried(monkeypatch):
+    def handler(n):
+        return reply(part(0, 429)) if n == 1 else reply(part(0, 200, '{"id": "new"}'))
+    results, seen = run(monkeypatch, OPERATIONS[:1], handler)
+    assert len(seen) == 2
+    assert results["t-create"]["id"] == "new"
+
+
+def test_failed_batch_does_not_replay_creates(monkeypatch):
+    def handler(n):
+        if n == 1:
+            raise httpx.ReadTimeout("slow")
+        return reply(part(0, 204), part(1, 204))
+    results, seen = run(monkeypatch, OPERATIONS, handler)
+    assert len(seen) == 2
+    assert b"POST /calendar" not in seen[1].content
+    assert results["t-create"]["uncertain"]
+    assert "batch request failed" in results["t-create"]["message"]
+    assert results["t-delete"]["success"] and results["t-gone"]["success"]
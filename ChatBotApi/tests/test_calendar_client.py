@@ -0,0 +1,111 @@
+import asyncio
+import httpx
+import pytest
+from CalendarAPI import client as calendar
+from CalendarAPI.client import CalendarClient, retry_after_seconds
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(calendar.asyncio, "sleep", sleep)
+    return slept
+
+
+def stub(*replies):
+    """A transport answering with replies in turn; each is a status code,
+    an (status, headers) pair or an exception to raise."""
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        reply = replies[min(len(seen), len(replies)) - 1]
+        if isinstance(reply, Exception):
+            raise reply
+        status, headers = reply if isinstance(reply, tuple) else (reply, {})
+        return httpx.Response(status, headers=headers, json={})
+
+    return httpx.MockTransport(handler), seen
+
+
+def call(client, method, **kwargs):
+    async def run():
+        try:
+            return await client.request(method, "/calendar/v3/x", "token", **kwargs)
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def test_get_retries_5xx_with_backoff(sleeps):
+    transport, seen = stub(503, 502, 200)
+    response = call(CalendarClient(transport=transport), "GET")
+    assert response.status_code == 200
+    assert len(seen) == 3
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= calendar.CALENDAR_BACKOFF_MAX for delay in sleeps)
+
+
+def test_retries_stop_at_max_retries(sleeps):
+    transport, seen = stub(500)
+    response = call(CalendarClient(transport=transport, max_retries=2), "GET")
+    assert response.status_code == 500
+    assert len(seen) == 3
+
+
+def test_retry_after_is_honoured(sleeps):
+    transport, _ = stub((429, {"Retry-After": "7"}), 200)
+    call(CalendarClient(transport=transport), "POST")
+    assert sleeps == [7.0]
+
+
+def test_retry_after_is_capped(sleeps):
+    transport, _ = stub((429, {"Retry-After": "3600"}), 200)
+    call(CalendarClient(transport=transport), "GET")
+    assert sleeps == [calendar.CALENDAR_RETRY_AFTER_MAX]
+
+
+def test_post_is_not_replayed_on_5xx(sleeps):
+    transport, seen = stub(500, 200)
+    response = call(CalendarClient(transport=transport), "POST")
+    assert response.status_code == 500
+    assert len(seen) == 1
+    assert sleeps == []
+
+
+def test_post_is_not_replayed_after_read_timeout(sleeps):
+    transport, seen = stub(httpx.ReadTimeout("slow"), 200)
+    with pytest.raises(httpx.ReadTimeout):
+        call(CalendarClient(transport=transport), "POST")
+    assert len(seen) == 1
+
+
+def test_post_is_retried_when_connect_fails(sleeps):
+    transport, seen = stub(httpx.ConnectError("refused"), 200)
+    assert call(CalendarClient(transport=transport), "POST").status_code == 200
+    assert len(seen) == 2
+
+
+def test_get_is_retried_after_read_timeout(sleeps):
+    transport, seen = stub(httpx.ReadTimeout("slow"), 200)
+    assert call(CalendarClient(transport=transport), "GET").status_code == 200
+    assert len(seen) == 2
+
+
+def test_timeout_is_applied(sleeps):
+    transport, seen = stub(200)
+    call(CalendarClient(transport=transport, timeout=3), "GET")
+    call(CalendarClient(transport=transport, timeout=3), "GET", timeout=1)
+    assert seen[0].extensions["timeout"]["read"] == 3
+    assert seen[1].extensions["timeout"]["read"] == 1
+
+
+def test_retry_after_seconds_parses_both_forms():
+    assert retry_after_seconds("12") == 12.0
+    assert retry_after_seconds("Thu, 01 Jan 1970 00:00:00 GMT") == 0.0
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds(None) is None
@@ -0,0 +1,94 @@
+import json
+import pytest
+from GeminiAPI import classifier
+from GeminiAPI.classifier import IntentClassifier, read_samples, rule_vote, strip_dataresult
+
+TRAINING = [
+    ("add a meeting tomorrow at 3pm", "first"),
+    ("remind me to call mom at 6pm", "first"),
+    ("delete my dentist appointment", "first"),
+    ("move my standup to 10am", "first"),
+    ("what's on my calendar today", "first"),
+    ("what is the weather in paris", "second"),
+    ("latest news about the election", "second"),
+    ("who won the match last night", "second"),
+    ("capital of australia", "second"),
+    ("price of bitcoin today", "second"),
+]
+
+
+@pytest.mark.parametrize("text, vote", [
+    ("schedule a meeting at 5pm", ("first", 3)),
+    ("what is the weather in paris", ("second", 2)),
+    ("tell me about the event horizon", ("first", 1)),
+    ("what's the weather for my meeting", (None, 0)),
+    ("hello there", (None, 0)),
+])
+def test_rule_vote(text, vote):
+    assert rule_vote(text) == vote
+
+
+@pytest.mark.parametrize("text, label", [
+    ("schedule a meeting at 5pm", "first"),
+    ("what is the weather in paris", "second"),
+    # One pattern alone is below the threshold.
+    ("tell me about the event horizon", None),
+    ("hello there", None),
+])
+def test_untrained_needs_two_agreeing_patterns(monkeypatch, text, label):
+    monkeypatch.setattr(classifier, "intent_classifier", IntentClassifier(threshold=0.85))
+    result = classifier.local_classify(text, "history")
+    assert (result and result["res"]) == label
+
+
+def test_trained_model_learns_the_split():
+    model = IntentClassifier().fit(TRAINING, epochs=30)
+    assert model.predict("remind me to buy milk at 6pm")[0] == "first"
+    assert model.predict("news about the stock market")[0] == "second"
+
+
+def leaning(bias):
+    model = IntentClassifier()
+    model.weights = {0: 0.0}
+    model.bias = bias
+    return model
+
+
+def test_trained_model_defers_when_rules_disagree():
+    assert leaning(-5).predict("schedule a meeting at 5pm") == (None, 0.0)
+    assert leaning(5).predict("schedule a meeting at 5pm")[0] == "first"
+
+
+def test_rules_lift_an_agreeing_model_to_the_threshold():
+    label, confidence = leaning(0.1).predict("schedule a meeting at 5pm")
+    assert label == "first" and confidence == 0.85
+    # With no rule to back it, a barely-first model stays below it.
+    assert leaning(0.1).predict("hello there")[1] < 0.85
+
+
+def test_search_keeps_history_without_dataresult(monkeypatch):
+    monkeypatch.setattr(classifier, "intent_classifier", IntentClassifier())
+    history = "user: hi\nDATARESULT:[{'task_id': '1'}]"
+    result = classifier.local_classify("what is the weather in paris", history)
+    assert result == {"res": "second", "history": "user: hi"}
+    assert strip_dataresult("no tasks") == "no tasks"
+
+
+def test_local_intent_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(classifier, "LOCAL_INTENT", False)
+    assert classifier.local_classify("schedule a meeting at 5pm", "") is None
+
+
+def test_model_round_trips(tmp_path):
+    model = IntentClassifier().fit(TRAINING)
+    path = tmp_path / "model.json"
+    model.save(path)
+    loaded = IntentClassifier.load(path)
+    text = "book a meeting room at 4pm"
+    assert loaded.probability(text) == pytest.approx(model.probability(text))
+
+
+def test_samples_file(tmp_path):
+    path = tmp_path / "samples.jsonl"
+    path.write_text("".join(json.dumps({"text": t, "label": l}) + "\n" for t, l in TRAINING[:2]) + "\n")
+    assert read_samples(path) == TRAINING[:2]
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from GeminiAPI import client
+
+
+class Chunk:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class Model:
+    def __init__(self, *texts):
+        self.texts = texts
+
+    async def generate_content_async(self, prompt, stream=False):
+        async def chunks():
+            for text in self.texts:
+                await asyncio.sleep(0)
+                yield Chunk(text)
+        return chunks()
+
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setattr(client, "limiter", asyncio.Semaphore(1))
+
+    async def acquire(prompt, template=None):
+        return 0
+
+    monkeypatch.setattr(client.gemini_quota, "acquire", acquire)
+    fake = Model("a", "b", "")
+    monkeypatch.setattr(client, "model_for", lambda template, model_id=None: fake)
+    return fake
+
+
+def test_limiter_is_free_while_the_caller_holds_a_chunk(model):
+    async def read():
+        seen = []
+        async for text in client.stream_text("hi"):
+            seen.append((text, client.limiter.locked()))
+        return seen
+    assert asyncio.run(read()) == [("a", False), ("b", False)]
+
+
+async def collect(stream):
+    return [text async for text in stream]
+
+
+def test_slow_reader_does_not_block_other_calls(model):
+    async def run():
+        stream = client.stream_text("hi")
+        assert await stream.__anext__() == "a"
+        # The first stream is parked on a yield; another call still gets in.
+        other = await asyncio.wait_for(collect(client.stream_text("hi")), 1)
+        await stream.aclose()
+        return other
+    assert asyncio.run(run()) == ["a", "b"]
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import pathlib
+import uuid
+import pytest
+from database.indexes import INDEXES, SHAPE_MODULES, collection_scans, ensure_indexes, query_shapes
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+# Offline tools that walk a whole collection on purpose.
+UNCHECKED = {"database.migrations", "database.indexes"}
+
+
+def leading_fields(collection):
+    return {keys[0][0] for keys, _ in INDEXES.get(collection, [])} | {"_id"}
+
+
+def test_every_shape_starts_with_an_indexed_field():
+    uncovered = [(collection, query, sender) for collection, query, _, sender in query_shapes()
+                 if not leading_fields(collection) & set(query)]
+    assert uncovered == []
+
+
+def test_modules_that_query_mongo_declare_their_shapes():
+    querying = set()
+    for path in ROOT.rglob("*.py"):
+        relative = path.relative_to(ROOT)
+        if relative.parts[0] in ("tests", "benchmarks"):
+            continue
+        if "_collection." in path.read_text():
+            querying.add(".".join(relative.with_suffix("").parts))
+    assert querying - UNCHECKED <= set(SHAPE_MODULES)
+
+
+def test_no_collection_scans_against_an_indexed_database():
+    uri = os.getenv("MONGO_TEST_URI")
+    if not uri:
+        pytest.skip("MONGO_TEST_URI is not set")
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def scans():
+        client = AsyncIOMotorClient(uri, serverSelectionTimeoutMS=5000)
+        name = f"plan_check_{uuid.uuid4().hex[:8]}"
+        try:
+            await ensure_indexes(client[name])
+            return await collection_scans(client[name])
+        finally:
+            await client.drop_database(name)
+            client.close()
+    assert asyncio.run(scans()) == []
@@ -0,0 +1,103 @@
+import random
+import pytest
+from GeminiAPI.intervals import DAY, ConflictEngine, IntervalTree, TaskSchedule, day_pieces, parse_entry
+
+
+def test_overlap_matches_brute_force():
+    rng = random.Random(7)
+    intervals = []
+    for index in range(300):
+        start = rng.randrange(0, 10_000)
+        intervals.append((start, start + rng.randrange(1, 500), index))
+    tree = IntervalTree(intervals)
+    for _ in range(300):
+        start = rng.randrange(0, 10_500)
+        end = start + rng.randrange(1, 800)
+        expected = sorted(item for item in intervals if item[0] < end and item[1] > start)
+        assert sorted(tree.overlap(start, end)) == expected
+
+
+def test_ranges_are_half_open():
+    tree = IntervalTree([(10, 20, "a")])
+    assert tree.overlap(20, 30) == []
+    assert tree.overlap(0, 10) == []
+    assert tree.overlap(19, 21) == [(10, 20, "a")]
+    assert IntervalTree([]).overlap(0, 100) == []
+
+
+@pytest.mark.parametrize("start, end, pieces", [
+    (DAY + 60, DAY + 120, [(60, 120)]),
+    (DAY + 23 * 60, 2 * DAY + 60, [(23 * 60, DAY), (0, 60)]),
+    (0, 3 * DAY, [(0, DAY)]),
+    (100, 50, []),
+])
+def test_day_pieces(start, end, pieces):
+    assert day_pieces(start, end) == pieces
+
+
+def task(task_id, start, end, startdate="2026-03-02", enddate=None, daily=False, name=None):
+    return {"task_id": task_id, "task": {"task": name or task_id, "startdate": startdate, "starttime": start,
+                                         "enddate": enddate or startdate, "endtime": end, "daily": daily}}
+
+
+def conflicts(tasks, new, exclude_id=None):
+    schedule = TaskSchedule()
+    schedule.sync(tasks)
+    return [entry.task_id for entry in schedule.conflicts(parse_entry(None, new["task"]), exclude_id)]
+
+
+def test_one_off_tasks():
+    tasks = [task("a", "09:00", "10:00"), task("b", "10:00", "11:00"), task("c", "09:00", "10:00", "2026-03-03")]
+    assert conflicts(tasks, task("new", "09:30", "10:30")) == ["a", "b"]
+    assert conflicts(tasks, task("new", "11:00", "12:00")) == []
+
+
+def test_daily_task_blocks_every_later_day():
+    tasks = [task("standup", "09:00", "09:15", daily=True)]
+    assert conflicts(tasks, task("new", "09:10", "09:30", "2026-04-10")) == ["standup"]
+    # Not before the daily task starts.
+    assert conflicts(tasks, task("new", "09:10", "09:30", "2026-03-01")) == []
+
+
+def test_new_daily_task_against_one_offs_and_dailies():
+    tasks = [task("late", "09:00", "10:00", "2026-03-05"), task("early", "09:00", "10:00", "2026-02-01"),
+             task("gym", "09:30", "10:30", daily=True)]
+    assert conflicts(tasks, task("new", "09:45", "10:15", daily=True)) == ["gym", "late"]
+
+
+def test_task_over_midnight():
+    tasks = [task("night", "23:00", "01:00", enddate="2026-03-03")]
+    assert conflicts(tasks, task("new", "00:30", "02:00", "2026-03-03")) == ["night"]
+    assert conflicts(tasks, task("new", "00:30", "02:00", "2026-03-04", daily=True)) == []
+    assert conflicts(tasks, task("new", "00:30", "02:00", "2026-03-01", daily=True)) == ["night"]
+
+
+def test_the_task_being_updated_is_excluded():
+    tasks = [task("a", "09:00", "10:00")]
+    assert conflicts(tasks, task("a", "09:30", "10:30"), exclude_id="a") == []
+
+
+def test_unparseable_tasks_are_ignored():
+    tasks = [task("a", "09:00", "10:00"), {"task_id": "b", "task": {"task": "no time"}}]
+    assert conflicts(tasks, task("new", "09:00", "10:00")) == ["a"]
+
+
+def test_sync_follows_edits_and_skips_a_known_version():
+    engine = ConflictEngine()
+    schedule = engine.schedule("a@x", [task("a", "09:00", "10:00")], version=1)
+    new = parse_entry(None, task("new", "09:30", "10:30")["task"])
+    assert [e.task_id for e in schedule.conflicts(new)] == ["a"]
+    # Same version: the list isn't read again.
+    engine.schedule("a@x", [], version=1)
+    assert [e.task_id for e in schedule.conflicts(new)] == ["a"]
+    engine.schedule("a@x", [task("a", "11:00", "12:00")], version=2)
+    assert schedule.conflicts(new) == []
+    engine.schedule("a@x", [], version=3)
+    assert schedule.entries == {}
+
+
+def test_engine_keeps_recent_users():
+    engine = ConflictEngine(max_users=2)
+    for email in ("a@x", "b@x", "a@x", "c@x"):
+        engine.schedule(email, [])
+    assert list(engine.schedules) == ["a@x", "c@x"]
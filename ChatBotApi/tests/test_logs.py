@@ -0,0 +1,78 @@
+import json
+import logging
+import queue
+import sys
+import pytest
+from monitoring import logs
+from monitoring.logs import DeferredQueueHandler, JsonFormatter, SafeFormatter, cap, redact
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Bearer ya29.a0AfH6SMB-xyz", "Bearer [REDACTED]"),
+    ("Authorization: Bearer abc", "Authorization: [REDACTED] [REDACTED]"),
+    ("token ya29.a0AfH6SMB-xyz sent", "token [REDACTED] sent"),
+    ("{'access_token': 'abc123', 'email': 'a@x'}", "{'access_token': '[REDACTED]', 'email': 'a@x'}"),
+    ('{"refresh_token": "r-1"}', '{"refresh_token": "[REDACTED]"}'),
+    ("GEMINI_KEY=AIzaSy123", "GEMINI_KEY=[REDACTED]"),
+    ("nothing secret here", "nothing secret here"),
+])
+def test_redact(text, expected):
+    assert redact(text) == expected
+
+
+def test_cap():
+    assert cap("abc", 5) == "abc"
+    assert cap("abcdefgh", 5) == "abcde...(+3 chars)"
+
+
+def record(msg, *args, exc_info=None):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, msg, args or None, exc_info)
+
+
+def queued(msg, *args):
+    """The record as the listener thread would see it."""
+    records = queue.Queue()
+    DeferredQueueHandler(records).handle(record(msg, *args))
+    return records.get_nowait()
+
+
+def test_secrets_in_arguments_are_redacted():
+    text = SafeFormatter("%(message)s").format(queued("calling with %s", {"access_token": "abc123"}))
+    assert text == "calling with {'access_token': '[REDACTED]'}"
+
+
+def test_arguments_are_snapshotted_before_queueing():
+    tasks = [{"task_id": "1"}]
+    pending = queued("tasks %s", tasks)
+    tasks.append({"task_id": "2"})
+    assert SafeFormatter("%(message)s").format(pending) == "tasks [{'task_id': '1'}]"
+
+
+def test_long_arguments_are_capped_but_numbers_keep_formatting():
+    text = SafeFormatter("%(message)s").format(queued("%s took %.2fs", "x" * (logs.LOG_FIELD_MAX + 5), 1.5))
+    assert text == "x" * logs.LOG_FIELD_MAX + "...(+5 chars) took 1.50s"
+
+
+def test_exceptions_are_redacted():
+    try:
+        raise ValueError("Bearer secret-token")
+    except ValueError:
+        failed = record("failed", exc_info=sys.exc_info())
+    text = SafeFormatter("%(message)s").format(failed)
+    assert "secret-token" not in text and "Bearer [REDACTED]" in text
+
+
+def test_json_format():
+    item = queued("user %s", "Bearer abc")
+    item.request_id = "req-1"
+    entry = json.loads(JsonFormatter().format(item))
+    assert entry["msg"] == "user Bearer [REDACTED]"
+    assert entry["request_id"] == "req-1" and entry["level"] == "INFO"
+
+
+def test_full_queue_drops_instead_of_blocking(monkeypatch):
+    monkeypatch.setitem(logs.stats, "dropped", 0)
+    handler = DeferredQueueHandler(queue.Queue(1))
+    handler.handle(record("one"))
+    handler.handle(record("two"))
+    assert logs.stats["dropped"] == 1
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta
+from database import utils1
+from GeminiAPI import memory
+
+
+def conversation(email, count):
+    start = datetime(2026, 1, 1, 8, 0)
+    messages = [{"msg": f"turn {i}", "by": "user" if i % 2 == 0 else "bot",
+                 "dateTime": (start + timedelta(minutes=i)).isoformat(timespec="microseconds")}
+                for i in range(count)]
+    asyncio.run(utils1.insertMessages(email, messages))
+    return messages
+
+
+def fold(monkeypatch, email):
+    folded = []
+
+    async def summarize(summary, turns):
+        folded.append(turns.splitlines())
+        return f"{summary}+{len(folded)}"
+
+    monkeypatch.setattr(memory, "summarizeConversation", summarize)
+
+    async def run():
+        history = await memory.build_history(email)
+        await asyncio.gather(*memory._background)
+        return history
+    return run, folded
+
+
+def test_turns_older_than_the_fetched_tail_are_folded(mongo, monkeypatch):
+    monkeypatch.setattr(memory, "HISTORY_FETCH_LIMIT", 20)
+    monkeypatch.setattr(memory, "HISTORY_FOLD_PAGE", 30)
+    messages = conversation("a@x", 100)
+    run, folded = fold(monkeypatch, "a@x")
+    history = asyncio.run(run())
+    assert "user: turn 80" in history and "turn 79" not in history
+    # 80 messages before the window, folded oldest first in pages of 30.
+    assert [len(page) for page in folded] == [30, 30, 20]
+    assert folded[0][0] == "user: turn 0" and folded[-1][-1] == "bot: turn 79"
+    stored = asyncio.run(utils1.retriveSummary("a@x"))
+    assert stored["summary"] == "+1+2+3" and stored["upto"] == messages[79]["dateTime"]
+
+
+def test_folding_resumes_from_the_cursor(mongo, monkeypatch):
+    monkeypatch.setattr(memory, "HISTORY_FETCH_LIMIT", 20)
+    monkeypatch.setattr(memory, "HISTORY_FOLD_PAGE", 10)
+    monkeypatch.setattr(memory, "HISTORY_FOLD_PAGES", 2)
+    conversation("a@x", 50)
+    run, folded = fold(monkeypatch, "a@x")
+    asyncio.run(run())
+    asyncio.run(run())
+    assert [page[0] for page in folded] == ["user: turn 0", "user: turn 10", "user: turn 20"]
+    assert len(folded) == 3
+
+
+def test_nothing_to_fold(mongo, monkeypatch):
+    conversation("a@x", 5)
+    run, folded = fold(monkeypatch, "a@x")
+    assert asyncio.run(run()).splitlines()[0] == "user: turn 0"
+    assert folded == []
@@ -0,0 +1,31 @@
+import asyncio
+from database import utils1
+
+
+def legacy(email, *texts):
+    messages = [{"msg": text, "by": "user", "dateTime": f"2026-01-0{i + 1}T10:00:00"} for i, text in enumerate(texts)]
+    asyncio.run(utils1.messages_collection.insert_one({"email": email, "messages": messages}))
+
+
+def test_legacy_messages_move_on_first_read(mongo, monkeypatch):
+    monkeypatch.setattr(utils1, "_migrated", type(utils1._migrated)())
+    legacy("a@x", "one", "two")
+    page = asyncio.run(utils1.retriveMessages("a@x"))
+    assert [m["msg"] for m in page["data"]] == ["one", "two"]
+    assert asyncio.run(utils1.buckets_collection.count_documents({"email": "a@x"})) == 2
+    assert "messages" not in asyncio.run(utils1.messages_collection.find_one({"email": "a@x"}))
+
+
+def test_lazy_migration_can_be_turned_off(mongo, monkeypatch):
+    monkeypatch.setattr(utils1, "_migrated", type(utils1._migrated)())
+    monkeypatch.setattr(utils1, "MESSAGE_LAZY_MIGRATION", False)
+    legacy("a@x", "one")
+    assert asyncio.run(utils1.retriveMessages("a@x"))["code"] == 404
+
+
+def test_checked_users_are_bounded(mongo, monkeypatch):
+    monkeypatch.setattr(utils1, "_migrated", type(utils1._migrated)())
+    monkeypatch.setattr(utils1, "MESSAGE_MIGRATED_USERS", 2)
+    for email in ("a@x", "b@x", "a@x", "c@x"):
+        asyncio.run(utils1.migrateUserMessages(email))
+    assert list(utils1._migrated) == ["a@x", "c@x"]
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timedelta
+from CalendarAPI import sync
+from CalendarAPI.sync import CalendarSyncWorker
+from database import outbox, utils1
+
+
+def queue(*jobs):
+    async def go():
+        for job in jobs:
+            await utils1.outbox_collection.insert_one(job)
+    asyncio.run(go())
+    return jobs
+
+
+def stored(job):
+    return asyncio.run(utils1.outbox_collection.find_one({"_id": job["_id"]}))
+
+
+def test_claim_leases_the_head_job(mongo):
+    first, second = queue(outbox.calendarJob("create", "a@x", {}, "t1"),
+                          outbox.calendarJob("update", "a@x", {}, "t1"))
+    claimed = asyncio.run(outbox.claimHead("a@x", 10))
+    assert [job["_id"] for job in claimed] == [first["_id"]]
+    assert claimed[0]["attempts"] == 1
+    assert claimed[0]["available_at"] > datetime.utcnow()
+    # The head is leased, so nothing behind it can overtake it.
+    assert asyncio.run(outbox.claimHead("a@x", 10)) == []
+
+
+def test_deletes_are_claimed_together(mongo):
+    jobs = queue(outbox.calendarJob("delete", "a@x", task_id="t1", event_id="e1"),
+                 outbox.calendarJob("delete", "a@x", task_id="t2", event_id="e2"),
+                 outbox.calendarJob("create", "a@x", {}, "t3"),
+                 outbox.calendarJob("delete", "a@x", task_id="t4", event_id="e4"))
+    claimed = asyncio.run(outbox.claimHead("a@x", 10))
+    assert [job["_id"] for job in claimed] == [jobs[0]["_id"], jobs[1]["_id"]]
+
+
+def test_expired_lease_can_be_claimed_again(mongo):
+    job, = queue(outbox.calendarJob("create", "a@x", {}, "t1"))
+    claimed, = asyncio.run(outbox.claimHead("a@x"))
+    asyncio.run(utils1.outbox_collection.update_one(
+        {"_id": job["_id"]}, {"$set": {"available_at": datetime.utcnow() - timedelta(seconds=1)}}))
+    again, = asyncio.run(outbox.claimHead("a@x"))
+    assert again["attempts"] == 2
+
+
+def test_retry_backs_off_then_dead_letters(mongo, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    job, = queue(outbox.calendarJob("create", "a@x", {}, "t1"))
+    claimed, = asyncio.run(outbox.claimHead("a@x"))
+    asyncio.run(outbox.retryJob(claimed, "boom"))
+    assert stored(job)["status"] == "pending" and stored(job)["error"] == "boom"
+    asyncio.run(outbox.retryJob(dict(claimed, attempts=2), "boom again"))
+    assert stored(job)["status"] == "dead" and stored(job)["error"] == "boom again"
+
+
+def test_jobs_nobody_can_run_are_dead_lettered(mongo):
+    old = outbox.calendarJob("create", "a@x", {}, "t1")
+    old["available_at"] -= timedelta(hours=2)
+    fresh = outbox.calendarJob("create", "b@x", {}, "t2")
+    queue(old, fresh)
+    assert asyncio.run(outbox.expireStranded(3600)) == 1
+    assert stored(old)["status"] == "dead"
+    assert "access token" in stored(old)["error"]
+    assert stored(fresh)["status"] == "pending"
+
+
+def test_worker_skips_users_without_a_live_token(mongo, monkeypatch):
+    job, = queue(outbox.calendarJob("create", "a@x", {}, "t1"))
+    worker = CalendarSyncWorker()
+    monkeypatch.setattr(sync, "OUTBOX_TOKEN_TTL", 0)
+    worker.remember("a@x", "token")
+    assert worker.token("a@x") is None
+    asyncio.run(worker.drain("a@x"))
+    assert stored(job)["attempts"] == 0
+
+
+def test_expired_token_is_dropped_and_job_retried(mongo, monkeypatch):
+    job, = queue(outbox.calendarJob("create", "a@x", {"summary": "s"}, "t1"))
+    calls = []
+
+    async def create(access_token, *fields):
+        calls.append(access_token)
+        return {"success": False, "status": 401, "message": "Invalid Credentials"}
+
+    monkeypatch.setattr(sync, "create_google_calendar_event", create)
+    worker = CalendarSyncWorker()
+    worker.remember("a@x", "token")
+    asyncio.run(worker.drain("a@x"))
+    assert calls == ["token"]
+    assert worker.token("a@x") is None
+    assert stored(job)["status"] == "pending"
+    assert worker.stats["retried"] == 1
+
+
+def test_uncertain_create_is_dead_lettered(mongo, monkeypatch):
+    job, = queue(outbox.calendarJob("create", "a@x", {"summary": "s"}, "t1"))
+
+    async def create(access_token, *fields):
+        return {"success": False, "status": 503, "uncertain": True, "message": "Failed to create event: 503"}
+
+    monkeypatch.setattr(sync, "create_google_calendar_event", create)
+    worker = CalendarSyncWorker()
+    worker.remember("a@x", "token")
+    asyncio.run(worker.drain("a@x"))
+    assert stored(job)["status"] == "dead"
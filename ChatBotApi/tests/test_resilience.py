@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+from GeminiAPI import resilience as module
+from GeminiAPI import utils
+from GeminiAPI.resilience import CircuitBreaker, CircuitOpen, Resilience
+
+
+@pytest.fixture(autouse=True)
+def fast(monkeypatch):
+    monkeypatch.setattr(module, "GEMINI_HEDGE_DELAY", 0.05)
+    monkeypatch.setattr(module, "GEMINI_HEDGE_MIN_DELAY", 0.01)
+    monkeypatch.setattr(module, "GEMINI_DEADLINE", 1)
+    monkeypatch.setattr(module, "GEMINI_FALLBACK_MODEL", None)
+
+
+def test_quota_wait_does_not_start_the_hedge_clock():
+    calls = []
+
+    async def fn(model_id, granted):
+        calls.append(model_id)
+        await asyncio.sleep(0.15)  # paced by the quota
+        granted()
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    resilience = Resilience()
+    assert asyncio.run(resilience.call("test", fn)) == "ok"
+    assert len(calls) == 1 and resilience.stats["hedged"] == 0
+    assert resilience.latencies["test"][0] < 0.1
+
+
+def test_slow_call_is_hedged():
+    calls = []
+
+    async def fn(model_id, granted):
+        granted()
+        calls.append(model_id)
+        await asyncio.sleep(0.3 if len(calls) == 1 else 0.01)
+        return len(calls)
+
+    resilience = Resilience()
+    assert asyncio.run(resilience.call("test", fn)) == 2
+    assert resilience.stats["hedged"] == 1 and resilience.stats["hedge_won"] == 1
+
+
+def test_unhedged_call_waits_for_the_first_attempt():
+    calls = []
+
+    async def fn(model_id, granted):
+        granted()
+        calls.append(model_id)
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    resilience = Resilience()
+    assert asyncio.run(resilience.call("test", fn, hedge=False)) == "ok"
+    assert len(calls) == 1
+
+
+def test_breaker_opens_and_fails_fast():
+    resilience = Resilience()
+    resilience.breaker = CircuitBreaker(window=60, min_calls=2, error_rate=0.5, cooldown=60)
+
+    async def fn(model_id, granted):
+        granted()
+        raise RuntimeError("down")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(resilience.call("test", fn))
+    with pytest.raises(CircuitOpen):
+        asyncio.run(resilience.call("test", fn))
+    assert resilience.stats["rejected"] == 1
+
+
+def test_stream_setup_is_bounded_by_the_deadline(monkeypatch):
+    resilience = Resilience()
+    monkeypatch.setattr(utils, "resilience", resilience)
+    monkeypatch.setattr(module, "GEMINI_DEADLINE", 0.1)
+
+    async def stream_text(prompt, search=False, template=None, model_id=None, granted=None):
+        granted()
+        await asyncio.sleep(1)
+        yield "late"
+
+    monkeypatch.setattr(utils, "stream_text", stream_text)
+
+    async def read():
+        return [chunk async for chunk in utils.conversactionStream("hi", "")]
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(read())
+    assert resilience.stats["deadline"] == 1
+
+
+def test_stream_passes_chunks_through(monkeypatch):
+    resilience = Resilience()
+    monkeypatch.setattr(utils, "resilience", resilience)
+    closed = []
+
+    async def stream_text(prompt, search=False, template=None, model_id=None, granted=None):
+        granted()
+        try:
+            for word in ("a", "b", "c"):
+                yield word
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(utils, "stream_text", stream_text)
+
+    async def read():
+        return [chunk async for chunk in utils.conversactionStream("hi", "")]
+
+    assert asyncio.run(read()) == ["a", "b", "c"]
+    assert closed == [True]
+    assert resilience.breaker.outcomes[0][1] is True
@@ -0,0 +1,58 @@
+import asyncio
+from GeminiAPI import cache
+from GeminiAPI.cache import ResponseCache, prompt_key
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_prompt_key_ignores_whitespace_only():
+    assert prompt_key("a  b\n c", "m") == prompt_key(" a b c ", "m")
+    assert prompt_key("a b", "m") != prompt_key("a b", "other")
+    assert prompt_key("a b", "m", "classify:1") != prompt_key("a b", "m", "classify:2")
+
+
+def test_entries_expire(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    responses = ResponseCache()
+    asyncio.run(responses.set("k", {"res": "first"}, ttl=10))
+    assert asyncio.run(responses.get("k")) == {"res": "first"}
+    clock.now += 11
+    assert asyncio.run(responses.get("k")) is None
+    assert "k" not in responses.entries
+    assert responses.stats == {"hits": 1, "misses": 1, "disk_hits": 0, "evictions": 0}
+
+
+def test_callers_get_their_own_copy():
+    responses = ResponseCache()
+    asyncio.run(responses.set("k", {"items": [1]}, ttl=10))
+    asyncio.run(responses.get("k"))["items"].append(2)
+    assert asyncio.run(responses.get("k")) == {"items": [1]}
+
+
+def test_least_recently_used_is_evicted():
+    responses = ResponseCache(max_entries=2)
+    for key in ("a", "b"):
+        asyncio.run(responses.set(key, key, ttl=10))
+    asyncio.run(responses.get("a"))
+    asyncio.run(responses.set("c", "c", ttl=10))
+    assert list(responses.entries) == ["a", "c"]
+    assert responses.stats["evictions"] == 1
+
+
+def test_disk_cache_survives_a_restart(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    path = str(tmp_path / "responses.db")
+    asyncio.run(ResponseCache(disk_path=path).set("k", {"res": "second"}, ttl=10))
+    restarted = ResponseCache(disk_path=path)
+    assert asyncio.run(restarted.get("k")) == {"res": "second"}
+    assert restarted.stats["disk_hits"] == 1
+    clock.now += 11
+    assert asyncio.run(ResponseCache(disk_path=path).get("k")) is None
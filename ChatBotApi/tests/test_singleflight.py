@@ -0,0 +1,126 @@
+import asyncio
+import pytest
+from GeminiAPI import singleflight
+from GeminiAPI.singleflight import SingleFlight
+
+
+class Call:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.started = 0
+        self.cancelled = 0
+        self.gate = None
+
+    async def __call__(self):
+        self.started += 1
+        try:
+            await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_concurrent_callers_share_one_call():
+    flights, call = SingleFlight(), Call({"items": [1]})
+
+    async def go():
+        call.gate = asyncio.Event()
+        waiting = [asyncio.create_task(flights.do("k", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        call.gate.set()
+        return await asyncio.gather(*waiting)
+
+    results = run(go())
+    assert call.started == 1 and results == [{"items": [1]}] * 3
+    results[0]["items"].append(2)
+    assert results[1] == {"items": [1]}
+    assert flights.stats == {"calls": 3, "coalesced": 2, "errors": 0}
+    assert flights.flights == {}
+
+
+def test_error_reaches_every_caller():
+    flights, call = SingleFlight(), Call(error=RuntimeError("down"))
+
+    async def go():
+        call.gate = asyncio.Event()
+        waiting = [asyncio.create_task(flights.do("k", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        call.gate.set()
+        return await asyncio.gather(*waiting, return_exceptions=True)
+
+    assert [str(e) for e in run(go())] == ["down", "down"]
+    assert call.started == 1 and flights.stats["errors"] == 1
+
+
+def test_one_caller_leaving_does_not_cancel_the_others():
+    flights, call = SingleFlight(), Call("ok")
+
+    async def go():
+        call.gate = asyncio.Event()
+        leaving = asyncio.create_task(flights.do("k", call))
+        staying = asyncio.create_task(flights.do("k", call))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        call.gate.set()
+        return await staying
+
+    assert run(go()) == "ok"
+    assert call.cancelled == 0
+
+
+def test_call_is_cancelled_once_nobody_waits():
+    flights, call = SingleFlight(), Call("ok")
+
+    async def go():
+        call.gate = asyncio.Event()
+        leaving = asyncio.create_task(flights.do("k", call))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        # Unregistered at once, so a new caller starts a fresh call.
+        assert flights.flights == {}
+        fresh = asyncio.create_task(flights.do("k", call))
+        await asyncio.sleep(0)
+        call.gate.set()
+        return await fresh
+
+    assert run(go()) == "ok"
+    assert call.started == 2 and call.cancelled == 1
+
+
+def test_finished_calls_are_not_reused():
+    flights, call = SingleFlight(), Call("ok")
+
+    async def go():
+        call.gate = asyncio.Event()
+        call.gate.set()
+        await flights.do("k", call)
+        await flights.do("k", call)
+
+    run(go())
+    assert call.started == 2
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLE_FLIGHT", False)
+    flights, call = SingleFlight(), Call("ok")
+
+    async def go():
+        call.gate = asyncio.Event()
+        waiting = [asyncio.create_task(flights.do("k", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        call.gate.set()
+        return await asyncio.gather(*waiting)
+
+    assert run(go()) == ["ok", "ok"]
+    assert call.started == 2
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime
+import pytest
+from GeminiAPI.slots import local_dialog, parse_add, parse_clock, parse_delete
+
+# A Monday morning.
+NOW = datetime(2026, 3, 2, 9, 0)
+
+
+def at(day, hour, minute=0, month=3):
+    return datetime(2026, month, day, hour, minute)
+
+
+@pytest.mark.parametrize("text, expected", [
+    # relative dates
+    ("remind me to call mom tomorrow at 5pm for 30 minutes", ("call mom", at(3, 17), at(3, 17, 30), False)),
+    ("book a haircut in 3 days at 11am until noon", ("haircut", at(5, 11), at(5, 12), False)),
+    ("add gym on friday at 6pm for an hour", ("gym", at(6, 18), at(6, 19), False)),
+    ("add lunch with sam at 1pm for 1 hour and 30 minutes", ("lunch with sam", at(2, 13), at(2, 14, 30), False)),
+    # calendar dates
+    ("add dentist appointment on 2026-03-10 from 2 to 3pm", ("dentist appointment", at(10, 14), at(10, 15), False)),
+    ("remind me to pay rent on the 5th of april at 10am for half an hour",
+     ("pay rent", at(5, 10, month=4), at(5, 10, 30, month=4), False)),
+    ("add review on march 20 at 16:00 for 2 hours", ("review", at(20, 16), at(20, 18), False)),
+    # daily, which may start earlier today
+    ("schedule standup every day at 9:30am for 15 minutes", ("standup", at(2, 9, 30), at(2, 9, 45), True)),
+    ("remind me to stretch daily at 8am for 10 mins", ("stretch", at(2, 8), at(2, 8, 10), True)),
+    # no end given
+    ("remind me to call mom tomorrow at 5pm", ("call mom", at(3, 17), None, False)),
+])
+def test_parse_add(text, expected):
+    assert parse_add(text, NOW) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "remind me to call mom at 5",
+    "remind me to call mom tomorrow evening",
+    "add meeting at 3pm and 4pm",
+    "add meeting tomorrow on friday at 3pm",
+    "add meeting on february 30 at 3pm for an hour",
+    "add meeting at 8am for an hour",
+    "add meeting every monday at 3pm",
+    "add meeting from 3pm to 2pm",
+    "add meeting from 3pm to 4pm for an hour",
+    "add at 3pm for an hour",
+    "what is on tomorrow at 5pm?",
+])
+def test_ambiguous_input_goes_to_the_model(text):
+    assert local_dialog(text, [], NOW) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("5pm", "17:00"), ("5:30 pm", "17:30"), ("12am", "00:00"), ("17:30", "17:30"),
+    ("noon", "12:00"), ("5", None), ("13pm", None), ("9:75", None),
+])
+def test_parse_clock(text, expected):
+    assert parse_clock(text) == expected
+
+
+def test_add_response_is_complete_with_an_end():
+    response = local_dialog("add gym on friday at 6pm for an hour", [], NOW)
+    assert response["dbAction"] == "add" and not response["isInfoIncomplete"]
+    assert response["payload"]["enddate"] == "2026-03-06" and response["payload"]["endtime"] == "19:00"
+
+
+def test_add_without_an_end_asks_for_one():
+    response = local_dialog("remind me to call mom tomorrow at 5pm", [], NOW)
+    assert response["isInfoIncomplete"] and response["dbAction"] == "noaction"
+
+
+TASKS = [
+    {"task_id": "1", "task": {"task": "dentist", "summary": "Dentist", "startdate": "2026-03-10", "starttime": "14:00"}},
+    {"task_id": "2", "task": {"task": "team meeting", "summary": "Team meeting"}},
+    {"task_id": "3", "task": {"task": "client meeting", "summary": "Client meeting"}},
+]
+
+
+def test_delete_asks_before_removing_one_match():
+    response = parse_delete("delete the dentist", TASKS)
+    assert "Dentist" in response["text"] and "2026-03-10" in response["text"]
+    assert response["dbAction"] == "noaction"
+
+
+@pytest.mark.parametrize("text", ["delete the meeting", "delete the gym", "delete the task"])
+def test_delete_without_exactly_one_match_goes_to_the_model(text):
+    assert parse_delete(text, TASKS) is None
+
+
+def test_local_add_without_conflict_skips_the_checker(mongo, monkeypatch):
+    import main
+
+    async def checker(*args):
+        raise AssertionError("conflictChecker should not run")
+
+    async def enqueue(*args):
+        return True
+
+    monkeypatch.setattr(main, "conflictChecker", checker)
+    monkeypatch.setattr(main.notification_worker, "enqueue", enqueue)
+
+    async def run():
+        _, dialog = await main.route_query("add gym tomorrow at 6pm for an hour", "", [])
+        response = await dialog
+        response["nInfo"] = {}
+        return await main.handle_task_dialog("a@x", response, [], "token")
+
+    response = asyncio.run(run())
+    assert response["text"].startswith("Added 'Gym'")
+    assert "local" not in response
+    assert response["nInfo"]["notificationPending"] is True
+
+
+def test_local_add_with_a_conflict_asks_the_checker(mongo, monkeypatch):
+    import main
+    calls = []
+
+    async def checker(conflict, *args):
+        calls.append(conflict)
+        return {"isConflict": True, "text": "That overlaps Gym.", "response": ""}
+
+    monkeypatch.setattr(main, "conflictChecker", checker)
+
+    async def run():
+        _, dialog = await main.route_query("add swim tomorrow at 6pm for an hour", "", [])
+        response = await dialog
+        response["nInfo"] = {}
+        busy = [{"task_id": "1", "task": dict(response["payload"], summary="Gym")}]
+        return await main.handle_task_dialog("a@x", response, busy, "token")
+
+    assert asyncio.run(run())["isConflict"] is True
+    assert calls and calls[0]["isConflict"]
@@ -0,0 +1,91 @@
+from database.taskcache import TaskCache
+
+
+def tasks(*ids):
+    return [{"task_id": task_id, "task": {"summary": task_id}} for task_id in ids]
+
+
+def test_miss_then_hit():
+    cache = TaskCache()
+    assert cache.get("a@x") is None
+    cache.put("a@x", tasks("t1"))
+    assert [t["task_id"] for t in cache.get("a@x").listing()] == ["t1"]
+    assert cache.stats["misses"] == 1 and cache.stats["hits"] == 1
+
+
+def test_entries_are_copies():
+    cache = TaskCache()
+    source = tasks("t1")
+    cache.put("a@x", source)
+    source[0]["task"]["summary"] = "changed"
+    assert cache.get("a@x").tasks["t1"]["summary"] == "t1"
+
+
+def test_remote_version_mismatch_is_stale():
+    cache = TaskCache()
+    cache.put("a@x", tasks("t1"), remote=3)
+    assert cache.get("a@x", remote=3) is not None
+    assert cache.get("a@x", remote=4) is None
+    assert cache.stats["stale"] == 1
+    assert "a@x" not in cache.users
+
+
+def test_own_write_advances_remote_version():
+    cache = TaskCache()
+    entry = cache.put("a@x", tasks("t1"), remote=3)
+    version = entry.version
+    cache.upsert("a@x", "t2", {"summary": "t2"}, remote=4)
+    entry = cache.get("a@x", remote=4)
+    assert list(entry.tasks) == ["t1", "t2"]
+    assert entry.version > version
+
+
+def test_write_from_another_worker_drops_entry():
+    cache = TaskCache()
+    cache.put("a@x", tasks("t1"), remote=3)
+    # Version 4 was written elsewhere; this worker's write lands as 5.
+    cache.upsert("a@x", "t2", {"summary": "t2"}, remote=5)
+    assert cache.get("a@x", remote=5) is None
+
+
+def test_upsert_with_new_id_moves_owner():
+    cache = TaskCache()
+    cache.put("a@x", tasks("t1"))
+    cache.upsert("a@x", "t1", {"summary": "moved"}, new_id="ev1")
+    assert list(cache.get("a@x").tasks) == ["ev1"]
+    assert cache.owners == {"ev1": "a@x"}
+
+
+def test_remove_finds_owner():
+    cache = TaskCache()
+    cache.put("a@x", tasks("t1", "t2"))
+    cache.remove("t1")
+    assert list(cache.get("a@x").tasks) == ["t2"]
+    assert "t1" not in cache.owners
+
+
+def test_least_recently_used_user_is_evicted():
+    cache = TaskCache(max_users=2)
+    cache.put("a@x", tasks("a1"))
+    cache.put("b@x", tasks("b1"))
+    cache.get("a@x")
+    cache.put("c@x", tasks("c1"))
+    assert list(cache.users) == ["a@x", "c@x"]
+    assert "b1" not in cache.owners
+    assert cache.stats["evictions"] == 1
+
+
+def test_fill_raced_by_write_is_not_trusted():
+    cache = TaskCache()
+    token = cache.begin_fill("a@x")
+    cache.upsert("a@x", "t1", {"summary": "t1"})
+    assert cache.end_fill("a@x", token) is False
+    assert cache.stats["raced"] == 1
+    assert cache.fills == {}
+
+
+def test_quiet_fill_is_trusted():
+    cache = TaskCache()
+    token = cache.begin_fill("a@x")
+    cache.upsert("b@x", "t1", {"summary": "t1"})
+    assert cache.end_fill("a@x", token) is True
@@ -0,0 +1,28 @@
+import logging
+from types import SimpleNamespace
+from GeminiAPI import prompts
+from GeminiAPI.prompts import TokenUsage
+
+
+def usage(prompt, completion, cached=0):
+    return SimpleNamespace(prompt_token_count=prompt, candidates_token_count=completion,
+                           cached_content_token_count=cached)
+
+
+def test_averages_are_logged_at_info(monkeypatch, caplog):
+    monkeypatch.setattr(prompts, "TOKEN_LOG_EVERY", 2)
+    tokens = TokenUsage()
+    with caplog.at_level(logging.INFO, logger="GeminiAPI.prompts"):
+        tokens.record("classify", usage(100, 10))
+        assert not caplog.records
+        tokens.record("classify", usage(300, 30, 200))
+    assert caplog.records[0].levelno == logging.INFO
+    assert caplog.records[0].getMessage() == \
+        "Gemini tokens [classify] over 2 calls: prompt=200 completion=20 cached=100 per call"
+    assert tokens.per_call() == {"classify": {"prompt": 200, "completion": 20}}
+
+
+def test_missing_usage_is_ignored():
+    tokens = TokenUsage()
+    tokens.record("classify", None)
+    assert tokens.per_call() == {}
@@ -46,6 +46,10 @@ class HomeScreenState extends State<HomeScreen> with SingleTickerProviderStateMi
     );
     _initializeTTS();
     loadMessages();
+    String? email = FirebaseAuth.instance.currentUser?.email;
+    if (email != null) {
+      ChatAPI().listenForNotifications(email);
+    }
   }
 
   @override
@@ -1,4 +1,5 @@
 import 'dart:convert';
+import 'dart:io';
 import 'package:awesome_notifications/awesome_notifications.dart';
 import 'package:chatbot_ui/services/notification.dart';
 import 'package:firebase_auth/firebase_auth.dart';
@@ -15,6 +16,7 @@ class ChatAPI {
   final FlutterSecureStorage _secureStorage = const FlutterSecureStorage();
   final GoogleSignIn _googleSignIn = GoogleSignIn();
   final notificationService = NotificationService();
+  static WebSocket? _notificationSocket;
 
   Future<String?> getFreshAccessToken() async {
     try {
@@ -85,84 +87,13 @@ class ChatAPI {
               }
             }
           } else {
-            String? taskId = nInfo['task_id'] as String?;
-          String title = nInfo['title'] as String? ?? "Scheduled Task";
-          String body = nInfo['body'] as String? ?? "You have a scheduled event. Ask for more details.";
-          String? startDate = nInfo['startdate'] as String?;
-          String? startTime = nInfo['starttime'] as String?;
-          String? endTime = nInfo['endtime'] as String?;
-            String title1 = nInfo['title1'] as String? ?? "Not found title ";
-            String body1 = nInfo['body1'] as String? ?? "Not found body ";
-// Check for null values before proceeding
-          if (taskId != null && startDate != null && startTime != null && endTime != null) {
-            DateTime startDateTime = DateTime.parse('$startDate $startTime:00');
-            DateTime endDateTime = DateTime.parse('$startDate $endTime:00');
-
-            // Calculate the duration between start and end times
-            Duration duration = endDateTime.difference(startDateTime);
-
-            // Find 20% of the duration (for chat notification)
-            Duration twentyPercentDuration = duration * 0.20;
-
-            // Calculate the time for the chat notification (start time + 20% of duration)
-            DateTime chatNotificationTime = startDateTime.add(twentyPercentDuration);
-
-            bool isAllowed = await AwesomeNotifications().isNotificationAllowed();
-
-            // 🔹 If not allowed, request permission
-            if (!isAllowed) {
-              print("🔔 Notification permission is not granted. Requesting now...");
-
-              // Request permission
-              await AwesomeNotifications().requestPermissionToSendNotifications();
-
-              // 🔹 Re-check after requesting
-              bool isNowAllowed = await AwesomeNotifications().isNotificationAllowed();
-
-              if (!isNowAllowed) {
-                print("🚫 Notification permission denied. Cannot schedule notification.");
-                return {'text': "Changes saved to database but notification not allowed. you can allow notification in the app settings."};
-              }
-            }
-
-            // Check if it's a daily event or a one-time event
-            if (data['payload']['daily'] != null && data['payload']['daily'] == true) {
-              TimeOfDay scheduledTimeOfDay = TimeOfDay(hour: startDateTime.hour, minute: startDateTime.minute);
-              await notificationService.scheduleDailyNotification(
-                eventId: taskId,
-                title: title,
-                body: body,
-                timeOfDay: scheduledTimeOfDay,
-              );
-
-              // Schedule the chat notification after 20% of the duration
-              TimeOfDay chatNotificationTimeOfDay = TimeOfDay(hour: chatNotificationTime.hour, minute: chatNotificationTime.minute);
-
-              await notificationService.scheduleDailyChatNotification(
-                eventId: taskId,
-                title: title1,
-                body: body1,
-                timeOfDay: chatNotificationTimeOfDay,
-              );
-            } else {
-              // Schedule the exact time notification (at the start time)
-              await notificationService.scheduleNotification(
-                eventId: taskId,
-                title: title,
-                body: body,
-                scheduledTime: startDateTime,
-              );
-
-              // Schedule the chat notification after 20% of the duration
-              await notificationService.scheduleChatNotification(
-                eventId: taskId,
-                title: title1,
-                body: body1,
-                scheduledTime: chatNotificationTime,
-              );
+            // The notification copy is written in the background and arrives
+            // over /notifications; until then the defaults are scheduled.
+            String? error = await scheduleTaskNotifications(nInfo, daily: data['payload']?['daily'] == true);
+            if (error != null) {
+              return {'text': error};
             }
           }
-          }
         }
         return data;
       } else {
@@ -173,6 +104,120 @@ class ChatAPI {
       return {'text': "Error during API request"};
     }
   }
+  // Schedules the reminder and the chat notification for a task. Called
+  // again when the task's copy arrives; the ids come from the task id, so
+  // the second call replaces the first.
+  Future<String?> scheduleTaskNotifications(Map<String, dynamic> nInfo, {bool daily = false}) async {
+    String? taskId = nInfo['task_id'] as String?;
+    String title = nInfo['title'] as String? ?? "Scheduled Task";
+    String body = nInfo['body'] as String? ?? "You have a scheduled event. Ask for more details.";
+    String? startDate = nInfo['startdate'] as String?;
+    String? startTime = nInfo['starttime'] as String?;
+    String? endTime = nInfo['endtime'] as String?;
+    String title1 = nInfo['title1'] as String? ?? "Not found title ";
+    String body1 = nInfo['body1'] as String? ?? "Not found body ";
+    // Check for null values before proceeding
+    if (taskId == null || startDate == null || startTime == null || endTime == null) {
+      return null;
+    }
+    DateTime startDateTime = DateTime.parse('$startDate $startTime:00');
+    DateTime endDateTime = DateTime.parse('$startDate $endTime:00');
+
+    // Calculate the duration between start and end times
+    Duration duration = endDateTime.difference(startDateTime);
+
+    // Find 20% of the duration (for chat notification)
+    Duration twentyPercentDuration = duration * 0.20;
+
+    // Calculate the time for the chat notification (start time + 20% of duration)
+    DateTime chatNotificationTime = startDateTime.add(twentyPercentDuration);
+
+    bool isAllowed = await AwesomeNotifications().isNotificationAllowed();
+
+    // 🔹 If not allowed, request permission
+    if (!isAllowed) {
+      print("🔔 Notification permission is not granted. Requesting now...");
+
+      // Request permission
+      await AwesomeNotifications().requestPermissionToSendNotifications();
+
+      // 🔹 Re-check after requesting
+      bool isNowAllowed = await AwesomeNotifications().isNotificationAllowed();
+
+      if (!isNowAllowed) {
+        print("🚫 Notification permission denied. Cannot schedule notification.");
+        return "Changes saved to database but notification not allowed. you can allow notification in the app settings.";
+      }
+    }
+
+    // Check if it's a daily event or a one-time event
+    if (daily) {
+      TimeOfDay scheduledTimeOfDay = TimeOfDay(hour: startDateTime.hour, minute: startDateTime.minute);
+      await notificationService.scheduleDailyNotification(
+        eventId: taskId,
+        title: title,
+        body: body,
+        timeOfDay: scheduledTimeOfDay,
+      );
+
+      // Schedule the chat notification after 20% of the duration
+      TimeOfDay chatNotificationTimeOfDay = TimeOfDay(hour: chatNotificationTime.hour, minute: chatNotificationTime.minute);
+
+      await notificationService.scheduleDailyChatNotification(
+        eventId: taskId,
+        title: title1,
+        body: body1,
+        timeOfDay: chatNotificationTimeOfDay,
+      );
+    } else {
+      // Schedule the exact time notification (at the start time)
+      await notificationService.scheduleNotification(
+        eventId: taskId,
+        title: title,
+        body: body,
+        scheduledTime: startDateTime,
+      );
+
+      // Schedule the chat notification after 20% of the duration
+      await notificationService.scheduleChatNotification(
+        eventId: taskId,
+        title: title1,
+        body: body1,
+        scheduledTime: chatNotificationTime,
+      );
+    }
+    return null;
+  }
+
+  // Receives notification copy for the user's tasks and reschedules them
+  // with it. The server resumes after the last copy we stored, so a copy
+  // written while the app was closed still arrives on the next launch.
+  Future<void> listenForNotifications(String email) async {
+    if (_notificationSocket != null) {
+      return;
+    }
+    final String? since = await _secureStorage.read(key: 'notifications_since');
+    final uri = Uri.parse(apiUrl.replaceFirst('http', 'ws')).replace(
+      path: '/notifications',
+      queryParameters: {'email': email, if (since != null) 'since': since},
+    );
+    try {
+      _notificationSocket = await WebSocket.connect(uri.toString());
+    } catch (e) {
+      print('Error connecting to notifications: $e');
+      return;
+    }
+    _notificationSocket!.listen((message) async {
+      final copy = jsonDecode(message as String) as Map<String, dynamic>;
+      await scheduleTaskNotifications(copy, daily: copy['daily'] == true);
+      await _secureStorage.write(key: 'notifications_since', value: copy['at'] as String);
+    }, onDone: () {
+      _notificationSocket = null;
+    }, onError: (e) {
+      print('Notifications socket error: $e');
+      _notificationSocket = null;
+    });
+  }
   Future<Map<String, dynamic>> generateMessage(String msg) async {
     var body = jsonEncode({
       "task": msg